@@ -0,0 +1,67 @@
+"""
+Compares the size and speed of the remote events cache formats:
+a json list of individually encrypted events, and the packed blob of Event.model_dump_redis_many.
+
+Usage: python scripts/benchmark_event_cache.py [number of events]
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, UTC
+
+os.environ.setdefault('DB_SECRET', 'benchmark-secret')
+
+from appointment.database.schemas import Event  # noqa: E402
+
+
+def make_events(count):
+    start = datetime(2024, 3, 4, 9, tzinfo=UTC)
+    return [
+        Event(
+            title=f'Meeting {index}',
+            start=start + timedelta(minutes=30 * index),
+            end=start + timedelta(minutes=30 * index + 25),
+            tentative=index % 7 == 0,
+            description='Weekly sync' if index % 3 == 0 else None,
+        )
+        for index in range(count)
+    ]
+
+
+def measure(dump, load, events, rounds=20):
+    blob = dump(events)
+    timer_boot = time.perf_counter_ns()
+    for _ in range(rounds):
+        dump(events)
+    dump_time = (time.perf_counter_ns() - timer_boot) / rounds / len(events) / 1000
+
+    timer_boot = time.perf_counter_ns()
+    for _ in range(rounds):
+        load(blob)
+    load_time = (time.perf_counter_ns() - timer_boot) / rounds / len(events) / 1000
+
+    return len(blob) / len(events), dump_time, load_time
+
+
+def run():
+    events = make_events(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+
+    formats = {
+        'individually encrypted': (
+            lambda events: json.dumps([event.model_dump_redis() for event in events]),
+            lambda blob: [Event.model_load_redis(event) for event in json.loads(blob)],
+        ),
+        'packed': (Event.model_dump_redis_many, Event.model_load_redis_many),
+    }
+
+    print(f'{len(events)} events')
+    print(f'{"format":<24}{"bytes/event":>14}{"dump µs/event":>16}{"load µs/event":>16}')
+    for name, (dump, load) in formats.items():
+        size, dump_time, load_time = measure(dump, load, events)
+        print(f'{name:<24}{size:>14.1f}{dump_time:>16.1f}{load_time:>16.1f}')
+
+
+if __name__ == '__main__':
+    run()
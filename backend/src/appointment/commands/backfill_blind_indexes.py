@@ -0,0 +1,45 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..database import models
+from ..dependencies.database import get_engine_and_session
+
+
+def backfill(db: Session, batch_size: int = 500) -> dict[str, int]:
+    """Fills in the blind indexes of rows that don't have one yet, returns how many were filled per column"""
+    filled = {}
+    for column, index_column in models.BLIND_INDEXES.items():
+        name = f'{column.class_.__tablename__}.{column.key}'
+        filled[name] = 0
+
+        while True:
+            rows = db.scalars(
+                select(column.class_)
+                .where(index_column.is_(None), column.is_not(None))
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            for row in rows:
+                setattr(row, index_column.key, models.blind_index(getattr(row, column.key)))
+            db.commit()
+            filled[name] += len(rows)
+
+    return filled
+
+
+def run():
+    print('Filling in missing blind indexes...')
+
+    _, session = get_engine_and_session()
+    db = session()
+
+    try:
+        filled = backfill(db)
+    finally:
+        db.close()
+
+    for name, count in filled.items():
+        print(f'{name}: {count} rows updated')
+    print('Done!')
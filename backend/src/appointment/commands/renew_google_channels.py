@@ -0,0 +1,51 @@
+import logging
+import os
+from datetime import datetime, timedelta, UTC
+
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+
+from ..controller.calendar import ConnectorFactory
+from ..database import repo, models
+from ..dependencies.database import get_engine_and_session
+from ..dependencies.google import get_google_client
+from ..exceptions.validation import RemoteCalendarConnectionError
+
+
+def run():
+    """Opens push notification channels for connected Google calendars, and renews the ones about to expire.
+    Meant to be run at least daily, more often than GOOGLE_CHANNEL_RENEW_BEFORE_SECONDS."""
+    webhook_url = os.getenv('GOOGLE_CALENDAR_WEBHOOK_URL')
+    if not webhook_url:
+        print('GOOGLE_CALENDAR_WEBHOOK_URL is not set, skipping.')
+        return
+
+    now = datetime.now(UTC).replace(tzinfo=None)
+    renew_before = now + timedelta(seconds=int(os.getenv('GOOGLE_CHANNEL_RENEW_BEFORE_SECONDS', 86400)))
+
+    _, session = get_engine_and_session()
+    db = session()
+
+    try:
+        connectors = ConnectorFactory(db, get_google_client())
+        renewed = 0
+        failed = 0
+
+        for calendar in repo.calendar.get_by_provider(db, models.CalendarProvider.google, include_unconnected=False):
+            if calendar.google_channel and calendar.google_channel.expires_at > renew_before:
+                continue
+
+            try:
+                connectors.google(calendar.owner_id, calendar.user, calendar.id).watch_events(webhook_url)
+                renewed += 1
+            except (RemoteCalendarConnectionError, RefreshError, HttpError) as ex:
+                logging.warning(f'[renew_google_channels.run] Could not watch calendar {calendar.id}: {ex}')
+                failed += 1
+
+        # Clean up after channels that weren't renewed, e.g. because their calendar was disconnected
+        for channel in repo.google_calendar_channel.get_expired(db, now):
+            repo.google_calendar_channel.delete(db, channel)
+    finally:
+        db.close()
+
+    print(f'Renewed {renewed} Google calendar channels, {failed} failed.')
@@ -1,13 +1,51 @@
+import json
 import logging
+import os
+import threading
 
+import google_auth_httplib2
+import httplib2
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 from ...database import repo
 from ...database.models import CalendarProvider
 from ...database.schemas import CalendarConnection
 from ...exceptions.calendar import EventNotCreatedException
-from ...exceptions.google_api import GoogleScopeChanged, GoogleInvalidCredentials
+from ...exceptions.google_api import GoogleScopeChanged, GoogleInvalidCredentials, GoogleSyncTokenExpired
+
+# Parsed discovery documents, shared by the whole process
+_discovery_documents: dict[tuple[str, str], dict] = {}
+_discovery_lock = threading.Lock()
+
+# httplib2 isn't thread safe, so each thread keeps its own pool of keep-alive connections.
+# They're only reused by threads that outlive a request, like the request handlers' and calendar.calendar_fetch_executor
+_thread_local = threading.local()
+
+
+def get_discovery_document(service_name: str, version: str) -> dict | None:
+    """Returns the parsed discovery document bundled with googleapiclient, or None if there's none.
+    The document is only read and parsed once per process."""
+    key = (service_name, version)
+    if key not in _discovery_documents:
+        with _discovery_lock:
+            if key not in _discovery_documents:
+                document = discovery_cache.get_static_doc(service_name, version)
+                _discovery_documents[key] = json.loads(document) if document else None
+
+    return _discovery_documents[key]
+
+
+def get_http() -> httplib2.Http:
+    """Returns this thread's http client, which keeps connections to Google alive between the calls made on it"""
+    if not hasattr(_thread_local, 'http'):
+        _thread_local.http = build_http()
+        # A fetch that is given up on by calendar.Tools.list_events_concurrently shouldn't keep its thread busy
+        _thread_local.http.timeout = float(os.getenv('CALENDAR_FETCH_TIMEOUT', 10))
+
+    return _thread_local.http
 
 
 class GoogleClient:
@@ -19,6 +57,24 @@ class GoogleClient:
         'https://www.googleapis.com/auth/userinfo.email',
         'openid',
     ]
+    # Limit the fields we request
+    EVENT_FIELDS = (
+        'items/id',
+        'items/status',
+        'items/summary',
+        'items/description',
+        'items/attendees',
+        'items/start',
+        'items/end',
+        'items/transparency',
+        # Top level stuff
+        'nextPageToken',
+    )
+    # Explicitly ignore workingLocation events
+    # See: https://developers.google.com/calendar/api/v3/reference/events#eventType
+    EVENT_TYPES = ['default', 'focusTime', 'outOfOffice']
+    # Google Calendar accepts up to 50 requests per batch request
+    MAX_BATCH_SIZE = 50
     client: Flow | None = None
 
     def __init__(self, client_id, client_secret, project_id, callback_url):
@@ -67,12 +123,22 @@ class GoogleClient:
             logging.error(f'[google_client.get_credentials] Value error while fetching credentials {str(e)}')
             raise GoogleInvalidCredentials()
 
+    @staticmethod
+    def build_service(token, service_name='calendar', version='v3'):
+        """Returns a service handle for the given credentials.
+        This is cheap, as the discovery document is cached and the http connections are reused."""
+        document = get_discovery_document(service_name, version)
+        if document is None:
+            return build(service_name, version, credentials=token, cache_discovery=False)
+
+        return build_from_document(document, http=google_auth_httplib2.AuthorizedHttp(token, http=get_http()))
+
     def get_profile(self, token):
         """Retrieve the user's profile associated with the token"""
         if self.client is None:
             return None
 
-        user_info_service = build('oauth2', 'v2', credentials=token)
+        user_info_service = self.build_service(token, 'oauth2', 'v2')
         user_info = user_info_service.userinfo().get().execute()
 
         return user_info
@@ -82,76 +148,214 @@ class GoogleClient:
         Ref: https://developers.google.com/calendar/api/v3/reference/calendarList/list"""
         response = {}
         items = []
-        with build('calendar', 'v3', credentials=token, cache_discovery=False) as service:
-            request = service.calendarList().list(minAccessRole='writer')
-            while request is not None:
-                try:
-                    response = request.execute()
+        service = self.build_service(token)
+        request = service.calendarList().list(minAccessRole='writer')
+        while request is not None:
+            try:
+                response = request.execute()
 
-                    items += response.get('items', [])
-                except HttpError as e:
-                    logging.warning(f'[google_client.list_calendars] Request Error: {e.status_code}/{e.error_details}')
+                items += response.get('items', [])
+            except HttpError as e:
+                logging.warning(f'[google_client.list_calendars] Request Error: {e.status_code}/{e.error_details}')
 
-                request = service.calendarList().list_next(request, response)
+            request = service.calendarList().list_next(request, response)
 
         return items
 
+    def list_events_request(self, service, calendar_id, time_min, time_max, page_token=None):
+        # Note: list_next can't be used for the next pages, as it chokes on the repeated eventTypes parameter
+        return service.events().list(
+            calendarId=calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            singleEvents=True,
+            orderBy='startTime',
+            eventTypes=self.EVENT_TYPES,
+            fields=','.join(self.EVENT_FIELDS),
+            pageToken=page_token,
+        )
+
     def list_events(self, calendar_id, time_min, time_max, token):
-        response = {}
+        """Raises HttpError if any page of events can't be retrieved, rather than returning part of them"""
         items = []
 
-        # Limit the fields we request
-        fields = ','.join(
-            (
-                'items/status',
-                'items/summary',
-                'items/description',
-                'items/attendees',
-                'items/start',
-                'items/end',
-                'items/transparency',
-                # Top level stuff
-                'nextPageToken',
-            )
-        )
+        service = self.build_service(token)
+        request = self.list_events_request(service, calendar_id, time_min, time_max)
+        while request is not None:
+            response = request.execute()
 
-        # Explicitly ignore workingLocation events
-        # See: https://developers.google.com/calendar/api/v3/reference/events#eventType
-        event_types = ['default', 'focusTime', 'outOfOffice']
-
-        with build('calendar', 'v3', credentials=token, cache_discovery=False) as service:
-            request = service.events().list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime',
-                eventTypes=event_types,
-                fields=fields,
+            items += response.get('items', [])
+
+            request = (
+                self.list_events_request(service, calendar_id, time_min, time_max, response.get('nextPageToken'))
+                if response.get('nextPageToken')
+                else None
             )
-            while request is not None:
-                try:
-                    response = request.execute()
 
-                    items += response.get('items', [])
-                except HttpError as e:
-                    logging.warning(f'[google_client.list_events] Request Error: {e.status_code}/{e.error_details}')
+        return items
 
-                request = service.events().list_next(request, response)
+    def list_events_many(
+        self, calendar_ids: list[str], time_min, time_max, token
+    ) -> tuple[dict[str, list], dict[str, HttpError]]:
+        """Like list_events, but for several calendars the token has access to. Their requests are sent together
+        as batch requests, so it takes one round trip (plus one per extra page of results) instead of one per calendar.
+        Returns the events by calendar id, and the errors by calendar id. Calendars with an error on any of their
+        pages are left out of the events, as only part of their events could be retrieved.
+        Ref: https://developers.google.com/calendar/api/guides/batch"""
+        if len(calendar_ids) == 1:
+            try:
+                return {calendar_ids[0]: self.list_events(calendar_ids[0], time_min, time_max, token)}, {}
+            except HttpError as e:
+                logging.warning(f'[google_client.list_events_many] Request Error: {e.status_code}/{e.error_details}')
+                return {}, {calendar_ids[0]: e}
 
-        return items
+        items = {calendar_id: [] for calendar_id in calendar_ids}
+        errors = {}
 
-    def create_event(self, calendar_id, body, token):
-        response = None
-        with build('calendar', 'v3', credentials=token, cache_discovery=False) as service:
+        service = self.build_service(token)
+        # Batch request ids end up in headers, so refer to the calendars by index instead
+        requests = {
+            str(index): self.list_events_request(service, calendar_id, time_min, time_max)
+            for index, calendar_id in enumerate(calendar_ids)
+        }
+
+        while requests:
+            next_requests = {}
+
+            def callback(request_id, response, exception):
+                calendar_id = calendar_ids[int(request_id)]
+                if exception:
+                    logging.warning(f'[google_client.list_events_many] Request Error: {exception}')
+                    errors[calendar_id] = exception
+                    items.pop(calendar_id)
+                    return
+
+                items[calendar_id] += response.get('items', [])
+
+                if response.get('nextPageToken'):
+                    next_requests[request_id] = self.list_events_request(
+                        service, calendar_id, time_min, time_max, response.get('nextPageToken')
+                    )
+
+            request_ids = list(requests.keys())
+            for offset in range(0, len(request_ids), self.MAX_BATCH_SIZE):
+                batch = service.new_batch_http_request(callback=callback)
+                for request_id in request_ids[offset:offset + self.MAX_BATCH_SIZE]:
+                    batch.add(requests[request_id], request_id=request_id)
+                batch.execute()
+
+            requests = next_requests
+
+        return items, errors
+
+    def list_busy(self, calendar_ids: list[str], time_min, time_max, token) -> dict[str, list]:
+        """Retrieve the busy time ranges of several calendars through a free/busy query, which is a lot lighter
+        than listing their events. Returns the busy ranges ({'start', 'end'}) by calendar id, calendars that
+        couldn't be queried are left out.
+        Ref: https://developers.google.com/calendar/api/v3/reference/freebusy/query"""
+        busy = {}
+
+        service = self.build_service(token)
+        for offset in range(0, len(calendar_ids), self.MAX_BATCH_SIZE):
+            body = {
+                'timeMin': time_min,
+                'timeMax': time_max,
+                'items': [{'id': calendar_id} for calendar_id in calendar_ids[offset:offset + self.MAX_BATCH_SIZE]],
+            }
+
+            try:
+                response = service.freebusy().query(body=body).execute()
+            except HttpError as e:
+                logging.warning(f'[google_client.list_busy] Request Error: {e.status_code}/{e.error_details}')
+                continue
+
+            for calendar_id, calendar in response.get('calendars', {}).items():
+                if calendar.get('errors'):
+                    logging.warning(f'[google_client.list_busy] Calendar Error: {calendar.get("errors")}')
+                    continue
+
+                busy[calendar_id] = calendar.get('busy', [])
+
+        return busy
+
+    def sync_events(self, calendar_id, token, sync_token=None, time_min=None, time_max=None):
+        """Retrieve events for an incremental sync. Pass in the sync_token of the previous sync to only retrieve
+        the events changed since (cancelled ones included), otherwise pass in the time range for a full sync.
+        Returns the events and the sync token for the next call.
+        Raises GoogleSyncTokenExpired if the sync token is no longer valid and a full sync is needed.
+        Ref: https://developers.google.com/calendar/api/guides/sync"""
+        response = {}
+        items = []
+
+        # Query parameters need to stay the same between the full sync and the incremental ones
+        # (except for the time range, which can't be combined with a sync token.)
+        params = {
+            'calendarId': calendar_id,
+            'singleEvents': True,
+            'eventTypes': self.EVENT_TYPES,
+            'fields': ','.join(self.EVENT_FIELDS + ('nextSyncToken',)),
+        }
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            params['timeMin'] = time_min
+            params['timeMax'] = time_max
+
+        service = self.build_service(token)
+        request = service.events().list(**params)
+        while request is not None:
+            # Unlike list_events we can't skip a failed page, as we would lose those changes for good
             try:
-                response = service.events().import_(calendarId=calendar_id, body=body).execute()
+                response = request.execute()
             except HttpError as e:
-                logging.warning(f'[google_client.create_event] Request Error: {e.status_code}/{e.error_details}')
-                raise EventNotCreatedException()
+                if e.status_code == 410:
+                    raise GoogleSyncTokenExpired()
+                raise e
+
+            items += response.get('items', [])
+            request = (
+                service.events().list(**params, pageToken=response.get('nextPageToken'))
+                if response.get('nextPageToken')
+                else None
+            )
+
+        return items, response.get('nextSyncToken')
+
+    def create_event(self, calendar_id, body, token):
+        response = None
+        service = self.build_service(token)
+        try:
+            response = service.events().import_(calendarId=calendar_id, body=body).execute()
+        except HttpError as e:
+            logging.warning(f'[google_client.create_event] Request Error: {e.status_code}/{e.error_details}')
+            raise EventNotCreatedException()
 
         return response
 
+    def watch_events(self, calendar_id, channel_id, channel_token, webhook_url, ttl, token):
+        """Open a channel that notifies the webhook url about any change to the calendar's events.
+        Returns the channel, including its resourceId and expiration (in ms).
+        Ref: https://developers.google.com/calendar/api/guides/push"""
+        service = self.build_service(token)
+        return service.events().watch(
+            calendarId=calendar_id,
+            body={
+                'id': channel_id,
+                'type': 'web_hook',
+                'address': webhook_url,
+                'token': channel_token,
+                'params': {'ttl': str(ttl)},
+            },
+        ).execute()
+
+    def stop_channel(self, channel_id, resource_id, token):
+        """Stop receiving notifications from a channel. Failures are only logged, the channel expires eventually."""
+        service = self.build_service(token)
+        try:
+            service.channels().stop(body={'id': channel_id, 'resourceId': resource_id}).execute()
+        except HttpError as e:
+            logging.warning(f'[google_client.stop_channel] Request Error: {e.status_code}/{e.error_details}')
+
     def delete_event(self, calendar_id, event_id, token):
         pass
 
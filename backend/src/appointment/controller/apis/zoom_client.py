@@ -76,7 +76,7 @@ class ZoomClient:
     def token_saver(self, token):
         """requests-oauth automagically calls this function when it has a new refresh token for us.
         This makes it a bit awkward but we make it work..."""
-        from appointment.dependencies.database import get_db
+        from appointment.dependencies.database import get_engine_and_session
 
         self.client.token = token
 
@@ -84,10 +84,11 @@ class ZoomClient:
         if self.subscriber_id is None:
             return
 
-        # get_db is a generator function, retrieve the only yield
-        repo.external_connection.update_token(
-            next(get_db()), json.dumps(token), self.subscriber_id, models.ExternalConnectionType.zoom
-        )
+        _, session = get_engine_and_session()
+        with session() as db:
+            repo.external_connection.update_token(
+                db, json.dumps(token), self.subscriber_id, models.ExternalConnectionType.zoom
+            )
 
     def get_me(self):
         return self.client.get(f'{self.OAUTH_REQUEST_URL}/users/me').json()
@@ -3,32 +3,164 @@
 Handle connection to a CalDAV server.
 """
 
+import bisect
+import copy
+import itertools
 import json
 import logging
 import time
 import zoneinfo
 import os
+import secrets
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterable, Iterator
 
 import caldav.lib.error
 import requests
 import sentry_sdk
 from redis import Redis, RedisCluster
+from redis.exceptions import LockError
 from caldav import DAVClient
+from caldav.elements import dav
 from fastapi import BackgroundTasks
+from google.auth.exceptions import RefreshError
 from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
 from icalendar import Calendar, Event, vCalAddress, vText
-from datetime import datetime, timedelta, timezone, UTC
+from datetime import date, datetime, timedelta, timezone, UTC
 
 from .. import utils
-from ..defines import REDIS_REMOTE_EVENTS_KEY, DATEFMT
+from ..defines import (
+    REDIS_REMOTE_EVENTS_KEY,
+    REDIS_REMOTE_EVENTS_INDEX_KEY,
+    REDIS_REMOTE_EVENTS_BUST_CHANNEL,
+    REDIS_REMOTE_FETCH_LOCK_KEY,
+    REDIS_REMOTE_SYNC_KEY,
+    DATEFMT,
+)
 from .apis.google_client import GoogleClient
 from ..database.models import CalendarProvider, BookingStatus
 from ..database import schemas, models, repo
 from ..controller.mailer import Attachment
+from ..exceptions.google_api import GoogleSyncTokenExpired
 from ..exceptions.validation import RemoteCalendarConnectionError
 from ..l10n import l10n
 from ..tasks.emails import send_invite_email
 
+# A time range blocked by an event: (start epoch, end epoch, tentative)
+BusyInterval = tuple[float, float, bool]
+
+# Errors of a remote calendar that only skip that calendar, see Tools.list_events_concurrently
+FETCH_ERRORS = (requests.exceptions.RequestException, caldav.lib.error.DAVError, HttpError, RefreshError)
+
+
+class LocalEventCache:
+    """Keeps the decoded events (or busy intervals) of recently read cache keys in this worker, so repeated reads
+    skip the redis round trip and decryption. Entries live for CALENDAR_LOCAL_CACHE_SECONDS (0 turns it off) and the
+    least recently used ones are dropped past CALENDAR_LOCAL_CACHE_SIZE. Busting the redis cache publishes the busted
+    key prefix, which every listening worker drops from its own cache."""
+
+    def __init__(self):
+        self.entries: OrderedDict[str, tuple[float, list]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'l1_hit': 0, 'l1_miss': 0, 'redis_hit': 0, 'redis_miss': 0}
+        self.listener = None
+
+    @staticmethod
+    def ttl() -> int:
+        return int(os.getenv('CALENDAR_LOCAL_CACHE_SECONDS', 30))
+
+    def get(self, key: str) -> list | None:
+        """Returns the cached items of key, or None if they aren't cached (anymore).
+        The items are shared, so don't modify them."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: str, items: list):
+        ttl = self.ttl()
+        if ttl <= 0:
+            return
+
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, items)
+            self.entries.move_to_end(key)
+            while len(self.entries) > int(os.getenv('CALENDAR_LOCAL_CACHE_SIZE', 2048)):
+                self.entries.popitem(last=False)
+
+    def invalidate(self, prefix: str):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def count(self, tier: str, hits: int, misses: int):
+        """Counts cache hits and misses of a tier (l1 or redis) here and in our metrics"""
+        with self.lock:
+            self.stats[f'{tier}_hit'] += hits
+            self.stats[f'{tier}_miss'] += misses
+
+        if hits:
+            sentry_sdk.metrics.incr('calendar.cache.hit', hits, tags={'tier': tier})
+        if misses:
+            sentry_sdk.metrics.incr('calendar.cache.miss', misses, tags={'tier': tier})
+
+    def listen(self, redis_instance: Redis | RedisCluster):
+        """Drops the prefixes other workers bust from this worker's cache, in a background thread"""
+        if self.listener is not None or self.ttl() <= 0:
+            return
+
+        pubsub = redis_instance.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{REDIS_REMOTE_EVENTS_BUST_CHANNEL: lambda message: self.invalidate(message['data'])})
+        self.listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop(self):
+        if self.listener is None:
+            return
+
+        self.listener.stop()
+        self.listener = None
+        self.clear()
+
+
+local_events = LocalEventCache()
+
+# Refreshes stale cached days in the background, see BaseConnector.revalidate_cached_days
+revalidations = ThreadPoolExecutor(max_workers=4, thread_name_prefix='revalidate_events')
+
+# Fetches the events of remote calendars, see Tools.list_events_concurrently. Its threads live as long as the worker,
+# so the keep-alive connections they hold (see google_client.get_http) are reused across requests.
+_calendar_fetches: ThreadPoolExecutor | None = None
+_calendar_fetches_lock = threading.Lock()
+
+
+def calendar_fetch_executor() -> ThreadPoolExecutor:
+    """Returns this worker's executor for remote calendar fetches, sized by CALENDAR_FETCH_MAX_WORKERS"""
+    global _calendar_fetches
+    if _calendar_fetches is None:
+        with _calendar_fetches_lock:
+            if _calendar_fetches is None:
+                _calendar_fetches = ThreadPoolExecutor(
+                    max_workers=int(os.getenv('CALENDAR_FETCH_MAX_WORKERS', 8)), thread_name_prefix='list_events'
+                )
+
+    return _calendar_fetches
+
 
 class BaseConnector:
     redis_instance: Redis | RedisCluster | None
@@ -39,49 +171,353 @@ class BaseConnector:
         self.redis_instance = redis_instance
         self.subscriber_id = subscriber_id
         self.calendar_id = calendar_id
+        # The locks we hold on fetching a date range, by whether it's for busy intervals, see lock_fetch
+        self.fetch_locks = {}
+        # Set on the connectors refreshing stale cached days, see revalidate_cached_days
+        self.revalidating = False
 
     def obscure_key(self, key):
-        """Obscure part of a key with our encryption algo"""
+        """Obscure part of a key with a keyed hash, see utils.hash_cache_key"""
+        return utils.hash_cache_key(key)
+
+    def legacy_obscure_key(self, key):
+        """Obscure part of a key with our encryption algo, like we used to. Only used to find what was cached before,
+        while REDIS_LEGACY_KEYS is on."""
         return utils.setup_encryption_engine().encrypt(key)
 
-    def get_key_body(self, only_subscriber=False):
-        parts = [self.obscure_key(self.subscriber_id)]
+    @staticmethod
+    def use_legacy_keys() -> bool:
+        return os.getenv('REDIS_LEGACY_KEYS', 'true').lower() in ('true', '1')
+
+    def get_key_body(self, only_subscriber=False, legacy=False):
+        obscure_key = self.legacy_obscure_key if legacy else self.obscure_key
+        # The subscriber part is a hash tag, so in cluster mode all of a subscriber's keys are in the same slot
+        parts = [f'{{{obscure_key(self.subscriber_id)}}}']
         if not only_subscriber:
-            parts.append(self.obscure_key(self.calendar_id))
+            parts.append(obscure_key(self.calendar_id))
 
         return ':'.join(parts)
 
-    def get_cached_events(self, key_scope):
-        """Retrieve any cached events, else returns None if redis is not available or there's no cache."""
+    def get_cache_key(self, key_scope, key_body=None):
+        return f'{REDIS_REMOTE_EVENTS_KEY}:{key_body or self.get_key_body()}:{self.obscure_key(key_scope)}'
+
+    def get_cache_index_key(self, legacy=False):
+        """A set of the subscriber's cached event keys, so they can be busted without scanning for them"""
+        return f'{REDIS_REMOTE_EVENTS_INDEX_KEY}:{self.get_key_body(only_subscriber=True, legacy=legacy)}'
+
+    def get_cached_events(
+        self, start, end, wait_until: float | None = None
+    ) -> tuple[list[schemas.Event], tuple[str, str] | None]:
+        """Assembles the events in given date range from the cached days, see get_cached_days."""
+        return self.get_cached_days(start, end, busy=False, wait_until=wait_until)
+
+    def put_cached_events(
+        self,
+        start,
+        fetch_start,
+        fetch_end,
+        events: list[schemas.Event],
+        expiry=os.getenv('REDIS_EVENT_EXPIRE_SECONDS', 900),
+    ) -> list[schemas.Event]:
+        """Caches the events fetched for the missing days of a date range, see put_cached_days."""
+        return self.put_cached_days(start, fetch_start, fetch_end, events, busy=False, expiry=expiry)
+
+    def get_cached_busy(
+        self, start, end, wait_until: float | None = None
+    ) -> tuple[list[BusyInterval], tuple[str, str] | None]:
+        """Assembles the busy intervals in given date range from the cached days, see get_cached_days."""
+        return self.get_cached_days(start, end, busy=True, wait_until=wait_until)
+
+    def put_cached_busy(
+        self,
+        start,
+        fetch_start,
+        fetch_end,
+        busy: list[BusyInterval],
+        expiry=os.getenv('REDIS_EVENT_EXPIRE_SECONDS', 900),
+    ) -> list[BusyInterval]:
+        """Caches the busy intervals fetched for the missing days of a date range, see put_cached_days."""
+        return self.put_cached_days(start, fetch_start, fetch_end, busy, busy=True, expiry=expiry)
+
+    @staticmethod
+    def cache_days(start, end) -> list[date]:
+        """The (UTC) days of a date range, end excluded. Remote events are cached by day, so date ranges that
+        overlap can share what's cached."""
+        first_day = datetime.strptime(start, DATEFMT).date()
+        last_day = datetime.strptime(end, DATEFMT).date()
+        return [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days)]
+
+    @staticmethod
+    def day_start(day: date) -> datetime:
+        return datetime.combine(day, datetime.min.time(), UTC)
+
+    @staticmethod
+    def item_overlaps(item: schemas.Event | BusyInterval, start: datetime, end: datetime) -> bool:
+        """Checks if an event or a busy interval overlaps with the given UTC time range"""
+        if isinstance(item, tuple):
+            return item[0] < end.timestamp() and item[1] > start.timestamp()
+
+        return Tools.overlaps(item, start, end)
+
+    def get_cached_days(
+        self, start, end, busy=False, wait_until: float | None = None
+    ) -> tuple[list, tuple[str, str] | None]:
+        """Assembles the events (or busy intervals) in given date range from the cached days. Returns them along with
+        the date range that still needs to be fetched, from the first to the last missing day, or None if it's all
+        cached. Items overlapping several days are cached in each of them, but only returned from the first one.
+        Only one caller at a time gets to fetch a missing date range, the others wait for it to be cached (but not past
+        wait_until, a time.monotonic() deadline, if given)."""
+        days = self.cache_days(start, end)
+        if not days:
+            return [], None
         if self.redis_instance is None:
+            return [], (start, end)
+
+        timer_boot = time.perf_counter_ns()
+
+        cached, stale_days = self.read_cached_days(days, busy)
+        fetch_range = self.missing_range(days, cached)
+
+        if stale_days:
+            # Serve the stale days as they are, and have them refreshed in the background
+            self.revalidate_cached_days(stale_days[0], stale_days[-1] + timedelta(days=1), busy)
+
+        if fetch_range is not None and not self.lock_fetch(*fetch_range, busy, wait_until=wait_until):
+            if self.revalidating:
+                # Someone else is already refreshing these days
+                return [], None
+
+            # Someone else just fetched (or gave up on) the missing days, see what they cached
+            cached, _ = self.read_cached_days(days, busy)
+            fetch_range = self.missing_range(days, cached)
+            if fetch_range is not None:
+                self.lock_fetch(*fetch_range, busy, blocking=False)
+
+        items = []
+        for day, day_items in zip(days, cached):
+            if day_items is None or (fetch_range and fetch_range[0] <= day < fetch_range[1]):
+                continue
+
+            day_start = self.day_start(day)
+            items.extend(
+                item
+                for item in day_items
+                if day == days[0] or not self.item_overlaps(item, day_start - timedelta(days=1), day_start)
+            )
+
+        measurement = 'redis_get_miss_time' if fetch_range else 'redis_get_hit_time'
+        sentry_sdk.set_measurement(measurement, time.perf_counter_ns() - timer_boot, 'nanosecond')
+
+        if fetch_range is None:
+            return items, None
+
+        return items, (fetch_range[0].strftime(DATEFMT), fetch_range[1].strftime(DATEFMT))
+
+    def read_cached_days(self, days: list[date], busy=False) -> tuple[list[list | None], list[date]]:
+        """Reads the cached items of each day, or None for the days that aren't cached, along with the cached days
+        that are stale. Stale days are only served in stale-while-revalidate mode (CALENDAR_STALE_SECONDS), and count
+        as missing when they're being revalidated."""
+        key_body = self.get_key_body()
+        prefix = 'busy_' if busy else ''
+        keys = [self.get_cache_key(f'{prefix}{day}', key_body) for day in days]
+
+        # Look in this worker's cache first, and only ask redis for the rest
+        cached = [None if self.revalidating else local_events.get(key) for key in keys]
+        remote_keys = [key for key, day_items in zip(keys, cached) if day_items is None]
+        local_events.count('l1', len(keys) - len(remote_keys), len(remote_keys))
+
+        stale_days = []
+        if remote_keys:
+            now = time.time()
+            serve_stale = not self.revalidating and int(os.getenv('CALENDAR_STALE_SECONDS', 0)) > 0
+            values = iter(self.redis_instance.mget(remote_keys))
+            for index, day_items in enumerate(cached):
+                if day_items is not None:
+                    continue
+
+                value = next(values)
+                if value is None:
+                    continue
+
+                fresh_until, _, blob = value.rpartition(':')
+                is_stale = fresh_until != '' and float(fresh_until) <= now
+                if is_stale and not serve_stale:
+                    continue
+
+                cached[index] = self.load_cached_busy(blob) if busy else schemas.Event.model_load_redis_many(blob)
+                if is_stale:
+                    stale_days.append(days[index])
+                else:
+                    local_events.put(keys[index], cached[index])
+
+            redis_misses = cached.count(None)
+            local_events.count('redis', len(remote_keys) - redis_misses, redis_misses)
+
+        return cached, stale_days
+
+    @staticmethod
+    def missing_range(days: list[date], cached: list[list | None]) -> tuple[date, date] | None:
+        """The date range from the first to the last day that isn't cached, or None if they're all cached"""
+        missing_days = [day for day, day_items in zip(days, cached) if day_items is None]
+        return (missing_days[0], missing_days[-1] + timedelta(days=1)) if missing_days else None
+
+    def lock_fetch(
+        self, fetch_start: date, fetch_end: date, busy=False, blocking=True, wait_until: float | None = None
+    ) -> bool:
+        """Takes the lock on fetching a date range of this calendar, so a popular calendar isn't fetched by every
+        caller at once when its cache expires. Returns False if someone else held the lock, after waiting up to
+        CALENDAR_FETCH_LOCK_WAIT_SECONDS (or until wait_until) for them to release it (unless blocking is off, or
+        we're revalidating).
+        The lock is released once the fetched items are cached, see put_cached_days and release_fetch_lock."""
+        scope = f'{"busy_" if busy else ""}{fetch_start}:{fetch_end}'
+        lock = self.redis_instance.lock(
+            f'{REDIS_REMOTE_FETCH_LOCK_KEY}:{self.get_key_body()}:{self.obscure_key(scope)}',
+            timeout=int(os.getenv('CALENDAR_FETCH_LOCK_SECONDS', 20)),
+            sleep=0.05,
+        )
+
+        if lock.acquire(blocking=False):
+            self.fetch_locks[busy] = lock
+            return True
+
+        if blocking and not self.revalidating:
+            # Wait for the lock to be released, but don't take it ourselves
+            timer_boot = time.perf_counter_ns()
+            wait_until = min(self.lock_wait_until(), wait_until or float('inf'))
+            while lock.locked() and time.monotonic() < wait_until:
+                time.sleep(0.05)
+            sentry_sdk.set_measurement('redis_lock_wait_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+
+        return False
+
+    @staticmethod
+    def lock_wait_until() -> float:
+        """Until when to wait for someone else's fetch, see lock_fetch"""
+        return time.monotonic() + float(os.getenv('CALENDAR_FETCH_LOCK_WAIT_SECONDS', 10))
+
+    def release_fetch_lock(self, busy=False):
+        """Releases the lock on fetching events (or busy intervals), if we hold it"""
+        lock = self.fetch_locks.pop(busy, None)
+        if lock is None:
+            return
+
+        try:
+            lock.release()
+        except LockError:
+            # It expired, and someone else may have taken it by now
+            pass
+
+    def revalidate_cached_days(self, fetch_start: date, fetch_end: date, busy=False) -> Future | None:
+        """Refreshes stale cached days in the background, with a copy of this connector that ignores stale days"""
+        connector = copy.copy(self)
+        connector.fetch_locks = {}
+        connector.revalidating = True
+
+        def revalidate():
+            try:
+                list_items = connector.list_busy if busy else connector.list_events
+                list_items(fetch_start.strftime(DATEFMT), fetch_end.strftime(DATEFMT))
+            except Exception as ex:
+                logging.warning(f'[calendar.revalidate_cached_days] Calendar {self.calendar_id} failed: {ex}')
+
+        try:
+            return revalidations.submit(revalidate)
+        except RuntimeError:
+            # We're shutting down
             return None
 
-        key_scope = self.obscure_key(key_scope)
+    def put_cached_days(
+        self,
+        start,
+        fetch_start,
+        fetch_end,
+        items: list,
+        busy=False,
+        expiry=os.getenv('REDIS_EVENT_EXPIRE_SECONDS', 900),
+    ) -> list:
+        """Caches the events (or busy intervals) fetched for the missing days of a date range starting at start.
+        Returns the fetched items that weren't already returned from the cached days before fetch_start."""
+        range_start = self.day_start(datetime.strptime(start, DATEFMT).date())
+        fetch_range_start = self.day_start(datetime.strptime(fetch_start, DATEFMT).date())
+
+        if self.redis_instance is not None:
+            timer_boot = time.perf_counter_ns()
+
+            key_body = self.get_key_body()
+            prefix = 'busy_' if busy else ''
+            fresh_until = int(time.time()) + int(expiry)
+            stale_seconds = int(os.getenv('CALENDAR_STALE_SECONDS', 0))
+            keys = []
+            pipeline = self.redis_instance.pipeline(transaction=False)
+            for day in self.cache_days(fetch_start, fetch_end):
+                day_start = self.day_start(day)
+                day_end = day_start + timedelta(days=1)
+                day_items = [item for item in items if self.item_overlaps(item, day_start, day_end)]
+                keys.append(self.get_cache_key(f'{prefix}{day}', key_body))
+                local_events.put(keys[-1], day_items)
+                blob = self.dump_cached_busy(day_items) if busy else schemas.Event.model_dump_redis_many(day_items)
+                # Stale days are kept around for a while longer, in case they're served while being refreshed
+                pipeline.set(keys[-1], value=f'{fresh_until}:{blob}', ex=int(expiry) + stale_seconds)
+
+            if keys:
+                # Keys that expired in the meantime are left in the index, unlinking them later is a no-op
+                index_key = self.get_cache_index_key()
+                pipeline.sadd(index_key, *keys)
+                pipeline.expire(index_key, int(os.getenv('REDIS_EVENT_INDEX_EXPIRE_SECONDS', 604800)))
+            pipeline.execute()
+            self.release_fetch_lock(busy)
+
+            sentry_sdk.set_measurement('redis_put_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+
+        if fetch_range_start <= range_start:
+            return items
+
+        return [item for item in items if not self.item_overlaps(item, range_start, fetch_range_start)]
 
-        timer_boot = time.perf_counter_ns()
+    @staticmethod
+    def dump_cached_busy(busy: list[BusyInterval]) -> str:
+        return utils.setup_encryption_engine().encrypt(json.dumps(busy))
 
-        encrypted_events = self.redis_instance.get(f'{REDIS_REMOTE_EVENTS_KEY}:{self.get_key_body()}:{key_scope}')
-        if encrypted_events is None:
-            sentry_sdk.set_measurement('redis_get_miss_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+    @staticmethod
+    def load_cached_busy(encrypted_busy) -> list[BusyInterval]:
+        return [tuple(interval) for interval in json.loads(utils.setup_encryption_engine().decrypt(encrypted_busy))]
+
+    def get_event_store(self) -> dict | None:
+        """Retrieve the local copy of this calendar's events kept up to date by incremental syncs.
+        Returns None if redis is not available or there's no local copy yet."""
+        if self.redis_instance is None:
             return None
 
-        sentry_sdk.set_measurement('redis_get_hit_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+        store = self.redis_instance.get(f'{REDIS_REMOTE_SYNC_KEY}:{self.get_key_body()}')
+        if store is None:
+            return self.get_legacy_event_store() if self.use_legacy_keys() else None
 
-        return [schemas.Event.model_load_redis(blob) for blob in json.loads(encrypted_events)]
+        return json.loads(store)
 
-    def put_cached_events(self, key_scope, events: list[schemas.Event], expiry=os.getenv('REDIS_EVENT_EXPIRE_SECONDS', 900)):
-        """Sets the passed cached events with an option to set a custom expiry time."""
+    def get_legacy_event_store(self) -> dict | None:
+        """Retrieve the local copy of this calendar's events kept under an encrypted key, so it doesn't have to be
+        synced in full again. Its events are keyed like we do now, and it's stored under the new key on the next sync.
+        """
+        store = self.redis_instance.get(f'{REDIS_REMOTE_SYNC_KEY}:{self.get_key_body(legacy=True)}')
+        if store is None:
+            return None
+
+        store = json.loads(store)
+        if 'events' in store:
+            decrypt = utils.setup_encryption_engine().decrypt
+            store['events'] = {self.obscure_key(decrypt(key)): value for key, value in store['events'].items()}
+
+        return store
+
+    def put_event_store(self, store: dict, expiry=os.getenv('REDIS_SYNC_EXPIRE_SECONDS', 604800)):
+        """Sets the local copy of this calendar's events. Events and sync tokens should be encrypted already."""
         if self.redis_instance is None:
             return False
 
-        key_scope = self.obscure_key(key_scope)
         timer_boot = time.perf_counter_ns()
 
-        encrypted_events = json.dumps([event.model_dump_redis() for event in events])
-        self.redis_instance.set(
-            f'{REDIS_REMOTE_EVENTS_KEY}:{self.get_key_body()}:{key_scope}', value=encrypted_events, ex=expiry
-        )
-        sentry_sdk.set_measurement('redis_put_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+        self.redis_instance.set(f'{REDIS_REMOTE_SYNC_KEY}:{self.get_key_body()}', value=json.dumps(store), ex=expiry)
+        sentry_sdk.set_measurement('redis_sync_put_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
 
         return True
 
@@ -93,16 +529,29 @@ class BaseConnector:
 
         timer_boot = time.perf_counter_ns()
 
-        # Scan returns a tuple like: (Cursor start, [...keys found])
-        ret = self.redis_instance.scan(
-            0, f'{REDIS_REMOTE_EVENTS_KEY}:{self.get_key_body(only_subscriber=all_calendars)}:*'
-        )
+        # Workers that haven't been updated yet still cache events under encrypted keys
+        busted = False
+        for legacy in (False, True) if self.use_legacy_keys() else (False,):
+            # Drop the cached events from every worker's local cache too, even if they expired from redis already
+            key_body = self.get_key_body(only_subscriber=all_calendars, legacy=legacy)
+            cache_prefix = f'{REDIS_REMOTE_EVENTS_KEY}:{key_body}:'
+            local_events.invalidate(cache_prefix)
+            self.redis_instance.publish(REDIS_REMOTE_EVENTS_BUST_CHANNEL, cache_prefix)
+
+            index_key = self.get_cache_index_key(legacy=legacy)
+            keys = [key for key in self.redis_instance.smembers(index_key) if key.startswith(cache_prefix)]
+            if len(keys) == 0:
+                continue
 
-        if len(ret[1]) == 0:
-            return False
+            # Unlink frees the memory in the background. Keys cached since we looked stay in the index.
+            pipeline = self.redis_instance.pipeline(transaction=False)
+            pipeline.unlink(*keys)
+            pipeline.srem(index_key, *keys)
+            pipeline.execute()
+            busted = True
 
-        # Expand the list in position 1, which is a list of keys found from the scan
-        self.redis_instance.delete(*ret[1])
+        if not busted:
+            return False
 
         sentry_sdk.set_measurement('redis_bust_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
 
@@ -123,6 +572,8 @@ class GoogleConnector(BaseConnector):
         remote_calendar_id,
         google_client: GoogleClient,
         google_tkn: str = None,
+        google_credentials: Credentials | None = None,
+        watched: bool = False,
     ):
         super().__init__(subscriber_id, calendar_id, redis_instance)
 
@@ -130,9 +581,11 @@ class GoogleConnector(BaseConnector):
         self.google_client = google_client
         self.provider = CalendarProvider.google
         self.remote_calendar_id = remote_calendar_id
-        self.google_token = None
+        # Google notifies us about changes to watched calendars, so their events can be cached for longer
+        self.watched = watched
+        self.google_token = google_credentials
         # Create the creds class from our token (requires a refresh token)
-        if google_tkn:
+        if google_tkn and not google_credentials:
             self.google_token = Credentials.from_authorized_user_info(json.loads(google_tkn), self.google_client.SCOPES)
 
     def test_connection(self) -> bool:
@@ -164,64 +617,279 @@ class GoogleConnector(BaseConnector):
 
     def list_events(self, start, end):
         """find all events in given date range on the remote server"""
-        cache_scope = f'{start}_{end}'
-        cached_events = self.get_cached_events(cache_scope)
-        if cached_events:
-            return cached_events
+        return GoogleConnector.list_events_many([self], start, end)
 
-        time_min = datetime.strptime(start, DATEFMT).isoformat() + 'Z'
-        time_max = datetime.strptime(end, DATEFMT).isoformat() + 'Z'
+    @staticmethod
+    def list_events_many(connectors: list['GoogleConnector'], start, end) -> list[schemas.Event]:
+        """find all events in given date range on several Google calendars.
+        Only the days that aren't cached are retrieved. Calendars that aren't synced locally are requested together,
+        in batches per credentials and missing date range. Waiting for other callers' fetches of these calendars takes
+        CALENDAR_FETCH_LOCK_WAIT_SECONDS at most, for all of them together.
+        If any calendar couldn't be listed, the first error is raised once the others are cached."""
+        events = []
+        misses: dict[tuple[int, str, str], list[GoogleConnector]] = {}
+        errors = []
+        wait_until = BaseConnector.lock_wait_until()
 
-        # We're storing google cal id in user...for now.
-        remote_events = self.google_client.list_events(self.remote_calendar_id, time_min, time_max, self.google_token)
+        try:
+            for con in connectors:
+                cached_events, fetch_range = con.get_cached_events(start, end, wait_until)
+                events.extend(cached_events)
+                if fetch_range is None:
+                    continue
+
+                synced_events = con.sync_events(*fetch_range) if con.use_incremental_sync() else None
+                if synced_events is not None:
+                    events.extend(con.cache_events(start, *fetch_range, synced_events))
+                    continue
+
+                misses.setdefault((id(con.google_token), *fetch_range), []).append(con)
+
+            for (_, fetch_start, fetch_end), group in misses.items():
+                time_min = datetime.strptime(fetch_start, DATEFMT).isoformat() + 'Z'
+                time_max = datetime.strptime(fetch_end, DATEFMT).isoformat() + 'Z'
+
+                # We're storing google cal id in user...for now.
+                remote_calendar_ids = list(dict.fromkeys(con.remote_calendar_id for con in group))
+                remote_events, remote_errors = group[0].google_client.list_events_many(
+                    remote_calendar_ids, time_min, time_max, group[0].google_token
+                )
 
-        events = []
-        for event in remote_events:
-            # If the event doesn't have transparency assume its opaque (and thus blocks time) by default.
-            transparency = event.get('transparency', 'opaque').lower()
-            status = event.get('status').lower()
+                for con in group:
+                    if con.remote_calendar_id in remote_errors:
+                        # Don't cache a failed calendar as having no events
+                        errors.append(remote_errors[con.remote_calendar_id])
+                        continue
+
+                    calendar_events = [
+                        event
+                        for event in map(GoogleConnector.event_from_remote, remote_events[con.remote_calendar_id])
+                        if event is not None
+                    ]
+                    events.extend(con.cache_events(start, fetch_start, fetch_end, calendar_events))
+
+            if errors:
+                raise errors[0]
+        finally:
+            # Don't keep others waiting on a fetch that failed
+            for con in connectors:
+                con.release_fetch_lock()
 
-            # Ignore cancelled events or non-time blocking events
-            if status == 'cancelled' or transparency == 'transparent':
-                continue
+        return events
 
-            # Mark tentative events
-            attendees = event.get('attendees') or []
-            tentative = any(
-                (attendee.get('self') and attendee.get('responseStatus') == 'tentative') for attendee in attendees
-            )
+    def cache_events(self, start, fetch_start, fetch_end, events: list[schemas.Event]) -> list[schemas.Event]:
+        return self.put_cached_events(start, fetch_start, fetch_end, events, expiry=self.cache_expiry())
 
-            summary = event.get('summary', 'Title not found!')
-            description = event.get('description', '')
+    def cache_expiry(self) -> int:
+        """Cache for longer if Google notifies us about changes to this calendar"""
+        if self.watched:
+            return int(os.getenv('REDIS_WATCHED_EVENT_EXPIRE_SECONDS', 21600))
 
-            all_day = 'date' in event.get('start')
+        return int(os.getenv('REDIS_EVENT_EXPIRE_SECONDS', 900))
 
-            start = (
-                datetime.strptime(event.get('start')['date'], DATEFMT)
-                if all_day
-                else datetime.fromisoformat(event.get('start')['dateTime'])
-            )
-            end = (
-                datetime.strptime(event.get('end')['date'], DATEFMT)
-                if all_day
-                else datetime.fromisoformat(event.get('end')['dateTime'])
-            )
+    def list_busy(self, start, end) -> list[BusyInterval]:
+        """find the busy time ranges in given date range on the remote server"""
+        return GoogleConnector.list_busy_many([self], start, end)
 
-            events.append(
-                schemas.Event(
-                    title=summary,
-                    start=start,
-                    end=end,
-                    all_day=all_day,
-                    tentative=tentative,
-                    description=description,
+    @staticmethod
+    def list_busy_many(connectors: list['GoogleConnector'], start, end) -> list[BusyInterval]:
+        """find the busy time ranges in given date range on several Google calendars.
+        Uncached calendars are queried together through freeBusy, per credentials. Google doesn't tell us which
+        busy time is tentative, so none are marked as such. Like list_events_many, waiting for other callers' fetches
+        takes CALENDAR_FETCH_LOCK_WAIT_SECONDS at most for all calendars together."""
+        busy = []
+        misses: dict[tuple[int, str, str], list[GoogleConnector]] = {}
+        wait_until = BaseConnector.lock_wait_until()
+
+        try:
+            for con in connectors:
+                cached_busy, fetch_range = con.get_cached_busy(start, end, wait_until)
+                busy.extend(cached_busy)
+                if fetch_range is not None:
+                    misses.setdefault((id(con.google_token), *fetch_range), []).append(con)
+
+            for (_, fetch_start, fetch_end), group in misses.items():
+                time_min = datetime.strptime(fetch_start, DATEFMT).isoformat() + 'Z'
+                time_max = datetime.strptime(fetch_end, DATEFMT).isoformat() + 'Z'
+
+                # We're storing google cal id in user...for now.
+                remote_calendar_ids = list(dict.fromkeys(con.remote_calendar_id for con in group))
+                remote_busy = group[0].google_client.list_busy(
+                    remote_calendar_ids, time_min, time_max, group[0].google_token
                 )
-            )
 
-        self.put_cached_events(cache_scope, events)
+                for con in group:
+                    if con.remote_calendar_id in remote_busy:
+                        calendar_busy = [
+                            (
+                                datetime.fromisoformat(interval['start']).timestamp(),
+                                datetime.fromisoformat(interval['end']).timestamp(),
+                                False,
+                            )
+                            for interval in remote_busy[con.remote_calendar_id]
+                        ]
+                    else:
+                        # Google couldn't tell us, so fall back to the events
+                        calendar_busy = Tools.busy_from_events(con.list_events(fetch_start, fetch_end))
+
+                    busy.extend(
+                        con.put_cached_busy(start, fetch_start, fetch_end, calendar_busy, expiry=con.cache_expiry())
+                    )
+        finally:
+            # Don't keep others waiting on a fetch that failed
+            for con in connectors:
+                con.release_fetch_lock(busy=True)
+
+        return busy
+
+    def watch_events(self, webhook_url: str) -> models.GoogleCalendarChannel:
+        """Open a push notification channel for this calendar, replacing (and stopping) the current one."""
+        channel_id = uuid.uuid4().hex
+        channel_token = secrets.token_urlsafe(32)
+
+        channel = self.google_client.watch_events(
+            self.remote_calendar_id,
+            channel_id,
+            channel_token,
+            webhook_url,
+            int(os.getenv('GOOGLE_CHANNEL_TTL_SECONDS', 604800)),
+            self.google_token,
+        )
+
+        db_channel = repo.google_calendar_channel.get_by_calendar(self.db, self.calendar_id)
+        if db_channel:
+            self.google_client.stop_channel(db_channel.channel_id, db_channel.resource_id, self.google_token)
+
+        return repo.google_calendar_channel.update_or_create(
+            self.db,
+            calendar_id=self.calendar_id,
+            channel_id=channel_id,
+            resource_id=channel.get('resourceId'),
+            token=channel_token,
+            # Google gives us the expiration in ms
+            expires_at=datetime.fromtimestamp(int(channel.get('expiration')) / 1000, UTC).replace(tzinfo=None),
+        )
+
+    def use_incremental_sync(self) -> bool:
+        """Incremental syncs need somewhere to keep the local copy of the calendar"""
+        return self.redis_instance is not None and os.getenv('GOOGLE_INCREMENTAL_SYNC', 'true').lower() in ('true', '1')
+
+    @staticmethod
+    def sync_window() -> tuple[datetime, datetime]:
+        """The time range a full sync retrieves, relative to today"""
+        today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (
+            today - timedelta(days=int(os.getenv('GOOGLE_SYNC_DAYS_BEFORE', 31))),
+            today + timedelta(days=int(os.getenv('GOOGLE_SYNC_DAYS_AFTER', 183))),
+        )
+
+    def sync_events(self, start, end) -> list[schemas.Event] | None:
+        """Bring the local copy of the calendar up to date and return its events in given date range.
+        Only the changes since the last sync are retrieved, unless Google expired our sync token.
+        Returns None if the date range can't be served from a local copy, or if the sync failed."""
+        encryption = utils.setup_encryption_engine()
+        window_start = datetime.strptime(start, DATEFMT).replace(tzinfo=UTC)
+        window_end = datetime.strptime(end, DATEFMT).replace(tzinfo=UTC)
+
+        def covers(time_min: datetime, time_max: datetime):
+            return time_min <= window_start and window_end <= time_max
+
+        timer_boot = time.perf_counter_ns()
+
+        store = self.get_event_store()
+        if store and not covers(datetime.fromisoformat(store['time_min']), datetime.fromisoformat(store['time_max'])):
+            store = None
+
+        try:
+            if store:
+                try:
+                    remote_events, sync_token = self.google_client.sync_events(
+                        self.remote_calendar_id, self.google_token, sync_token=encryption.decrypt(store['sync_token'])
+                    )
+                except GoogleSyncTokenExpired:
+                    logging.info('[calendar.sync_events] Sync token expired, falling back to a full sync')
+                    store = None
+
+            if not store:
+                time_min, time_max = self.sync_window()
+                if not covers(time_min, time_max):
+                    return None
+
+                store = {'time_min': time_min.isoformat(), 'time_max': time_max.isoformat(), 'events': {}}
+                remote_events, sync_token = self.google_client.sync_events(
+                    self.remote_calendar_id,
+                    self.google_token,
+                    time_min=time_min.isoformat(),
+                    time_max=time_max.isoformat(),
+                )
+        except HttpError as e:
+            logging.warning(f'[calendar.sync_events] Sync failed, falling back to a date range fetch: {e.status_code}')
+            return None
+
+        # Apply the changes, cancelled or no longer time blocking events are removed from the local copy
+        for remote_event in remote_events:
+            event_key = self.obscure_key(remote_event.get('id'))
+            event = self.event_from_remote(remote_event)
+            if event is None:
+                store['events'].pop(event_key, None)
+            else:
+                store['events'][event_key] = event.model_dump_redis()
+
+        store['sync_token'] = encryption.encrypt(sync_token)
+        self.put_event_store(store)
+
+        events = [
+            event
+            for event in map(schemas.Event.model_load_redis, store['events'].values())
+            if Tools.overlaps(event, window_start, window_end)
+        ]
+
+        sentry_sdk.set_measurement('google_sync_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
 
         return events
 
+    @staticmethod
+    def event_from_remote(event: dict) -> schemas.Event | None:
+        """Turns a Google event into ours. Returns None if the event doesn't block any time"""
+        # If the event doesn't have transparency assume its opaque (and thus blocks time) by default.
+        transparency = event.get('transparency', 'opaque').lower()
+        status = event.get('status').lower()
+
+        # Ignore cancelled events or non-time blocking events
+        if status == 'cancelled' or transparency == 'transparent':
+            return None
+
+        # Mark tentative events
+        attendees = event.get('attendees') or []
+        tentative = any(
+            (attendee.get('self') and attendee.get('responseStatus') == 'tentative') for attendee in attendees
+        )
+
+        summary = event.get('summary', 'Title not found!')
+        description = event.get('description', '')
+
+        all_day = 'date' in event.get('start')
+
+        start = (
+            datetime.strptime(event.get('start')['date'], DATEFMT)
+            if all_day
+            else datetime.fromisoformat(event.get('start')['dateTime'])
+        )
+        end = (
+            datetime.strptime(event.get('end')['date'], DATEFMT)
+            if all_day
+            else datetime.fromisoformat(event.get('end')['dateTime'])
+        )
+
+        return schemas.Event(
+            title=summary,
+            start=start,
+            end=end,
+            all_day=all_day,
+            tentative=tentative,
+            description=description,
+        )
+
     def create_event(
         self,
         event: schemas.Event,
@@ -262,14 +930,108 @@ class GoogleConnector(BaseConnector):
 
         return event
 
-    def delete_events(self, start):
+    def delete_events(self, start, end=None):
         """delete all events in given date range from the server
         Not intended to be used in production. For cleaning purposes after testing only.
         """
         pass
 
 
+class PooledDAVClient:
+    """A DAVClient kept in the DAVClientPool, along with the calendars resolved through it"""
+
+    def __init__(self, url: str, user: str, password: str):
+        self.url = url
+        self.user = user
+        self.password = password
+        # A fetch that is given up on by Tools.list_events_concurrently shouldn't keep its thread busy
+        self.client = DAVClient(
+            url=url, username=user, password=password, timeout=float(os.getenv('CALENDAR_FETCH_TIMEOUT', 10))
+        )
+        self.calendars: dict[str, caldav.Calendar] = {}
+        self.last_used = time.monotonic()
+
+    def calendar(self, url: str) -> caldav.Calendar:
+        calendar = self.calendars.get(url)
+        if calendar is None:
+            calendar = self.calendars.setdefault(url, self.client.calendar(url=url))
+
+        return calendar
+
+
+class DAVClientPool:
+    """Keeps idle DAVClients per (url, user) in this worker, so connectors to the same server reuse a requests session
+    and its keep-alive connections instead of doing a new TLS handshake every time.
+    A requests session isn't thread safe, so a client is checked out by one thread at a time, and a new one is made
+    if they're all in use. Up to CALDAV_CLIENT_POOL_SIZE clients are kept per (url, user), and the ones that haven't
+    been used for CALDAV_CLIENT_IDLE_SECONDS are closed. Checked out clients are never closed by the pool."""
+
+    def __init__(self):
+        self.idle: dict[tuple[str, str], list[PooledDAVClient]] = {}
+        self.lock = threading.Lock()
+
+    def checkout(self, url: str, user: str, password: str) -> PooledDAVClient:
+        """Takes a client out of the pool, it's yours until you check it back in"""
+        now = time.monotonic()
+        idle_timeout = int(os.getenv('CALDAV_CLIENT_IDLE_SECONDS', 300))
+        closing = []
+        pooled = None
+
+        with self.lock:
+            for key, clients in list(self.idle.items()):
+                closing += [client for client in clients if now - client.last_used > idle_timeout]
+                clients[:] = [client for client in clients if now - client.last_used <= idle_timeout]
+                if not clients:
+                    del self.idle[key]
+
+            clients = self.idle.get((url, user), [])
+            while clients and pooled is None:
+                pooled = clients.pop()
+                # A changed password needs a new session
+                if pooled.password != password:
+                    closing.append(pooled)
+                    pooled = None
+
+        for client in closing:
+            client.client.close()
+
+        return pooled or PooledDAVClient(url, user, password)
+
+    def checkin(self, pooled: PooledDAVClient):
+        """Returns a checked out client to the pool, it's closed if the pool is full"""
+        pooled.last_used = time.monotonic()
+
+        with self.lock:
+            clients = self.idle.setdefault((pooled.url, pooled.user), [])
+            if len(clients) < int(os.getenv('CALDAV_CLIENT_POOL_SIZE', 4)):
+                clients.append(pooled)
+                return
+
+        pooled.client.close()
+
+    @contextmanager
+    def client(self, url: str, user: str, password: str) -> Iterator[PooledDAVClient]:
+        pooled = self.checkout(url, user, password)
+        try:
+            yield pooled
+        finally:
+            self.checkin(pooled)
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+
+        for clients in idle.values():
+            for pooled in clients:
+                pooled.client.close()
+
+
+dav_clients = DAVClientPool()
+
+
 class CalDavConnector(BaseConnector):
+    MAX_MULTIGET_SIZE = 100
+
     def __init__(self, subscriber_id: int, calendar_id: int, redis_instance, url: str, user: str, password: str):
         super().__init__(subscriber_id, calendar_id, redis_instance)
 
@@ -277,16 +1039,35 @@ class CalDavConnector(BaseConnector):
         self.url = url if url[-1] == '/' else url + '/'
         self.password = password
         self.user = user
+        # The pooled client each thread has checked out, see connection
+        self.checked_out = threading.local()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledDAVClient]:
+        """Checks a client to the CalDAV server out of this worker's pool for the current thread.
+        Nested uses in the same thread share it."""
+        pooled = getattr(self.checked_out, 'pooled', None)
+        if pooled is not None:
+            yield pooled
+            return
+
+        with dav_clients.client(self.url, self.user, self.password) as pooled:
+            self.checked_out.pooled = pooled
+            try:
+                yield pooled
+            finally:
+                self.checked_out.pooled = None
 
-        # connect to the CalDAV server
-        self.client = DAVClient(url=url, username=user, password=password)
+    def calendar(self) -> caldav.Calendar:
+        """The connected calendar, resolved once per pooled client. Only call it inside connection()"""
+        return self.checked_out.pooled.calendar(self.url)
 
     def test_connection(self) -> bool:
         """Ensure the connection information is correct and the calendar connection works"""
 
         try:
-            cal = self.client.calendar(url=self.url)
-            supported_comps = cal.get_supported_components()
+            with self.connection():
+                supported_comps = self.calendar().get_supported_components()
         except IndexError as ex:  # Library has an issue with top level urls, probably due to caldav spec?
             logging.error(f'Error testing connection {ex}')
             return False
@@ -308,103 +1089,413 @@ class CalDavConnector(BaseConnector):
     def list_calendars(self):
         """find all calendars on the remote server"""
         calendars = []
-        principal = self.client.principal()
-        for c in principal.calendars():
-            calendars.append(
-                schemas.CalendarConnectionOut(
-                    title=c.name,
-                    url=str(c.url),
-                    user=self.user,
+        with self.connection() as pooled:
+            principal = pooled.client.principal()
+            for c in principal.calendars():
+                calendars.append(
+                    schemas.CalendarConnectionOut(
+                        title=c.name,
+                        url=str(c.url),
+                        user=self.user,
+                    )
                 )
-            )
         return calendars
 
     def list_events(self, start, end):
-        """find all events in given date range on the remote server"""
-        cache_scope = f'{start}_{end}'
-        cached_events = self.get_cached_events(cache_scope)
-        if cached_events:
+        """find all events in given date range on the remote server, only the days that aren't cached are retrieved"""
+        cached_events, fetch_range = self.get_cached_events(start, end)
+        if fetch_range is None:
             return cached_events
 
-        events = []
-        calendar = self.client.calendar(url=self.url)
-        result = calendar.search(
-            start=datetime.strptime(start, DATEFMT),
-            end=datetime.strptime(end, DATEFMT),
-            event=True,
-            expand=True,
+        try:
+            return cached_events + self.put_cached_events(start, *fetch_range, self.fetch_events(*fetch_range))
+        finally:
+            # Don't keep others waiting on a fetch that failed
+            self.release_fetch_lock()
+
+    def fetch_events(self, fetch_start, fetch_end) -> list[schemas.Event]:
+        """Retrieves the events in given date range from the remote server, or our local copy of it"""
+        with self.connection():
+            synced_events = self.sync_events(fetch_start, fetch_end) if self.use_incremental_sync() else None
+            if synced_events is not None:
+                return synced_events
+
+            result = self.calendar().search(
+                start=datetime.strptime(fetch_start, DATEFMT),
+                end=datetime.strptime(fetch_end, DATEFMT),
+                event=True,
+                expand=True,
+            )
+            return [event for event in (self.event_from_component(e.icalendar_component) for e in result) if event]
+
+    def use_incremental_sync(self) -> bool:
+        """Incremental syncs need somewhere to keep the local copy of the calendar"""
+        return self.redis_instance is not None and os.getenv('CALDAV_INCREMENTAL_SYNC', 'true').lower() in ('true', '1')
+
+    @staticmethod
+    def sync_window() -> tuple[datetime, datetime]:
+        """The time range a full sync retrieves, relative to today"""
+        today = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (
+            today - timedelta(days=int(os.getenv('CALDAV_SYNC_DAYS_BEFORE', 31))),
+            today + timedelta(days=int(os.getenv('CALDAV_SYNC_DAYS_AFTER', 183))),
         )
-        for e in result:
-            transparency = e.icalendar_component['transp'].lower() if 'transp' in e.icalendar_component else 'opaque'
-            status = e.icalendar_component['status'].lower() if 'status' in e.icalendar_component else ''
 
-            # Ignore cancelled events
-            if status == 'cancelled' or transparency == 'transparent':
-                continue
+    def sync_events(self, start, end) -> list[schemas.Event] | None:
+        """Bring the local copy of the calendar up to date and return its events in given date range.
+        Changes since the last sync are listed with a sync-collection report (RFC 6578),
+        and only the changed events are retrieved, through a calendar-multiget report.
+        Returns None if the date range can't be served from a local copy, or if the server doesn't support syncing.
+        Only call it inside connection()."""
+        encryption = utils.setup_encryption_engine()
+        window_start = datetime.strptime(start, DATEFMT).replace(tzinfo=UTC)
+        window_end = datetime.strptime(end, DATEFMT).replace(tzinfo=UTC)
 
-            # Mark tentative events
-            tentative = status == 'tentative'
+        def covers(time_min: datetime, time_max: datetime):
+            return time_min <= window_start and window_end <= time_max
 
-            title = e.vobject_instance.vevent.summary.value
-            start = e.vobject_instance.vevent.dtstart.value
-            # get_duration grabs either end or duration into a timedelta
-            end = start + e.get_duration()
-            # if start doesn't hold time information (no datetime), it's a whole day
-            all_day = not isinstance(start, datetime)
+        timer_boot = time.perf_counter_ns()
 
-            events.append(
-                schemas.Event(
-                    title=title,
-                    start=start,
-                    end=end,
-                    all_day=all_day,
-                    tentative=tentative,
-                    description=e.icalendar_component['description'] if 'description' in e.icalendar_component else '',
-                )
-            )
+        store = self.get_event_store()
+        if store and store.get('unsupported'):
+            return None
+        if store and not covers(datetime.fromisoformat(store['time_min']), datetime.fromisoformat(store['time_max'])):
+            store = None
+
+        calendar = self.calendar()
+        try:
+            if store:
+                try:
+                    changes = calendar.objects_by_sync_token(encryption.decrypt(store['sync_token']))
+                    self.apply_changes(calendar, store, changes)
+                except caldav.lib.error.DAVError as ex:
+                    logging.info(f'[calendar.sync_events] Sync token rejected, falling back to a full sync: {ex}')
+                    store = None
+
+            if not store:
+                time_min, time_max = self.sync_window()
+                if not covers(time_min, time_max):
+                    return None
+
+                # Get the token first, changes made while we search are then picked up by the next sync
+                changes = calendar.objects_by_sync_token()
+                store = {'time_min': time_min.isoformat(), 'time_max': time_max.isoformat(), 'events': {}}
+                for e in calendar.search(start=time_min, end=time_max, event=True, expand=True):
+                    event = self.event_from_component(e.icalendar_component)
+                    if event:
+                        store['events'].setdefault(self.obscure_key(str(e.url.canonical())), []).append(
+                            event.model_dump_redis()
+                        )
+        except caldav.lib.error.DAVError as ex:
+            # Don't retry on every request if the server doesn't know about sync-collection
+            logging.info(f'[calendar.sync_events] Sync failed, falling back to a date range fetch: {ex}')
+            self.put_event_store({'unsupported': True}, expiry=int(os.getenv('REDIS_EVENT_EXPIRE_SECONDS', 900)))
+            return None
+        except requests.exceptions.RequestException as ex:
+            logging.warning(f'[calendar.sync_events] Sync failed, falling back to a date range fetch: {ex}')
+            return None
+
+        store['sync_token'] = encryption.encrypt(changes.sync_token)
+        self.put_event_store(store)
+
+        events = [
+            event
+            for event in map(schemas.Event.model_load_redis, itertools.chain.from_iterable(store['events'].values()))
+            if Tools.overlaps(event, window_start, window_end)
+        ]
 
-        self.put_cached_events(cache_scope, events)
+        sentry_sdk.set_measurement('caldav_sync_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
 
         return events
 
+    def apply_changes(self, calendar: caldav.Calendar, store: dict, changes: Iterable[caldav.CalendarObjectResource]):
+        """Applies the objects listed by a sync-collection report to the local copy.
+        Deleted objects come without an etag, the others are retrieved in batches and expanded over the store range."""
+        time_min = datetime.fromisoformat(store['time_min'])
+        time_max = datetime.fromisoformat(store['time_max'])
+
+        changed_urls = []
+        for obj in changes:
+            if obj.props.get(dav.GetEtag.tag):
+                changed_urls.append(obj.url.canonical())
+            else:
+                store['events'].pop(self.obscure_key(str(obj.url.canonical())), None)
+
+        for offset in range(0, len(changed_urls), self.MAX_MULTIGET_SIZE):
+            urls = changed_urls[offset:offset + self.MAX_MULTIGET_SIZE]
+            # Objects deleted in the meantime are missing from the response, or come back without data
+            objects = {str(obj.url.canonical()): obj for obj in calendar.calendar_multiget(urls) if obj.data}
+
+            for url in map(str, urls):
+                key = self.obscure_key(url)
+                if url not in objects:
+                    store['events'].pop(key, None)
+                    continue
+
+                obj = objects[url]
+                obj.expand_rrule(time_min, time_max)
+                events = [
+                    event.model_dump_redis()
+                    for event in map(self.event_from_component, obj.icalendar_instance.walk('VEVENT'))
+                    if event
+                ]
+                if events:
+                    store['events'][key] = events
+                else:
+                    store['events'].pop(key, None)
+
+    @staticmethod
+    def event_from_component(component) -> schemas.Event | None:
+        """Turns a VEVENT into our event. Returns None if the event doesn't block any time"""
+        transparency = component['transp'].lower() if 'transp' in component else 'opaque'
+        status = component['status'].lower() if 'status' in component else ''
+
+        # Ignore cancelled events
+        if status == 'cancelled' or transparency == 'transparent':
+            return None
+
+        # Mark tentative events
+        tentative = status == 'tentative'
+
+        start = component.decoded('dtstart')
+        # if start doesn't hold time information (no datetime), it's a whole day
+        all_day = not isinstance(start, datetime)
+
+        # Events either have an end, a duration, or last a day (or not at all) if they have neither
+        if 'duration' in component:
+            end = start + component.decoded('duration')
+        elif 'dtend' in component:
+            end = component.decoded('dtend')
+        else:
+            end = start + timedelta(days=1) if all_day else start
+
+        return schemas.Event(
+            title=str(component['summary']) if 'summary' in component else '',
+            start=start,
+            end=end,
+            all_day=all_day,
+            tentative=tentative,
+            description=component['description'] if 'description' in component else '',
+        )
+
+    def list_busy(self, start, end) -> list[BusyInterval]:
+        """find the busy time ranges in given date range on the remote server.
+        Uses a free-busy-query REPORT, or the events themselves if the server doesn't support it."""
+        cached_busy, fetch_range = self.get_cached_busy(start, end)
+        if fetch_range is None:
+            return cached_busy
+
+        try:
+            return cached_busy + self.put_cached_busy(start, *fetch_range, self.fetch_busy(*fetch_range))
+        finally:
+            # Don't keep others waiting on a fetch that failed
+            self.release_fetch_lock(busy=True)
+
+    def fetch_busy(self, fetch_start, fetch_end) -> list[BusyInterval]:
+        """Retrieves the busy time ranges in given date range from the remote server"""
+        with self.connection():
+            try:
+                freebusy = self.calendar().freebusy_request(
+                    datetime.strptime(fetch_start, DATEFMT), datetime.strptime(fetch_end, DATEFMT)
+                )
+                return self.busy_from_freebusy(freebusy.icalendar_instance)
+            except (caldav.lib.error.DAVError, ValueError, AttributeError) as ex:
+                logging.info(f'[calendar.fetch_busy] Free busy query not supported, falling back to events: {ex}')
+                return Tools.busy_from_events(self.list_events(fetch_start, fetch_end))
+
+    @staticmethod
+    def busy_from_freebusy(freebusy: Calendar) -> list[BusyInterval]:
+        """Turns the periods of a VFREEBUSY response into busy intervals, free periods are skipped"""
+        busy = []
+        for component in freebusy.walk('VFREEBUSY'):
+            periods = component.get('FREEBUSY', [])
+            for period in periods if isinstance(periods, list) else [periods]:
+                fb_type = period.params.get('FBTYPE', 'BUSY').upper()
+                if fb_type == 'FREE':
+                    continue
+
+                # Periods either have an end or a duration
+                period_start, period_end = period.dt
+                if isinstance(period_end, timedelta):
+                    period_end = period_start + period_end
+
+                busy.append((period_start.timestamp(), period_end.timestamp(), fb_type == 'BUSY-TENTATIVE'))
+
+        return busy
+
     def create_event(
         self, event: schemas.Event, attendee: schemas.AttendeeBase, organizer: schemas.Subscriber, organizer_email: str
     ):
         """add a new event to the connected calendar"""
-        calendar = self.client.calendar(url=self.url)
-        # save event
-        caldav_event = calendar.save_event(
-            uid=event.uuid,
-            dtstart=event.start,
-            dtend=event.end,
-            summary=event.title,
-            # TODO: handle location
-            description=event.description,
-        )
-        # save attendee data
-        caldav_event.add_attendee((organizer.name, organizer_email))
-        caldav_event.add_attendee((attendee.name, attendee.email))
-        caldav_event.save()
+        with self.connection():
+            # save event
+            caldav_event = self.calendar().save_event(
+                uid=event.uuid,
+                dtstart=event.start,
+                dtend=event.end,
+                summary=event.title,
+                # TODO: handle location
+                description=event.description,
+            )
+            # save attendee data
+            caldav_event.add_attendee((organizer.name, organizer_email))
+            caldav_event.add_attendee((attendee.name, attendee.email))
+            caldav_event.save()
 
         self.bust_cached_events()
 
         return event
 
-    def delete_events(self, start):
-        """delete all events in given date range from the server
+    def delete_events(self, start, end=None, max_workers=8) -> tuple[int, list[str]]:
+        """delete all events starting in given date range from the server, end defaults to the day after start.
+        Both are ISO dates or datetimes. Events are found through a time range search and deleted a few at a time.
+        A recurring event is deleted as a whole, so it's only deleted if its first occurrence starts in the range.
+        Returns the number of deleted events, and the urls of the ones that couldn't be deleted.
         Not intended to be used in production. For cleaning purposes after testing only.
         """
-        calendar = self.client.calendar(url=self.url)
-        result = calendar.events()
+        start = datetime.fromisoformat(start)
+        end = datetime.fromisoformat(end) if end else start + timedelta(days=1)
+
+        def starts_in_range(e) -> bool:
+            # The search also finds events that started earlier, and series with a later occurrence in the range
+            dtstart = e.icalendar_component.decoded('dtstart')
+            if not isinstance(dtstart, datetime):
+                dtstart = datetime.combine(dtstart, datetime.min.time())
+            return start <= dtstart.replace(tzinfo=None) < end
+
+        with self.connection():
+            result = [e for e in self.calendar().search(start=start, end=end, event=True) if starts_in_range(e)]
+
+        def delete_event(e) -> bool:
+            try:
+                # Every deleting thread uses a client of its own
+                with self.connection() as pooled:
+                    e.client = pooled.client
+                    e.delete()
+            except (caldav.lib.error.DAVError, requests.exceptions.RequestException) as ex:
+                logging.warning(f'[calendar.delete_events] Could not delete event: {ex}')
+                return False
+            return True
+
         count = 0
-        for e in result:
-            if str(e.vobject_instance.vevent.dtstart.value).startswith(start):
-                e.delete()
-                count += 1
+        failed = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for e, deleted in zip(result, executor.map(delete_event, result)):
+                if deleted:
+                    count += 1
+                else:
+                    failed.append(str(e.url))
 
         self.bust_cached_events()
 
-        return count
+        return count, failed
+
+
+class GoogleBatchConnector:
+    """Lists the events of several Google calendars at once, see GoogleConnector.list_events_many.
+    Only implements what Tools.list_events_concurrently needs from a connector."""
+
+    def __init__(self, connectors: list[GoogleConnector]):
+        self.connectors = connectors
+        self.calendar_id = ', '.join(str(con.calendar_id) for con in connectors)
+
+    def list_events(self, start, end):
+        return GoogleConnector.list_events_many(self.connectors, start, end)
+
+    def list_busy(self, start, end):
+        return GoogleConnector.list_busy_many(self.connectors, start, end)
+
+
+class ConnectorFactory:
+    """Builds the remote calendar connectors needed during a single request.
+    External connections are only loaded, and Google credentials only parsed, once per subscriber,
+    and are then shared by all of their calendars."""
+
+    def __init__(self, db, google_client: GoogleClient | None, redis_instance: Redis | RedisCluster | None = None):
+        self.db = db
+        self.google_client = google_client
+        self.redis_instance = redis_instance
+        self._google_connections: dict[int, models.ExternalConnections] = {}
+        self._google_credentials: dict[int, Credentials] = {}
+        self._watched_calendar_ids: dict[int, set[int]] = {}
+
+    def google_connection(self, subscriber_id: int) -> models.ExternalConnections:
+        """Returns the subscriber's Google connection, raises RemoteCalendarConnectionError if there's no usable one"""
+        if subscriber_id not in self._google_connections:
+            external_connection = utils.list_first(
+                repo.external_connection.get_by_type(self.db, subscriber_id, schemas.ExternalConnectionType.google)
+            )
+
+            if external_connection is None or external_connection.token is None:
+                raise RemoteCalendarConnectionError()
+
+            self._google_connections[subscriber_id] = external_connection
+
+        return self._google_connections[subscriber_id]
+
+    def google_credentials(self, subscriber_id: int) -> Credentials:
+        """Returns the subscriber's parsed Google credentials"""
+        if subscriber_id not in self._google_credentials:
+            token = self.google_connection(subscriber_id).token
+            self._google_credentials[subscriber_id] = Credentials.from_authorized_user_info(
+                json.loads(token), GoogleClient.SCOPES
+            )
+
+        return self._google_credentials[subscriber_id]
+
+    def is_watched(self, subscriber_id: int, calendar_id: int | None) -> bool:
+        """True if Google notifies us about changes to the calendar.
+        The subscriber's watched calendars are looked up in one go, without loading (or decrypting) their channels."""
+        if calendar_id is None:
+            return False
+
+        if subscriber_id not in self._watched_calendar_ids:
+            self._watched_calendar_ids[subscriber_id] = repo.google_calendar_channel.get_watched_calendar_ids(
+                self.db, subscriber_id
+            )
+
+        return calendar_id in self._watched_calendar_ids[subscriber_id]
+
+    def google(
+        self, subscriber_id: int, remote_calendar_id: str | None, calendar_id: int | None = None, watched: bool = False
+    ):
+        """Returns a Google connector sharing the subscriber's credentials"""
+        return GoogleConnector(
+            db=self.db,
+            redis_instance=self.redis_instance,
+            google_client=self.google_client,
+            remote_calendar_id=remote_calendar_id,
+            calendar_id=calendar_id,
+            subscriber_id=subscriber_id,
+            google_credentials=self.google_credentials(subscriber_id),
+            watched=watched,
+        )
+
+    def caldav(self, subscriber_id: int, url: str, user: str, password: str, calendar_id: int | None = None):
+        """Returns a CalDAV connector for the given server"""
+        return CalDavConnector(
+            redis_instance=self.redis_instance,
+            url=url,
+            user=user,
+            password=password,
+            subscriber_id=subscriber_id,
+            calendar_id=calendar_id,
+        )
+
+    def for_calendar(
+        self,
+        subscriber_id: int,
+        calendar: models.Calendar | schemas.CalendarConnection,
+        calendar_id: int | None = None,
+    ) -> GoogleConnector | CalDavConnector:
+        """Returns the connector matching the calendar's provider.
+        Pass in calendar_id if the calendar is stored, so its events can be cached."""
+        if calendar.provider == CalendarProvider.google:
+            # We're storing google cal id in user...for now.
+            return self.google(subscriber_id, calendar.user, calendar_id, self.is_watched(subscriber_id, calendar_id))
+
+        return self.caldav(subscriber_id, calendar.url, calendar.user, calendar.password, calendar_id)
+
 
 
 class Tools:
@@ -475,8 +1566,17 @@ class Tools:
     @staticmethod
     def available_slots_from_schedule(schedule: models.Schedule) -> list[schemas.SlotBase]:
         """This helper calculates a list of slots according to the given schedule configuration."""
-        slots = []
+        timezone = zoneinfo.ZoneInfo(schedule.calendar.owner.timezone)
 
+        return [
+            schemas.SlotBase(start=datetime.fromtimestamp(start, tz=timezone), duration=duration)
+            for start, duration in Tools.available_slot_times_from_schedule(schedule)
+        ]
+
+    @staticmethod
+    def available_slot_times_from_schedule(schedule: models.Schedule) -> Iterator[tuple[float, int]]:
+        """Lazily generates the slots of the given schedule configuration as (start epoch, duration) tuples.
+        Use this over available_slots_from_schedule to avoid building a pydantic model for every possible slot."""
         now = datetime.now()
 
         subscriber = schedule.calendar.owner
@@ -550,12 +1650,57 @@ class Tools:
             if current_datetime.isoweekday() in weekdays:
                 # Generate each timeslot based on the selected duration
                 # We just loop through the difference of the start and end time and step by slot duration in seconds.
-                slots += [
-                    schemas.SlotBase(start=current_datetime + timedelta(seconds=time), duration=schedule.slot_duration)
-                    for time in range(time_start, total_time, slot_duration_seconds)
-                ]
+                times = range(time_start, total_time, slot_duration_seconds)
+                if current_datetime.utcoffset() != (current_datetime + timedelta(seconds=total_time)).utcoffset():
+                    # Slots are stepped in wall clock time, which only differs from stepping the timestamp on the
+                    # days the clocks change
+                    for time in times:
+                        yield (current_datetime + timedelta(seconds=time)).timestamp(), schedule.slot_duration
+                    continue
+
+                current_timestamp = current_datetime.timestamp()
+                for time in times:
+                    yield current_timestamp + time, schedule.slot_duration
 
-        return slots
+    @staticmethod
+    def overlaps(event: schemas.Event, start: datetime, end: datetime) -> bool:
+        """Checks if the event overlaps with the given UTC time range.
+        All day events don't have a timezone, so they're compared by their date instead."""
+        if event.start.tzinfo is None:
+            start = start.replace(tzinfo=None)
+            end = end.replace(tzinfo=None)
+
+        return event.start < end and event.end > start
+
+    @staticmethod
+    def busy_from_events(events: list[schemas.Event]) -> list[BusyInterval]:
+        return [(event.start.timestamp(), event.end.timestamp(), bool(event.tentative)) for event in events]
+
+    @staticmethod
+    def events_blocker_check(b_list: list[schemas.Event]) -> Callable[[float, float], bool]:
+        """Returns a function that checks if the passed (start, end) timestamps collide with any event in list B."""
+        return Tools.busy_blocker_check(Tools.busy_from_events(b_list))
+
+    @staticmethod
+    def busy_blocker_check(busy: list[BusyInterval]) -> Callable[[float, float], bool]:
+        """Returns a function that checks if the passed (start, end) timestamps collide with any busy interval."""
+        # Sort the events by their start once, and keep a running maximum of their end times.
+        # Every event starting before a slot ends is then a prefix of this list, and there's an overlap
+        # if the latest end within that prefix is after the slot starts.
+        # This keeps the collision check at O(log n) per slot instead of comparing every slot with every event.
+        events = sorted((start, end) for start, end, _ in busy)
+        event_starts = [start for start, _ in events]
+        latest_event_ends = list(itertools.accumulate((end for _, end in events), max))
+
+        def is_blocker(a_start: float, a_end: float):
+            """
+            if there is an overlap of both date ranges, a collision was found
+            see https://en.wikipedia.org/wiki/De_Morgan%27s_laws
+            """
+            events_before_end = bisect.bisect_left(event_starts, a_end)
+            return events_before_end > 0 and latest_event_ends[events_before_end - 1] > a_start
+
+        return is_blocker
 
     @staticmethod
     def events_roll_up_difference(
@@ -564,13 +1709,7 @@ class Tools:
         """This helper rolls up all events from list A, which have a time collision with any event in list B
         and returns all remaining elements from A as new list.
         """
-
-        def is_blocker(a_start: datetime, a_end: datetime, b_start: datetime, b_end: datetime):
-            """
-            if there is an overlap of both date ranges, a collision was found
-            see https://en.wikipedia.org/wiki/De_Morgan%27s_laws
-            """
-            return a_start.timestamp() < b_end.timestamp() and a_end.timestamp() > b_start.timestamp()
+        is_blocker = Tools.events_blocker_check(b_list)
 
         available_slots = []
         collisions = []
@@ -580,7 +1719,7 @@ class Tools:
             slot_end = slot.start + timedelta(minutes=slot.duration)
 
             # If any of the events are overlap the slot time...
-            if any([is_blocker(slot_start, slot_end, event.start, event.end) for event in b_list]):
+            if is_blocker(slot_start.timestamp(), slot_end.timestamp()):
                 previous_collision_end = (
                     collisions[-1].start + timedelta(minutes=collisions[-1].duration) if len(collisions) else None
                 )
@@ -605,6 +1744,106 @@ class Tools:
 
         return available_slots
 
+    @staticmethod
+    def slot_times_roll_up_difference(
+        a_times: Iterable[tuple[float, int]], busy: list[BusyInterval], timezone: zoneinfo.ZoneInfo
+    ) -> list[schemas.SlotBase]:
+        """Same as events_roll_up_difference, but for (start epoch, duration) tuples like the ones
+        from available_slot_times_from_schedule, and busy intervals like the ones from existing_busy_for_schedule.
+        Slots are only built once they've been checked against the busy intervals."""
+        is_blocker = Tools.busy_blocker_check(busy)
+
+        available_slots = []
+        collisions = []
+
+        for slot_start, slot_duration in a_times:
+            slot_end = slot_start + slot_duration * 60
+
+            if is_blocker(slot_start, slot_end):
+                previous_collision = collisions[-1] if len(collisions) else None
+
+                # Extend the previous collision if it ends right when this one starts, otherwise create a new one
+                if previous_collision and previous_collision[0] + previous_collision[1] * 60 == slot_start:
+                    previous_collision[1] += slot_duration
+                else:
+                    collisions.append([slot_start, slot_duration, BookingStatus.booked])
+            else:
+                available_slots.append((slot_start, slot_duration, BookingStatus.none))
+
+        return [
+            schemas.SlotBase(start=datetime.fromtimestamp(start, tz=timezone), duration=duration, booking_status=status)
+            for start, duration, status in sorted(available_slots + collisions, key=lambda slot: slot[0])
+        ]
+
+    @staticmethod
+    def list_events_concurrently(
+        connectors: list[BaseConnector], start: str, end: str, busy_only=False, strict=False
+    ) -> list[schemas.Event] | list[BusyInterval]:
+        """Calls list_events (or list_busy if busy_only is set) on every connector at the same time,
+        and merges the results as each call completes.
+        A calendar that errors out, takes longer than CALENDAR_FETCH_TIMEOUT, or hasn't finished by the
+        CALENDAR_FETCH_DEADLINE is skipped, so one bad calendar doesn't stall the whole request.
+        With strict set, such a calendar raises RemoteCalendarConnectionError instead, for callers that
+        can't act on an incomplete list of events (e.g. confirming a slot is free)."""
+        if not connectors:
+            return []
+
+        per_calendar_timeout = float(os.getenv('CALENDAR_FETCH_TIMEOUT', 10))
+        deadline = time.monotonic() + float(os.getenv('CALENDAR_FETCH_DEADLINE', 15))
+
+        events = []
+        # When each fetch actually started running, so queued fetches aren't timed out early
+        started_at = {}
+
+        def list_events(index: int, con: BaseConnector):
+            started_at[index] = time.monotonic()
+            return con.list_busy(start, end) if busy_only else con.list_events(start, end)
+
+        timer_boot = time.perf_counter_ns()
+
+        executor = calendar_fetch_executor()
+        pending = {executor.submit(list_events, index, con): index for index, con in enumerate(connectors)}
+
+        try:
+            while pending:
+                # Wait until the next fetch finishes, or the next per-calendar timeout or deadline is hit
+                # (fetches that are still queued are re-checked after at most one per-calendar timeout)
+                now = time.monotonic()
+                expiries = [deadline] + [
+                    started_at.get(index, now) + per_calendar_timeout for index in pending.values()
+                ]
+                timeout = max(0.0, min(expiries) - now)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    con = connectors[pending.pop(future)]
+                    try:
+                        events.extend(future.result())
+                    except FETCH_ERRORS as ex:
+                        # Connection or auth error with remote calendar, don't crash this route.
+                        logging.warning(f'[calendar.list_events_concurrently] Calendar {con.calendar_id} failed: {ex}')
+                        if strict:
+                            raise RemoteCalendarConnectionError()
+
+                now = time.monotonic()
+                for future, index in list(pending.items()):
+                    if now >= deadline or (index in started_at and now >= started_at[index] + per_calendar_timeout):
+                        logging.warning(
+                            f'[calendar.list_events_concurrently] Calendar {connectors[index].calendar_id} timed out'
+                        )
+                        future.cancel()
+                        pending.pop(future)
+                        if strict:
+                            raise RemoteCalendarConnectionError()
+        finally:
+            # Don't run the fetches that are still queued, their results are no longer needed
+            for future in pending:
+                future.cancel()
+
+        sentry_sdk.set_measurement('calendar_fetch_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+
+        return events
+
     @staticmethod
     def existing_events_for_schedule(
         schedule: models.Schedule,
@@ -613,56 +1852,35 @@ class Tools:
         google_client: GoogleClient,
         db,
         redis=None,
+        connectors: ConnectorFactory | None = None,
+        strict=False,
     ) -> list[schemas.Event]:
-        """This helper retrieves all events existing in given calendars for the scheduled date range"""
+        """This helper retrieves all events existing in given calendars for the scheduled date range.
+        Pass in the request's connector factory, if there is one, to reuse its connections.
+        With strict set, a calendar that can't be read raises instead of being skipped."""
+        if connectors is None:
+            connectors = ConnectorFactory(db, google_client, redis)
+
         existing_events = []
 
         # handle calendar events
-        for calendar in calendars:
-            if calendar.provider == CalendarProvider.google:
-                external_connection = utils.list_first(
-                    repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google)
-                )
+        calendar_connectors = [
+            connectors.for_calendar(subscriber.id, calendar, calendar.id) for calendar in calendars
+        ]
 
-                if external_connection is None or external_connection.token is None:
-                    raise RemoteCalendarConnectionError()
-
-                con = GoogleConnector(
-                    db=db,
-                    redis_instance=redis,
-                    google_client=google_client,
-                    remote_calendar_id=calendar.user,
-                    calendar_id=calendar.id,
-                    subscriber_id=subscriber.id,
-                    google_tkn=external_connection.token,
-                )
-            else:
-                con = CalDavConnector(
-                    redis_instance=redis,
-                    url=calendar.url,
-                    user=calendar.user,
-                    password=calendar.password,
-                    subscriber_id=subscriber.id,
-                    calendar_id=calendar.id,
-                )
+        # Without a local copy to sync, Google calendars have to be requested in full, so do it in one go
+        google_connectors = [con for con in calendar_connectors if isinstance(con, GoogleConnector)]
+        if len(google_connectors) > 1 and not any(con.use_incremental_sync() for con in google_connectors):
+            calendar_connectors = [con for con in calendar_connectors if not isinstance(con, GoogleConnector)]
+            calendar_connectors.append(GoogleBatchConnector(google_connectors))
 
-            now = datetime.now()
+        start, end = Tools.schedule_date_range(schedule)
 
-            earliest_booking = now + timedelta(minutes=schedule.earliest_booking)
-            farthest_booking = now + timedelta(minutes=schedule.farthest_booking)
-
-            start = max([datetime.combine(schedule.start_date, schedule.start_time), earliest_booking])
-            end = (
-                min([datetime.combine(schedule.end_date, schedule.end_time), farthest_booking])
-                if schedule.end_date
-                else farthest_booking
+        existing_events.extend(
+            Tools.list_events_concurrently(
+                calendar_connectors, start.strftime(DATEFMT), end.strftime(DATEFMT), strict=strict
             )
-
-            try:
-                existing_events.extend(con.list_events(start.strftime(DATEFMT), end.strftime(DATEFMT)))
-            except requests.exceptions.ConnectionError:
-                # Connection error with remote caldav calendar, don't crash this route.
-                pass
+        )
 
         # handle already requested time slots
         for slot in schedule.slots:
@@ -675,3 +1893,56 @@ class Tools:
             )
 
         return existing_events
+
+    @staticmethod
+    def existing_busy_for_schedule(
+        schedule: models.Schedule,
+        calendars: list[schemas.Calendar],
+        subscriber: models.Subscriber,
+        google_client: GoogleClient,
+        db,
+        redis=None,
+        connectors: ConnectorFactory | None = None,
+    ) -> list[BusyInterval]:
+        """Same as existing_events_for_schedule, but only retrieves the busy time ranges, which is all that's
+        needed to compute the availability. Google calendars are all queried at once."""
+        if connectors is None:
+            connectors = ConnectorFactory(db, google_client, redis)
+
+        calendar_connectors = [
+            connectors.for_calendar(subscriber.id, calendar, calendar.id) for calendar in calendars
+        ]
+        google_connectors = [con for con in calendar_connectors if isinstance(con, GoogleConnector)]
+        if google_connectors:
+            calendar_connectors = [con for con in calendar_connectors if not isinstance(con, GoogleConnector)]
+            calendar_connectors.append(GoogleBatchConnector(google_connectors))
+
+        start, end = Tools.schedule_date_range(schedule)
+
+        existing_busy = Tools.list_events_concurrently(
+            calendar_connectors, start.strftime(DATEFMT), end.strftime(DATEFMT), busy_only=True
+        )
+
+        # handle already requested time slots
+        for slot in schedule.slots:
+            slot_start = slot.start.timestamp()
+            existing_busy.append((slot_start, slot_start + slot.duration * 60, False))
+
+        return existing_busy
+
+    @staticmethod
+    def schedule_date_range(schedule: models.Schedule) -> tuple[datetime, datetime]:
+        """The date range a schedule can currently be booked in"""
+        now = datetime.now()
+
+        earliest_booking = now + timedelta(minutes=schedule.earliest_booking)
+        farthest_booking = now + timedelta(minutes=schedule.farthest_booking)
+
+        start = max([datetime.combine(schedule.start_date, schedule.start_time), earliest_booking])
+        end = (
+            min([datetime.combine(schedule.end_date, schedule.end_time), farthest_booking])
+            if schedule.end_date
+            else farthest_booking
+        )
+
+        return start, end
@@ -0,0 +1,217 @@
+"""Module: public_link
+
+Resolves public links (signed subscriber links and schedule links) to their subscriber, schedules and calendars.
+The anonymous public pages are requested a lot, so what a link resolved to is kept in memory for a little while,
+and dropped from every worker as soon as the subscriber, their schedules or calendars change.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from redis import Redis, RedisCluster
+from redis.exceptions import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..database import models, repo
+from ..defines import REDIS_PUBLIC_LINK_BUST_CHANNEL
+from ..dependencies.database import get_redis
+
+
+class PublicLink:
+    """What a public link resolved to: the subscriber with their schedules and connected calendars"""
+
+    def __init__(
+        self,
+        subscriber: models.Subscriber,
+        schedules: list[models.Schedule],
+        calendars: list[models.Calendar],
+        calendar_ids: set[int],
+    ):
+        self.subscriber = subscriber
+        self.schedules = schedules
+        self.calendars = calendars
+        # All of the subscriber's calendars, connected or not, so new schedules on them are noticed
+        self.calendar_ids = calendar_ids
+
+    def detach(self) -> 'PublicLink':
+        """A copy of the loaded rows that isn't tied to any session, to be merged into other sessions"""
+        return PublicLink(
+            detach_row(self.subscriber),
+            [detach_row(schedule) for schedule in self.schedules],
+            [detach_row(calendar) for calendar in self.calendars],
+            set(self.calendar_ids),
+        )
+
+    def merge(self, db: Session) -> 'PublicLink':
+        """Adds a detached copy to the session without querying (or decrypting) anything.
+        Relationships aren't copied, they're loaded from the session when needed, from its identity map if possible."""
+        return PublicLink(
+            db.merge(self.subscriber, load=False),
+            [db.merge(schedule, load=False) for schedule in self.schedules],
+            [db.merge(calendar, load=False) for calendar in self.calendars],
+            self.calendar_ids,
+        )
+
+
+def detach_row(instance: models.Base) -> models.Base:
+    """Copies the (decrypted) column values of a loaded row into a new detached instance"""
+    mapper = inspect(instance).mapper
+    row = mapper.class_manager.new_instance()
+    for column in mapper.column_attrs:
+        set_committed_value(row, column.key, getattr(instance, column.key))
+    make_transient_to_detached(row)
+    return row
+
+
+class PublicLinkCache:
+    """Keeps what public links resolved to in this worker for PUBLIC_LINK_CACHE_SECONDS (0 turns it off), up to
+    PUBLIC_LINK_CACHE_SIZE links. Committed changes to subscribers, schedules and calendars are published, and every
+    listening worker drops the links they affect."""
+
+    def __init__(self):
+        self.entries: OrderedDict[str, tuple[float, PublicLink]] = OrderedDict()
+        self.lock = threading.Lock()
+        # Bumped on every invalidation, so links resolved before a change aren't cached after it
+        self.generation = 0
+        self.listener = None
+
+    @staticmethod
+    def ttl() -> int:
+        return int(os.getenv('PUBLIC_LINK_CACHE_SECONDS', 60))
+
+    def get(self, url: str) -> PublicLink | None:
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[url]
+                return None
+
+            self.entries.move_to_end(url)
+            return entry[1]
+
+    def put(self, url: str, link: PublicLink, generation: int):
+        ttl = self.ttl()
+        if ttl <= 0:
+            return
+
+        with self.lock:
+            if generation != self.generation:
+                return
+
+            self.entries[url] = (time.monotonic() + ttl, link)
+            self.entries.move_to_end(url)
+            while len(self.entries) > int(os.getenv('PUBLIC_LINK_CACHE_SIZE', 1024)):
+                self.entries.popitem(last=False)
+
+    def invalidate(self, subscriber_ids: set[int], calendar_ids: set[int]):
+        """Drops the links of given subscribers, and of the subscribers owning given calendars"""
+        with self.lock:
+            self.generation += 1
+            for url, (_, link) in list(self.entries.items()):
+                if link.subscriber.id in subscriber_ids or link.calendar_ids & calendar_ids:
+                    del self.entries[url]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def publish(self, subscriber_ids: set[int], calendar_ids: set[int]):
+        """Drops the links affected by a change from this worker, and tells the other workers to do the same"""
+        self.invalidate(subscriber_ids, calendar_ids)
+
+        redis_instance = get_redis()
+        if redis_instance is None:
+            return
+
+        try:
+            redis_instance.publish(
+                REDIS_PUBLIC_LINK_BUST_CHANNEL,
+                json.dumps({'subscribers': list(subscriber_ids), 'calendars': list(calendar_ids)}),
+            )
+        except RedisError as ex:
+            logging.warning(f'[public_link.publish] Could not tell the other workers about a change: {ex}')
+
+    def listen(self, redis_instance: Redis | RedisCluster):
+        """Drops the links other workers changed from this worker's cache, in a background thread"""
+        if self.listener is not None or self.ttl() <= 0:
+            return
+
+        def on_message(message):
+            changes = json.loads(message['data'])
+            self.invalidate(set(changes['subscribers']), set(changes['calendars']))
+
+        pubsub = redis_instance.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{REDIS_PUBLIC_LINK_BUST_CHANNEL: on_message})
+        self.listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def stop(self):
+        if self.listener is None:
+            return
+
+        self.listener.stop()
+        self.listener = None
+        self.clear()
+
+
+public_links = PublicLinkCache()
+
+
+def resolve(db: Session, url: str) -> PublicLink | None:
+    """Returns what a signed subscriber link or a schedule link points at, or None if it's not a valid link"""
+    cached = public_links.get(url)
+    if cached is not None:
+        return cached.merge(db)
+
+    generation = public_links.generation
+
+    subscriber = repo.subscriber.verify_link(db, url) or repo.schedule.verify_link(db, url)
+    if not subscriber:
+        return None
+
+    calendars = repo.calendar.get_by_subscriber(db, subscriber.id)
+    link = PublicLink(
+        subscriber,
+        repo.schedule.get_by_subscriber(db, subscriber_id=subscriber.id),
+        [calendar for calendar in calendars if calendar.connected],
+        {calendar.id for calendar in calendars},
+    )
+    public_links.put(url, link.detach(), generation)
+
+    return link
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_changes(session: Session, flush_context):
+    """Remembers which subscribers and calendars were changed, until the session commits or rolls back"""
+    subscriber_ids, calendar_ids = session.info.setdefault('public_link_changes', (set(), set()))
+
+    changed = list(session.new) + list(session.deleted) + [row for row in session.dirty if session.is_modified(row)]
+    for row in changed:
+        if isinstance(row, models.Subscriber):
+            subscriber_ids.add(row.id)
+        elif isinstance(row, models.Calendar):
+            subscriber_ids.add(row.owner_id)
+            calendar_ids.add(row.id)
+        elif isinstance(row, models.Schedule):
+            calendar_ids.add(row.calendar_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def publish_changes(session: Session):
+    subscriber_ids, calendar_ids = session.info.pop('public_link_changes', (set(), set()))
+    if subscriber_ids or calendar_ids:
+        public_links.publish(subscriber_ids, calendar_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_changes(session: Session):
+    session.info.pop('public_link_changes', None)
@@ -6,12 +6,14 @@ Definitions of database tables and their relationships.
 import datetime
 import enum
 import hashlib
+import hmac
 import os
 import uuid
 import zoneinfo
-from functools import cached_property
+from functools import cache, cached_property
 
 from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Enum, Boolean, JSON, Date, Time
+from sqlalchemy import and_, event, or_
 from sqlalchemy_utils import StringEncryptedType, ChoiceType, UUIDType
 from sqlalchemy_utils.types.encrypted.encrypted_type import AesEngine
 from sqlalchemy.orm import relationship, as_declarative, declared_attr, Mapped
@@ -83,9 +85,45 @@ class InviteStatus(enum.Enum):
     revoked = 2  # The code is no longer valid and cannot be used for sign up anymore
 
 
+class CachedKeyAesEngine(AesEngine):
+    """AesEngine that only derives its key and sets up its cipher when the secret changes. sqlalchemy_utils hands the
+    engine the secret before every single value it encrypts or decrypts."""
+
+    def _update_key(self, key):
+        # Engines are meant to be subclassed, and this is the hook they get their key through
+        # (see also utils.setup_encryption_engine)
+        if key != getattr(self, 'raw_key', None):
+            super()._update_key(key)
+            self.raw_key = key
+
+
 def encrypted_type(column_type, length: int = 255, **kwargs) -> StringEncryptedType:
     """Helper to reduce visual noise when creating model columns"""
-    return StringEncryptedType(column_type, secret, AesEngine, 'pkcs5', length=length, **kwargs)
+    return StringEncryptedType(column_type, secret, CachedKeyAesEngine, 'pkcs5', length=length, **kwargs)
+
+
+@cache
+def blind_index_secret() -> bytes:
+    """The key blind indexes are hashed with, derived from our secret"""
+    return hmac.new(secret().encode(), b'appointment-blind-index', hashlib.sha256).digest()
+
+
+def blind_index(value) -> str | None:
+    """A keyed hash of an encrypted column's value, so rows can be looked up by it without comparing ciphertext"""
+    if value is None:
+        return None
+    return hmac.new(blind_index_secret(), str(value).encode(), hashlib.sha256).hexdigest()
+
+
+def blind_index_type() -> String:
+    """Helper for the columns holding a blind_index"""
+    return String(64)
+
+
+def matches_blind_index(column, index_column, value):
+    """Filters on an encrypted column through its blind index. Rows that weren't backfilled yet (see the
+    backfill-blind-indexes command) are still compared by their ciphertext."""
+    return or_(index_column == blind_index(value), and_(index_column.is_(None), column == value))
 
 
 @as_declarative()
@@ -123,11 +161,13 @@ class Subscriber(HasSoftDelete, Base):
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(encrypted_type(String), unique=True, index=True)
+    username_index = Column(blind_index_type(), unique=True, index=True)
     # Encrypted (here) and hashed (by the associated hashing functions in routes/auth)
     password = Column(encrypted_type(String), index=False)
 
     # Use subscriber.preferred_email for any email, or other user-facing presence.
     email = Column(encrypted_type(String), unique=True, index=True)
+    email_index = Column(blind_index_type(), unique=True, index=True)
     secondary_email = Column(encrypted_type(String), nullable=True, index=True)
 
     name = Column(encrypted_type(String), index=True)
@@ -197,6 +237,14 @@ class Calendar(Base):
         'Appointment', cascade='all,delete', back_populates='calendar'
     )
     schedules: Mapped[list['Schedule']] = relationship('Schedule', cascade='all,delete', back_populates='calendar')
+    google_channel: Mapped['GoogleCalendarChannel'] = relationship(
+        'GoogleCalendarChannel', cascade='all,delete', back_populates='calendar', uselist=False
+    )
+
+    @property
+    def is_watched(self) -> bool:
+        """True if Google notifies us about changes to this calendar"""
+        return self.google_channel is not None and self.google_channel.is_active
 
 
 class Appointment(Base):
@@ -275,6 +323,7 @@ class Schedule(Base):
     active: bool = Column(Boolean, index=True, default=True)
     name: str = Column(encrypted_type(String), index=True)
     slug: str = Column(encrypted_type(String), index=True, unique=True)
+    slug_index: str = Column(blind_index_type(), index=True, unique=True)
     location_type: LocationType = Column(Enum(LocationType), default=LocationType.inperson)
     location_url: str = Column(encrypted_type(String, length=2048))
     details: str = Column(encrypted_type(String))
@@ -355,6 +404,28 @@ class ExternalConnections(Base):
     owner: Mapped[Subscriber] = relationship('Subscriber', back_populates='external_connections')
 
 
+class GoogleCalendarChannel(Base):
+    """This table holds the Google push notification channels watching our subscribers' Google calendars."""
+
+    __tablename__ = 'google_calendar_channels'
+
+    id = Column(Integer, primary_key=True, index=True)
+    calendar_id = Column(Integer, ForeignKey('calendars.id'), unique=True, index=True)
+    channel_id = Column(encrypted_type(String), unique=True, index=True)
+    resource_id = Column(encrypted_type(String), index=False)
+    # Shared secret Google sends along with each notification
+    token = Column(encrypted_type(String), index=False)
+    # In UTC
+    expires_at = Column(DateTime, index=True)
+
+    calendar: Mapped[Calendar] = relationship('Calendar', back_populates='google_channel')
+
+    @property
+    def is_active(self) -> bool:
+        """True if the channel hasn't expired yet"""
+        return self.expires_at > datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+
+
 class Invite(Base):
     """This table holds all invite codes for code based sign-ups."""
 
@@ -364,6 +435,7 @@ class Invite(Base):
     owner_id = Column(Integer, ForeignKey('subscribers.id'), nullable=True)
     subscriber_id = Column(Integer, ForeignKey('subscribers.id'))
     code = Column(encrypted_type(String), index=False)
+    code_index = Column(blind_index_type(), index=True)
     status = Column(Enum(InviteStatus), index=True)
 
     owner: Mapped['Subscriber'] = relationship('Subscriber', back_populates='invite', single_parent=True, foreign_keys=[owner_id])
@@ -392,7 +464,30 @@ class WaitingList(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(encrypted_type(String), unique=True, index=True, nullable=False)
+    email_index = Column(blind_index_type(), unique=True, index=True)
     email_verified = Column(Boolean, nullable=False, index=True, default=False)
     invite_id = Column(Integer, ForeignKey('invites.id'), nullable=True, index=True)
 
     invite: Mapped['Invite'] = relationship('Invite', back_populates='waiting_list', single_parent=True)
+
+
+# The blind indexed columns, and the columns holding their blind index
+BLIND_INDEXES = {
+    Subscriber.username: Subscriber.username_index,
+    Subscriber.email: Subscriber.email_index,
+    Schedule.slug: Schedule.slug_index,
+    Invite.code: Invite.code_index,
+    WaitingList.email: WaitingList.email_index,
+}
+
+
+def keep_blind_index(column, index_column):
+    """Updates a row's blind index whenever the column it's for is set"""
+
+    @event.listens_for(column, 'set')
+    def update_blind_index(target, value, oldvalue, initiator):
+        setattr(target, index_column.key, blind_index(value))
+
+
+for blind_indexed_column, blind_index_column in BLIND_INDEXES.items():
+    keep_blind_index(blind_indexed_column, blind_index_column)
@@ -1 +1,11 @@
-from . import appointment, attendee, calendar, external_connection, invite, schedule, slot, subscriber  # noqa: F401
+from . import (  # noqa: F401
+    appointment,
+    attendee,
+    calendar,
+    external_connection,
+    google_calendar_channel,
+    invite,
+    schedule,
+    slot,
+    subscriber,
+)
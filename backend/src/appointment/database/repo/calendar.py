@@ -6,22 +6,25 @@ Repository providing CRUD functions for calendar database models.
 from datetime import datetime
 
 from fastapi import HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from .. import models, schemas, repo
+from ...exceptions import validation
 
 
 def exists(db: Session, calendar_id: int):
     """true if calendar of given id exists"""
-    return True if db.get(models.Calendar, calendar_id) is not None else False
+    return db.scalar(select(select(models.Calendar.id).where(models.Calendar.id == calendar_id).exists()))
 
 
 def is_owned(db: Session, calendar_id: int, subscriber_id: int):
     """check if calendar belongs to subscriber"""
-    return (
-        db.query(models.Calendar)
-        .filter(models.Calendar.id == calendar_id, models.Calendar.owner_id == subscriber_id)
-        .first()
-        is not None
+    return db.scalar(
+        select(
+            select(models.Calendar.id)
+            .where(models.Calendar.id == calendar_id, models.Calendar.owner_id == subscriber_id)
+            .exists()
+        )
     )
 
 
@@ -30,9 +33,22 @@ def get(db: Session, calendar_id: int):
     return db.get(models.Calendar, calendar_id)
 
 
+def get_authorized(db: Session, calendar_id: int, subscriber_id: int, connected: bool = False) -> models.Calendar:
+    """retrieve a calendar of the subscriber, and if asked, only if it's connected. It's checked on the one loaded row,
+    which later repo calls for the same calendar get from the session instead of querying it again."""
+    calendar = get(db, calendar_id)
+    if calendar is None:
+        raise validation.CalendarNotFoundException()
+    if calendar.owner_id != subscriber_id:
+        raise validation.CalendarNotAuthorizedException()
+    if connected and not calendar.connected:
+        raise validation.CalendarNotConnectedException()
+    return calendar
+
+
 def is_connected(db: Session, calendar_id: int):
-    """true if calendar of given id exists"""
-    return get(db, calendar_id).connected
+    """true if calendar of given id exists and is connected"""
+    return db.scalar(select(models.Calendar.connected).where(models.Calendar.id == calendar_id)) or False
 
 
 def get_by_url(db: Session, url: str):
@@ -50,6 +66,16 @@ def get_by_subscriber(db: Session, subscriber_id: int, include_unconnected: bool
     return query.all()
 
 
+def get_by_provider(db: Session, provider: models.CalendarProvider, include_unconnected: bool = True):
+    """retrieve list of calendars of all subscribers by provider"""
+    query = db.query(models.Calendar).filter(models.Calendar.provider == provider)
+
+    if not include_unconnected:
+        query = query.filter(models.Calendar.connected == 1)
+
+    return query.all()
+
+
 def create(db: Session, calendar: schemas.CalendarConnection, subscriber_id: int):
     """create new calendar for owner, if not already existing"""
     db_calendar = models.Calendar(**calendar.dict(), owner_id=subscriber_id)
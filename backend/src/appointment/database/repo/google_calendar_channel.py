@@ -0,0 +1,66 @@
+"""Module: repo.google_calendar_channel
+
+Repository providing CRUD functions for google_calendar_channel database models.
+"""
+
+from datetime import datetime, UTC
+
+from sqlalchemy.orm import Session
+from .. import models
+
+
+def get_by_channel_id(db: Session, channel_id: str) -> models.GoogleCalendarChannel | None:
+    """retrieve channel by the id we gave it when opening it"""
+    return (
+        db.query(models.GoogleCalendarChannel).filter(models.GoogleCalendarChannel.channel_id == channel_id).first()
+    )
+
+
+def get_by_calendar(db: Session, calendar_id: int) -> models.GoogleCalendarChannel | None:
+    """retrieve the channel watching a calendar"""
+    return (
+        db.query(models.GoogleCalendarChannel).filter(models.GoogleCalendarChannel.calendar_id == calendar_id).first()
+    )
+
+
+def get_watched_calendar_ids(db: Session, subscriber_id: int) -> set[int]:
+    """retrieve the ids of the subscriber's calendars that are watched by a channel that hasn't expired yet"""
+    rows = (
+        db.query(models.GoogleCalendarChannel.calendar_id)
+        .join(models.Calendar)
+        .filter(
+            models.Calendar.owner_id == subscriber_id,
+            models.GoogleCalendarChannel.expires_at > datetime.now(UTC).replace(tzinfo=None),
+        )
+        .all()
+    )
+    return {row.calendar_id for row in rows}
+
+
+def get_expired(db: Session, expired_at: datetime) -> list[models.GoogleCalendarChannel]:
+    """retrieve the channels that have expired by the given UTC time"""
+    return db.query(models.GoogleCalendarChannel).filter(models.GoogleCalendarChannel.expires_at <= expired_at).all()
+
+
+def update_or_create(
+    db: Session, calendar_id: int, channel_id: str, resource_id: str, token: str, expires_at: datetime
+) -> models.GoogleCalendarChannel:
+    """Set the channel watching a calendar, replacing the previous one if there is any"""
+    db_channel = get_by_calendar(db, calendar_id)
+    if db_channel is None:
+        db_channel = models.GoogleCalendarChannel(calendar_id=calendar_id)
+        db.add(db_channel)
+
+    db_channel.channel_id = channel_id
+    db_channel.resource_id = resource_id
+    db_channel.token = token
+    db_channel.expires_at = expires_at
+    db.commit()
+    db.refresh(db_channel)
+    return db_channel
+
+
+def delete(db: Session, channel: models.GoogleCalendarChannel):
+    db.delete(channel)
+    db.commit()
+    return True
@@ -6,7 +6,8 @@ Repository providing CRUD functions for invite database models.
 import uuid
 from typing import Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, selectinload
 from .. import models, schemas
 from ..models import InviteStatus
 
@@ -30,7 +31,11 @@ def get_by_owner(db: Session, subscriber_id: int, status: Optional[InviteStatus]
 
 def get_by_code(db: Session, code: str) -> models.Invite:
     """retrieve invite by code"""
-    return db.query(models.Invite).filter(models.Invite.code == code).first()
+    return (
+        db.query(models.Invite)
+        .filter(models.matches_blind_index(models.Invite.code, models.Invite.code_index, code))
+        .first()
+    )
 
 
 def generate_codes(db: Session, n: int, owner_id: Optional[int] = None):
@@ -90,8 +95,52 @@ def revoke_code(db: Session, code: str):
     return True
 
 
+def filter_waiting_list(filters: schemas.WaitingListAdminFilter | None) -> list:
+    """Conditions for the admin waiting list's filters"""
+    if filters is None:
+        return []
+
+    conditions = []
+    if filters.verified is not None:
+        conditions.append(models.WaitingList.email_verified == filters.verified)
+    if filters.invited is not None:
+        invited = models.WaitingList.invite_id.is_not(None)
+        conditions.append(invited if filters.invited else ~invited)
+    return conditions
+
+
+def get_waiting_list(
+    db: Session,
+    filters: schemas.WaitingListAdminFilter | None = None,
+    after: int | None = None,
+    limit: int | None = None,
+) -> list[models.WaitingList]:
+    """retrieve waiting list entries ordered by id, optionally only the ones after a given id.
+    Their invites are loaded along with them."""
+    query = (
+        select(models.WaitingList)
+        .options(selectinload(models.WaitingList.invite))
+        .where(*filter_waiting_list(filters))
+        .order_by(models.WaitingList.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(models.WaitingList.id > after)
+
+    return db.scalars(query).all()
+
+
+def count_waiting_list(db: Session, filters: schemas.WaitingListAdminFilter | None = None) -> int:
+    """count the waiting list entries"""
+    return db.scalar(select(func.count(models.WaitingList.id)).where(*filter_waiting_list(filters)))
+
+
 def get_waiting_list_entry_by_email(db: Session, email: str) -> models.WaitingList:
-    return db.query(models.WaitingList).filter(models.WaitingList.email == email).first()
+    return (
+        db.query(models.WaitingList)
+        .filter(models.matches_blind_index(models.WaitingList.email, models.WaitingList.email_index, email))
+        .first()
+    )
 
 
 def add_to_waiting_list(db: Session, email: str):
@@ -4,9 +4,11 @@ Repository providing CRUD functions for schedule database models.
 """
 import uuid
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased, contains_eager
 from .. import models, schemas, repo
 from ... import utils
+from ...exceptions import validation
 
 
 def create(db: Session, schedule: schemas.ScheduleBase):
@@ -31,7 +33,7 @@ def get_by_subscriber(db: Session, subscriber_id: int):
 def get_by_slug(db: Session, slug: str, subscriber_id: int) -> models.Schedule | None:
     """Get schedule by slug"""
     return (db.query(models.Schedule)
-            .filter(models.Schedule.slug == slug)
+            .filter(models.matches_blind_index(models.Schedule.slug, models.Schedule.slug_index, slug))
             .join(models.Schedule.calendar)
             .filter(models.Calendar.owner_id == subscriber_id)
             .first())
@@ -44,15 +46,57 @@ def get(db: Session, schedule_id: int):
     return None
 
 
+def get_authorized(
+    db: Session, schedule_id: int, subscriber_id: int, calendar_id: int | None = None
+) -> models.Schedule:
+    """retrieve a schedule of the subscriber, with its calendar. If a calendar_id is given (the calendar the schedule
+    is saved on), it has to be one of the subscriber's connected calendars. Everything is checked with a single query,
+    raising the matching validation exception."""
+    query = (
+        select(models.Schedule)
+        .join(models.Schedule.calendar)
+        .options(contains_eager(models.Schedule.calendar))
+        .where(models.Schedule.id == schedule_id)
+    )
+    if calendar_id is not None:
+        target = aliased(models.Calendar)
+        query = query.outerjoin(target, target.id == calendar_id).add_columns(target.owner_id, target.connected)
+
+    row = db.execute(query).first()
+    if row is None:
+        raise validation.ScheduleNotFoundException()
+
+    schedule = row[0]
+    if schedule.calendar.owner_id != subscriber_id:
+        raise validation.ScheduleNotAuthorizedException()
+
+    if calendar_id is not None:
+        _, target_owner_id, target_connected = row
+        if target_owner_id is None:
+            raise validation.CalendarNotFoundException()
+        if target_owner_id != subscriber_id:
+            raise validation.CalendarNotAuthorizedException()
+        if not target_connected:
+            raise validation.CalendarNotConnectedException()
+
+    return schedule
+
+
 def is_owned(db: Session, schedule_id: int, subscriber_id: int):
     """check if the given schedule belongs to subscriber"""
-    schedules = get_by_subscriber(db, subscriber_id)
-    return any(s.id == schedule_id for s in schedules)
+    return db.scalar(
+        select(
+            select(models.Schedule.id)
+            .join(models.Schedule.calendar)
+            .where(models.Schedule.id == schedule_id, models.Calendar.owner_id == subscriber_id)
+            .exists()
+        )
+    )
 
 
 def exists(db: Session, schedule_id: int):
     """true if schedule of given id exists"""
-    return True if get(db, schedule_id) is not None else False
+    return db.scalar(select(select(models.Schedule.id).where(models.Schedule.id == schedule_id).exists()))
 
 
 def is_calendar_connected(db: Session, schedule_id: int) -> bool:
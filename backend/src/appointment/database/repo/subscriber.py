@@ -8,7 +8,8 @@ import datetime
 import secrets
 import urllib.parse
 
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, defer, selectinload
 from .. import models, schemas
 from ... import utils
 from ...controller.auth import sign_url
@@ -19,14 +20,79 @@ def get(db: Session, subscriber_id: int) -> models.Subscriber | None:
     return db.get(models.Subscriber, subscriber_id)
 
 
+def filter_all(filters: schemas.SubscriberAdminFilter | None) -> list:
+    """Conditions for the admin listing's filters"""
+    if filters is None:
+        return []
+
+    conditions = []
+    if filters.level is not None:
+        conditions.append(models.Subscriber.level == filters.level)
+    if filters.deleted is not None:
+        deleted = models.Subscriber.time_deleted.is_not(None)
+        conditions.append(deleted if filters.deleted else ~deleted)
+    if filters.invited is not None:
+        invited = models.Subscriber.invite.has()
+        conditions.append(invited if filters.invited else ~invited)
+    return conditions
+
+
+def get_all(
+    db: Session,
+    filters: schemas.SubscriberAdminFilter | None = None,
+    after: int | None = None,
+    limit: int | None = None,
+) -> list[models.Subscriber]:
+    """retrieve subscribers for the admin listing, ordered by id, optionally only the ones after a given id.
+    Their invites are loaded along with them. Their password isn't listed, so it's only loaded (and decrypted)
+    if it's accessed."""
+    query = (
+        select(models.Subscriber)
+        .options(
+            selectinload(models.Subscriber.invite),
+            defer(models.Subscriber.password),
+            defer(models.Subscriber.minimum_valid_iat_time),
+        )
+        .where(*filter_all(filters))
+        .order_by(models.Subscriber.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(models.Subscriber.id > after)
+
+    return db.scalars(query).all()
+
+
+def count_all(db: Session, filters: schemas.SubscriberAdminFilter | None = None) -> int:
+    """count the subscribers of the admin listing"""
+    return db.scalar(select(func.count(models.Subscriber.id)).where(*filter_all(filters)))
+
+
 def get_by_email(db: Session, email: str) -> models.Subscriber | None:
     """retrieve subscriber by email"""
-    return db.query(models.Subscriber).filter(models.Subscriber.email == email).first()
+    return (
+        db.query(models.Subscriber)
+        .filter(models.matches_blind_index(models.Subscriber.email, models.Subscriber.email_index, email))
+        .first()
+    )
 
 
 def get_by_username(db: Session, username: str):
-    """retrieve subscriber by username"""
-    return db.query(models.Subscriber).filter(models.Subscriber.username == username).first()
+    """retrieve subscriber by username. Found subscribers are remembered for the rest of the session,
+    as public links are checked against the same username more than once per request."""
+    subscribers = db.info.setdefault('subscribers_by_username', {})
+    subscriber = subscribers.get(username)
+    if subscriber is not None and subscriber in db and subscriber.username == username:
+        return subscriber
+
+    subscriber = (
+        db.query(models.Subscriber)
+        .filter(models.matches_blind_index(models.Subscriber.username, models.Subscriber.username_index, username))
+        .first()
+    )
+    if subscriber is not None:
+        subscribers[username] = subscriber
+    return subscriber
 
 
 def get_by_appointment(db: Session, appointment_id: int):
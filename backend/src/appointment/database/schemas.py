@@ -3,12 +3,14 @@
 Definitions of valid data shapes for database and query models.
 """
 
+import base64
 import json
+import zlib
 from uuid import UUID
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta, timezone, UTC
 from typing import Annotated, Optional
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, BeforeValidator, Field, EmailStr
 
 from .models import (
     AppointmentStatus,
@@ -291,7 +293,10 @@ class SubscriberMeOut(SubscriberBase):
     schedule_links: list[str] = []
 
 
-class SubscriberAdminOut(Subscriber):
+class SubscriberAdminOut(SubscriberAuth):
+    """Leaves out the subscriber's calendars and slots, so listing a page of subscribers doesn't load them"""
+    id: int
+    ftue_level: Optional[int] = Field(gte=0)
     invite: Invite | None = None
     time_created: datetime
     time_deleted: datetime | None
@@ -300,6 +305,17 @@ class SubscriberAdminOut(Subscriber):
         from_attributes = True
 
 
+def number_from_query(value):
+    """Query parameters are always strings, even for enums of numbers like our subscriber levels"""
+    return int(value) if isinstance(value, str) and value.isdigit() else value
+
+
+class SubscriberAdminFilter(BaseModel):
+    level: Annotated[SubscriberLevel | None, BeforeValidator(number_from_query)] = None
+    deleted: bool | None = None
+    invited: bool | None = None
+
+
 """ other schemas used for requests or data migration
 """
 
@@ -325,6 +341,16 @@ class EventLocation(BaseModel):
     phone: str | None = None
 
 
+# Bit flags of events packed by Event.model_dump_redis_many
+EVENT_FLAG_ALL_DAY = 1
+EVENT_FLAG_TENTATIVE = 2
+
+
+def _compact_number(value: float) -> int | float:
+    """Whole numbers are dumped without their trailing .0"""
+    return int(value) if value.is_integer() else value
+
+
 class Event(BaseModel):
     title: str
     start: datetime
@@ -355,6 +381,75 @@ class Event(BaseModel):
 
         return Event(**values)
 
+    @staticmethod
+    def model_dump_redis_many(events: list['Event']) -> str:
+        """Dumps a list of events into a single compressed and encrypted blob for redis.
+        Each event is packed as [start epoch, duration in seconds, flags, utc offset in seconds or null for
+        naive times, title, description], followed by a dict of the other fields if any of them are set."""
+        records = []
+        for event in events:
+            offset = event.start.utcoffset()
+            start = event.start if offset is not None else event.start.replace(tzinfo=UTC)
+            flags = (EVENT_FLAG_ALL_DAY if event.all_day else 0) | (EVENT_FLAG_TENTATIVE if event.tentative else 0)
+            record = [
+                _compact_number(start.timestamp()),
+                _compact_number((event.end - event.start).total_seconds()),
+                flags,
+                _compact_number(offset.total_seconds()) if offset is not None else None,
+                event.title,
+                event.description,
+            ]
+
+            extra = {
+                'calendar_title': event.calendar_title,
+                'calendar_color': event.calendar_color,
+                'location': event.location.model_dump(mode='json', exclude_none=True) if event.location else None,
+                'uuid': str(event.uuid) if event.uuid else None,
+            }
+            extra = {key: value for key, value in extra.items() if value is not None}
+            if extra:
+                record.append(extra)
+
+            records.append(record)
+
+        packed = zlib.compress(json.dumps(records, separators=(',', ':')).encode())
+        return utils.setup_encryption_engine().encrypt(base64.b64encode(packed).decode())
+
+    @staticmethod
+    def model_load_redis_many(encrypted_blob) -> list['Event']:
+        """Loads and decrypts a blob from model_dump_redis_many. The values were validated when they were dumped,
+        so the events are constructed without validating them again."""
+        packed = base64.b64decode(utils.setup_encryption_engine().decrypt(encrypted_blob))
+        records = json.loads(zlib.decompress(packed))
+
+        timezones = {}
+        events = []
+        for start, duration, flags, offset, title, description, *extra in records:
+            if offset is None:
+                start = datetime.fromtimestamp(start, UTC).replace(tzinfo=None)
+            else:
+                if offset not in timezones:
+                    timezones[offset] = timezone(timedelta(seconds=offset))
+                start = datetime.fromtimestamp(start, timezones[offset])
+
+            extra = extra[0] if extra else {}
+            events.append(
+                Event.model_construct(
+                    title=title,
+                    start=start,
+                    end=start + timedelta(seconds=duration),
+                    all_day=bool(flags & EVENT_FLAG_ALL_DAY),
+                    tentative=bool(flags & EVENT_FLAG_TENTATIVE),
+                    description=description,
+                    calendar_title=extra.get('calendar_title'),
+                    calendar_color=extra.get('calendar_color'),
+                    location=EventLocation(**extra['location']) if 'location' in extra else None,
+                    uuid=UUID(extra['uuid']) if 'uuid' in extra else None,
+                )
+            )
+
+        return events
+
 
 class FileDownload(BaseModel):
     name: str
@@ -437,6 +532,11 @@ class WaitingListAdminOut(BaseModel):
         from_attributes = True
 
 
+class WaitingListAdminFilter(BaseModel):
+    verified: bool | None = None
+    invited: bool | None = None
+
+
 class PageLoadIn(BaseModel):
     browser: Optional[str]
     browser_version: Optional[str]
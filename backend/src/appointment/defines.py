@@ -5,6 +5,11 @@ DATEFMT = '%Y-%m-%d'
 
 # list of redis keys
 REDIS_REMOTE_EVENTS_KEY = 'rmt_events'
+REDIS_REMOTE_EVENTS_INDEX_KEY = 'rmt_events_index'
+REDIS_REMOTE_EVENTS_BUST_CHANNEL = 'rmt_events_bust'
+REDIS_REMOTE_FETCH_LOCK_KEY = 'rmt_fetch_lock'
+REDIS_REMOTE_SYNC_KEY = 'rmt_sync'
+REDIS_PUBLIC_LINK_BUST_CHANNEL = 'public_link_bust'
 
 APP_ENV_DEV = 'dev'
 APP_ENV_TEST = 'test'
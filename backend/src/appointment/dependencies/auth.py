@@ -12,6 +12,7 @@ import jwt
 
 from sqlalchemy.orm import Session
 
+from ..controller import public_link
 from ..database import repo, models
 from ..dependencies.database import get_db
 from ..exceptions import validation
@@ -146,19 +147,25 @@ def get_subscriber_from_signed_url(
     return subscriber
 
 
+def get_public_link(
+    url: str = Body(..., embed=True),
+    db: Session = Depends(get_db),
+) -> public_link.PublicLink:
+    """Retrieve a subscriber, with their schedules and connected calendars, based off a signed url or schedule slug
+    namespaced by their username."""
+    link = public_link.resolve(db, url)
+    if not link:
+        raise validation.InvalidLinkException
+
+    return link
+
+
 def get_subscriber_from_schedule_or_signed_url(
     url: str = Body(..., embed=True),
     db: Session = Depends(get_db),
 ):
     """Retrieve a subscriber based off a signed url or schedule slug namespaced by their username."""
-    subscriber = repo.subscriber.verify_link(db, url)
-    if not subscriber:
-        subscriber = repo.schedule.verify_link(db, url)
-
-    if not subscriber:
-        raise validation.InvalidLinkException
-
-    return subscriber
+    return get_public_link(url, db).subscriber
 
 def get_flash_user_data_from_token(request):
     token = request.headers.get('Authorization', None)
@@ -4,26 +4,105 @@ import time
 from typing import Optional
 
 import sentry_sdk.metrics
-from redis import Redis, RedisCluster
+from redis import Redis, RedisCluster, BlockingConnectionPool, Connection, SSLConnection
 from redis.backoff import ExponentialBackoff
 from redis.retry import Retry
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, Engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 
 _redis_instance : Optional[RedisCluster] = None
+_redis_pool: Optional[BlockingConnectionPool] = None
+_engine: Optional[Engine] = None
+_session_local: Optional[sessionmaker] = None
 
-def get_engine_and_session():
-    database_url = os.getenv('DATABASE_URL')
-    connect_args = {}
 
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long a caller waited to check out a connection"""
+
+    def _do_get(self):
+        timer_wait = time.perf_counter_ns()
+        try:
+            return super()._do_get()
+        finally:
+            sentry_sdk.metrics.distribution(
+                'db.pool.wait_time', time.perf_counter_ns() - timer_wait, unit='nanosecond'
+            )
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value.lower() == 'true' or value == '1'
+
+
+def _on_pool_connect(dbapi_connection, connection_record):
+    """A brand-new connection (and therefore a full TCP + auth handshake) was created"""
+    sentry_sdk.metrics.incr('db.pool.connect')
+
+
+def create_db_engine(database_url: str) -> Engine:
+    """Create an engine for the given url. Non-sqlite engines get a sized, pre-pinging and recycling pool."""
     if 'sqlite://' in database_url:
-        connect_args = {'check_same_thread': False}
+        # Sqlite doesn't use a real connection pool, so don't bother configuring one
+        return create_engine(database_url, connect_args={'check_same_thread': False})
+
+    engine = create_engine(
+        database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=int(os.getenv('DATABASE_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DATABASE_POOL_MAX_OVERFLOW', 10)),
+        pool_timeout=int(os.getenv('DATABASE_POOL_TIMEOUT', 30)),
+        # MySQL drops idle connections after wait_timeout, so recycle them before that happens
+        pool_recycle=int(os.getenv('DATABASE_POOL_RECYCLE', 3600)),
+        pool_pre_ping=_env_flag('DATABASE_POOL_PRE_PING', True),
+    )
+
+    def on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+        sentry_sdk.metrics.incr('db.pool.checkout')
+        sentry_sdk.metrics.gauge('db.pool.checked_out', engine.pool.checkedout())
+        sentry_sdk.metrics.gauge('db.pool.overflow', engine.pool.overflow())
+
+    event.listen(engine, 'connect', _on_pool_connect)
+    event.listen(engine, 'checkout', on_pool_checkout)
 
-    engine = create_engine(database_url, connect_args=connect_args)
-    session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return engine
 
-    return engine, session_local
+
+def boot_database_engine():
+    """Create the process-wide database engine and session factory, if they don't exist yet"""
+    global _engine, _session_local
+    if _engine is not None:
+        return _engine, _session_local
+
+    timer_boot = time.perf_counter_ns()
+
+    _engine = create_db_engine(os.getenv('DATABASE_URL'))
+    _session_local = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+
+    sentry_sdk.set_measurement('db_boot_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
+    logging.info('Created database engine')
+
+    return _engine, _session_local
+
+
+def close_database_engine():
+    """Close all pooled connections of the process-wide database engine"""
+    global _engine, _session_local
+    if _engine is None:
+        return None
+
+    _engine.dispose()
+    _engine = None
+    _session_local = None
+    logging.info('Disposed database engine')
+
+
+def get_engine_and_session():
+    """Retrieve the process-wide engine and session factory, booting them on first use."""
+    return boot_database_engine()
 
 
 def get_db():
@@ -46,7 +125,7 @@ def boot_redis_cluster():
     host = os.getenv('REDIS_URL')
     port = int(os.getenv('REDIS_PORT'))
     password = os.getenv('REDIS_PASSWORD')
-    ssl = True if os.getenv('REDIS_USE_SSL') and (os.getenv('REDIS_USE_SSL').lower() == 'true' or os.getenv('REDIS_USE_SSL').lower() == '1') else False
+    ssl = _env_flag('REDIS_USE_SSL')
     timer_boot = time.perf_counter_ns()
 
     # Retry strategy
@@ -76,31 +155,75 @@ def close_redis_cluster():
     logging.info("Closed connection to redis cluster")
 
 
-def get_redis() -> Redis | RedisCluster | None:
-    """Retrieves a redis instance or None if redis isn't available."""
-    # TODO: Create pool and simply grab instance?
-    if os.getenv('REDIS_URL') is None:
+def boot_redis_pool():
+    """Create the shared connection pool for a single (non-cluster) redis instance"""
+    global _redis_pool
+    if not os.getenv('REDIS_URL') or os.getenv('REDIS_USE_CLUSTER') or _redis_pool is not None:
         return None
 
-    host = os.getenv('REDIS_URL')
-    port = int(os.getenv('REDIS_PORT'))
-    db = os.getenv('REDIS_DB')
-    password = os.getenv('REDIS_PASSWORD')
-    ssl = True if os.getenv('REDIS_USE_SSL') and (os.getenv('REDIS_USE_SSL').lower() == 'true' or os.getenv('REDIS_USE_SSL').lower() == '1') else False
+    ssl = _env_flag('REDIS_USE_SSL')
+    socket_timeout = os.getenv('REDIS_SOCKET_TIMEOUT', 5)
+    socket_connect_timeout = os.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', 5)
 
     timer_boot = time.perf_counter_ns()
 
-    if os.getenv('REDIS_USE_CLUSTER'):
-        return _redis_instance
-
-    redis = Redis(
-        host=host,
-        port=port,
-        db=db,
-        password=password,
-        ssl=ssl,
+    # Connections are created lazily, so this doesn't touch the network yet.
+    _redis_pool = BlockingConnectionPool(
+        connection_class=SSLConnection if ssl else Connection,
+        max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+        # In seconds, how long to wait for a free connection once every connection is in use
+        timeout=int(os.getenv('REDIS_POOL_TIMEOUT', 20)),
+        host=os.getenv('REDIS_URL'),
+        port=int(os.getenv('REDIS_PORT')),
+        db=os.getenv('REDIS_DB'),
+        password=os.getenv('REDIS_PASSWORD'),
+        socket_timeout=float(socket_timeout) if socket_timeout else None,
+        socket_connect_timeout=float(socket_connect_timeout) if socket_connect_timeout else None,
+        health_check_interval=int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
         decode_responses=True,
     )
 
     sentry_sdk.set_measurement('redis_boot_time', time.perf_counter_ns() - timer_boot, 'nanosecond')
-    return redis
+    logging.info("Created redis connection pool")
+
+
+def close_redis_pool():
+    """Disconnect every connection in the shared redis connection pool"""
+    global _redis_pool
+    if _redis_pool is None:
+        return None
+
+    _redis_pool.disconnect()
+    _redis_pool = None
+    logging.info("Closed redis connection pool")
+
+
+def get_redis_pool_stats() -> dict | None:
+    """Returns how saturated the shared redis connection pool is, or None if we're not using one."""
+    if _redis_pool is None:
+        return None
+
+    # The blocking pool's queue holds a placeholder or an idle connection for every free slot
+    in_use = _redis_pool.max_connections - _redis_pool.pool.qsize()
+
+    return {
+        'in_use': in_use,
+        'max_connections': _redis_pool.max_connections,
+        'saturation': in_use / _redis_pool.max_connections,
+    }
+
+
+def get_redis() -> Redis | RedisCluster | None:
+    """Retrieves a redis instance or None if redis isn't available."""
+    if os.getenv('REDIS_URL') is None:
+        return None
+
+    if os.getenv('REDIS_USE_CLUSTER'):
+        return _redis_instance
+
+    # Boot the pool on first use if the app lifespan didn't (e.g. cli commands)
+    if _redis_pool is None:
+        boot_redis_pool()
+
+    # Clients are cheap, the connections themselves are shared through the pool.
+    return Redis(connection_pool=_redis_pool)
@@ -14,6 +14,12 @@ class GoogleInvalidCredentials(Exception):
     pass
 
 
+class GoogleSyncTokenExpired(Exception):
+    """Raise when Google API invalidated our sync token, and we need to do a full sync again"""
+
+    pass
+
+
 class APIGoogleRefreshError(APIException):
     """Raise when you need to signal to the end-user that they need to re-connect to Google."""
 
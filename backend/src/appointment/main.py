@@ -13,7 +13,15 @@ from fastapi import Request
 
 from .defines import APP_ENV_DEV, APP_ENV_TEST, APP_ENV_STAGE, APP_ENV_PROD
 from .exceptions.validation import APIRateLimitExceeded
-from .dependencies.database import boot_redis_cluster, close_redis_cluster
+from .dependencies.database import (
+    boot_redis_cluster,
+    close_redis_cluster,
+    boot_redis_pool,
+    close_redis_pool,
+    boot_database_engine,
+    close_database_engine,
+    get_redis,
+)
 from .middleware.l10n import L10n
 from .middleware.SanitizeMiddleware import SanitizeMiddleware
 
@@ -129,16 +137,30 @@ def server():
     from .routes import zoom
     from .routes import waiting_list
     from .routes import webhooks
+    from .controller.calendar import local_events
+    from .controller.public_link import public_links
 
     # Hide openapi url (which will also hide docs/redoc) if we're not dev
     openapi_url = '/openapi.json' if os.getenv('APP_ENV') == APP_ENV_DEV else None
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
-        # Boot the redis cluster as the app starts up
+        # Create the shared database engine (and its connection pool) and boot the redis cluster
+        # or redis connection pool as the app starts up
+        boot_database_engine()
         boot_redis_cluster()
+        boot_redis_pool()
+        # Listen for busted remote events and changed public links, so they're dropped from this worker's caches too
+        redis = get_redis()
+        if redis is not None:
+            local_events.listen(redis)
+            public_links.listen(redis)
         yield
+        public_links.stop()
+        local_events.stop()
+        close_redis_pool()
         close_redis_cluster()
+        close_database_engine()
 
     # init app
     app = FastAPI(openapi_url=openapi_url, lifespan=lifespan)
@@ -0,0 +1,37 @@
+"""create google calendar channels table
+
+Revision ID: 3c8ab4f26e10
+Revises: 01d80f00243f
+Create Date: 2024-10-01 12:04:31.520871
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import ForeignKey, func
+
+from appointment.database.models import encrypted_type
+
+# revision identifiers, used by Alembic.
+revision = '3c8ab4f26e10'
+down_revision = '01d80f00243f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'google_calendar_channels',
+        sa.Column('id', sa.Integer, primary_key=True, index=True),
+        sa.Column('calendar_id', sa.Integer, ForeignKey('calendars.id'), unique=True, index=True),
+        sa.Column('channel_id', encrypted_type(sa.String), unique=True, index=True),
+        sa.Column('resource_id', encrypted_type(sa.String), index=False),
+        sa.Column('token', encrypted_type(sa.String), index=False),
+        sa.Column('expires_at', sa.DateTime, index=True),
+        sa.Column('time_created', sa.DateTime, server_default=func.now(), index=True),
+        sa.Column('time_updated', sa.DateTime, server_default=func.now(), index=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('google_calendar_channels')
@@ -0,0 +1,32 @@
+"""add blind indexes
+
+Revision ID: 9acc5430bfe4
+Revises: 3c8ab4f26e10
+Create Date: 2026-10-17 09:30:12.804415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9acc5430bfe4'
+down_revision = '3c8ab4f26e10'
+branch_labels = None
+depends_on = None
+
+
+# Filled in by the backfill-blind-indexes command, and kept up to date by the models from then on
+def upgrade() -> None:
+    op.add_column('subscribers', sa.Column('username_index', sa.String(64), unique=True, index=True))
+    op.add_column('subscribers', sa.Column('email_index', sa.String(64), unique=True, index=True))
+    op.add_column('schedules', sa.Column('slug_index', sa.String(64), unique=True, index=True))
+    op.add_column('invites', sa.Column('code_index', sa.String(64), index=True))
+    op.add_column('waiting_list', sa.Column('email_index', sa.String(64), unique=True, index=True))
+
+
+def downgrade() -> None:
+    op.drop_column('subscribers', 'username_index')
+    op.drop_column('subscribers', 'email_index')
+    op.drop_column('schedules', 'slug_index')
+    op.drop_column('invites', 'code_index')
+    op.drop_column('waiting_list', 'email_index')
@@ -14,20 +14,20 @@ from redis import Redis, RedisCluster
 from sqlalchemy.orm import Session
 from starlette.responses import HTMLResponse, JSONResponse
 
-from .. import utils
 from ..controller.mailer import Attachment
 from ..database import repo, schemas
 
 # authentication
-from ..controller.calendar import CalDavConnector, Tools, GoogleConnector
+from ..controller.calendar import ConnectorFactory, Tools
 from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks, Request
+from googleapiclient.errors import HttpError
 from ..controller.apis.google_client import GoogleClient
 from ..controller.auth import signed_url_by_subscriber, schedule_links_by_subscriber
-from ..database.models import Subscriber, CalendarProvider, MeetingLinkProviderType, ExternalConnectionType, \
+from ..database.models import Subscriber, MeetingLinkProviderType, ExternalConnectionType, \
     InviteStatus
 from ..dependencies.google import get_google_client
 from ..dependencies.auth import get_subscriber
-from ..dependencies.database import get_db, get_redis
+from ..dependencies.database import get_db, get_redis, get_redis_pool_stats
 from ..exceptions import validation
 from ..exceptions.validation import RemoteCalendarConnectionError, APIException
 from ..l10n import l10n
@@ -55,7 +55,16 @@ def health(db: Session = Depends(get_db)):
             sentry_sdk.capture_exception(ex)
             return JSONResponse(content=l10n('health-bad'), status_code=503)
 
-    return JSONResponse(l10n('health-ok'), status_code=200)
+    headers = {}
+
+    # Report how many of the shared redis connections are in use
+    redis_pool_stats = get_redis_pool_stats()
+    if redis_pool_stats:
+        metrics.gauge('redis.pool.saturation', redis_pool_stats['saturation'], unit='ratio')
+        headers['X-Redis-Pool-In-Use'] = str(redis_pool_stats['in_use'])
+        headers['X-Redis-Pool-Max'] = str(redis_pool_stats['max_connections'])
+
+    return JSONResponse(l10n('health-ok'), status_code=200, headers=headers)
 
 
 @router.put('/me', response_model=schemas.SubscriberMeOut)
@@ -152,33 +161,8 @@ def create_my_calendar(
     """endpoint to add a new calendar connection for authenticated subscriber"""
 
     # Test the connection first
-    if calendar.provider == CalendarProvider.google:
-        external_connection = utils.list_first(
-            repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google)
-        )
-
-        if external_connection is None or external_connection.token is None:
-            raise RemoteCalendarConnectionError()
-
-        # I don't believe google cal touches this route, but just in case!
-        con = GoogleConnector(
-            db=db,
-            redis_instance=None,
-            google_client=google_client,
-            remote_calendar_id=calendar.user,
-            calendar_id=None,
-            subscriber_id=subscriber.id,
-            google_tkn=external_connection.token,
-        )
-    else:
-        con = CalDavConnector(
-            redis_instance=None,
-            url=calendar.url,
-            user=calendar.user,
-            password=calendar.password,
-            subscriber_id=subscriber.id,
-            calendar_id=None,
-        )
+    # I don't believe google cal touches this route, but just in case!
+    con = ConnectorFactory(db, google_client).for_calendar(subscriber.id, calendar)
 
     # Make sure we can connect to the calendar before we save it
     if not con.test_connection():
@@ -195,12 +179,7 @@ def create_my_calendar(
 @router.get('/cal/{id}', response_model=schemas.CalendarConnectionOut)
 def read_my_calendar(id: int, db: Session = Depends(get_db), subscriber: Subscriber = Depends(get_subscriber)):
     """endpoint to get a calendar from db"""
-    cal = repo.calendar.get(db, calendar_id=id)
-
-    if cal is None:
-        raise validation.CalendarNotFoundException()
-    if not repo.calendar.is_owned(db, calendar_id=id, subscriber_id=subscriber.id):
-        raise validation.CalendarNotAuthorizedException()
+    cal = repo.calendar.get_authorized(db, calendar_id=id, subscriber_id=subscriber.id)
 
     return schemas.CalendarConnectionOut(
         id=cal.id,
@@ -221,10 +200,7 @@ def update_my_calendar(
     subscriber: Subscriber = Depends(get_subscriber),
 ):
     """endpoint to update an existing calendar connection for authenticated subscriber"""
-    if not repo.calendar.exists(db, calendar_id=id):
-        raise validation.CalendarNotFoundException()
-    if not repo.calendar.is_owned(db, calendar_id=id, subscriber_id=subscriber.id):
-        raise validation.CalendarNotAuthorizedException()
+    repo.calendar.get_authorized(db, calendar_id=id, subscriber_id=subscriber.id)
 
     cal = repo.calendar.update(db=db, calendar=calendar, calendar_id=id)
     return schemas.CalendarOut(id=cal.id, title=cal.title, color=cal.color, connected=cal.connected)
@@ -240,10 +216,7 @@ def change_my_calendar_connection(
 ):
     """endpoint to update an existing calendar connection for authenticated subscriber
     note this function handles both disconnect and connect (the double route is not a typo.)"""
-    if not repo.calendar.exists(db, calendar_id=id):
-        raise validation.CalendarNotFoundException()
-    if not repo.calendar.is_owned(db, calendar_id=id, subscriber_id=subscriber.id):
-        raise validation.CalendarNotAuthorizedException()
+    repo.calendar.get_authorized(db, calendar_id=id, subscriber_id=subscriber.id)
 
     # If our path ends with /connect then connect the calendar, otherwise disconnect the calendar
     connect = request.scope.get('path', '').endswith('/connect')
@@ -258,10 +231,7 @@ def change_my_calendar_connection(
 @router.delete('/cal/{id}', response_model=schemas.CalendarOut)
 def delete_my_calendar(id: int, db: Session = Depends(get_db), subscriber: Subscriber = Depends(get_subscriber)):
     """endpoint to remove a calendar from db"""
-    if not repo.calendar.exists(db, calendar_id=id):
-        raise validation.CalendarNotFoundException()
-    if not repo.calendar.is_owned(db, calendar_id=id, subscriber_id=subscriber.id):
-        raise validation.CalendarNotAuthorizedException()
+    repo.calendar.get_authorized(db, calendar_id=id, subscriber_id=subscriber.id)
 
     cal = repo.calendar.delete(db=db, calendar_id=id)
     return schemas.CalendarOut(id=cal.id, title=cal.title, color=cal.color, connected=cal.connected)
@@ -275,32 +245,7 @@ def read_remote_calendars(
     db: Session = Depends(get_db),
 ):
     """endpoint to get calendars from a remote CalDAV server"""
-    if connection.provider == CalendarProvider.google:
-        external_connection = utils.list_first(
-            repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google)
-        )
-
-        if external_connection is None or external_connection.token is None:
-            raise RemoteCalendarConnectionError()
-
-        con = GoogleConnector(
-            db=None,
-            redis_instance=None,
-            google_client=google_client,
-            remote_calendar_id=connection.user,
-            subscriber_id=subscriber.id,
-            calendar_id=None,
-            google_tkn=external_connection.token,
-        )
-    else:
-        con = CalDavConnector(
-            redis_instance=None,
-            url=connection.url,
-            user=connection.user,
-            password=connection.password,
-            subscriber_id=subscriber.id,
-            calendar_id=None,
-        )
+    con = ConnectorFactory(db, google_client).for_calendar(subscriber.id, connection)
 
     try:
         calendars = con.list_calendars()
@@ -320,24 +265,8 @@ def sync_remote_calendars(
     """endpoint to sync calendars from a remote server"""
     # Create a list of connections and loop through them with sync
     # TODO: Also handle CalDAV connections
-
-    external_connection = utils.list_first(
-        repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google)
-    )
-
-    if external_connection is None or external_connection.token is None:
-        raise RemoteCalendarConnectionError()
-
     connections = [
-        GoogleConnector(
-            db=db,
-            redis_instance=redis,
-            google_client=google_client,
-            remote_calendar_id=None,
-            calendar_id=None,
-            subscriber_id=subscriber.id,
-            google_tkn=external_connection.token,
-        ),
+        ConnectorFactory(db, google_client, redis).google(subscriber.id, remote_calendar_id=None),
     ]
     for connection in connections:
         error_occurred = connection.sync_calendars()
@@ -363,42 +292,18 @@ def read_remote_events(
     if db_calendar is None:
         raise validation.CalendarNotFoundException()
 
-    if db_calendar.provider == CalendarProvider.google:
-        external_connection = utils.list_first(
-            repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google)
-        )
-
-        if external_connection is None or external_connection.token is None:
-            raise RemoteCalendarConnectionError()
-
-        con = GoogleConnector(
-            db=db,
-            redis_instance=redis_instance,
-            google_client=google_client,
-            remote_calendar_id=db_calendar.user,
-            calendar_id=db_calendar.id,
-            subscriber_id=subscriber.id,
-            google_tkn=external_connection.token,
-        )
-    else:
-        con = CalDavConnector(
-            redis_instance=redis_instance,
-            url=db_calendar.url,
-            user=db_calendar.user,
-            password=db_calendar.password,
-            subscriber_id=subscriber.id,
-            calendar_id=db_calendar.id,
-        )
+    connectors = ConnectorFactory(db, google_client, redis_instance)
+    con = connectors.for_calendar(subscriber.id, db_calendar, db_calendar.id)
 
     try:
         events = con.list_events(start, end)
-    except requests.exceptions.RequestException:
+    except (requests.exceptions.RequestException, HttpError):
         raise RemoteCalendarConnectionError()
 
-    for e in events:
-        e.calendar_title = db_calendar.title
-        e.calendar_color = db_calendar.color
-    return events
+    # The events may be shared through the local cache, so label copies of them
+    return [
+        e.model_copy(update={'calendar_title': db_calendar.title, 'calendar_color': db_calendar.color}) for e in events
+    ]
 
 
 @router.get('/apmt/serve/ics/{slug}/{slot_id}', response_model=schemas.FileDownload)
@@ -4,7 +4,14 @@ from contextlib import contextmanager
 import os
 
 import typer
-from ..commands import update_db, download_legal, create_invite_codes, setup
+from ..commands import (
+    update_db,
+    download_legal,
+    create_invite_codes,
+    setup,
+    renew_google_channels,
+    backfill_blind_indexes,
+)
 
 router = typer.Typer()
 
@@ -44,3 +51,15 @@ def create_app_invite_codes(n: int):
 @router.command('setup')
 def setup_app():
     setup.run()
+
+
+@router.command('renew-google-channels')
+def renew_google_calendar_channels():
+    with cron_lock('renew_google_channels'):
+        renew_google_channels.run()
+
+
+@router.command('backfill-blind-indexes')
+def backfill_encrypted_blind_indexes():
+    with cron_lock('backfill_blind_indexes'):
+        backfill_blind_indexes.run()
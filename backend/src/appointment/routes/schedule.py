@@ -8,10 +8,10 @@ from sentry_sdk import capture_exception
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
-from .. import utils
-from ..controller.calendar import CalDavConnector, Tools, GoogleConnector
+from ..controller.calendar import ConnectorFactory, Tools
 from ..controller.apis.google_client import GoogleClient
 from ..controller.auth import signed_url_by_subscriber
+from ..controller.public_link import PublicLink
 from ..database import repo, schemas, models
 from ..database.models import (
     Subscriber,
@@ -21,9 +21,7 @@ from ..database.models import (
     MeetingLinkProviderType,
     ExternalConnectionType,
 )
-from ..database.schemas import ExternalConnection
-from ..dependencies.auth import get_subscriber, get_subscriber_from_signed_url, \
-    get_subscriber_from_schedule_or_signed_url
+from ..dependencies.auth import get_subscriber, get_subscriber_from_signed_url, get_public_link
 from ..dependencies.database import get_db, get_redis
 from ..dependencies.google import get_google_client
 from datetime import datetime, timedelta, timezone
@@ -32,7 +30,7 @@ from zoneinfo import ZoneInfo
 from ..dependencies.zoom import get_zoom_client
 from ..exceptions import validation
 from ..exceptions.calendar import EventNotCreatedException
-from ..exceptions.validation import RemoteCalendarConnectionError, EventCouldNotBeAccepted
+from ..exceptions.validation import EventCouldNotBeAccepted
 from ..tasks.emails import (
     send_pending_email,
     send_confirmation_email,
@@ -53,12 +51,7 @@ def create_calendar_schedule(
     subscriber: Subscriber = Depends(get_subscriber),
 ):
     """endpoint to add a new schedule for a given calendar"""
-    if not repo.calendar.exists(db, calendar_id=schedule.calendar_id):
-        raise validation.CalendarNotFoundException()
-    if not repo.calendar.is_owned(db, calendar_id=schedule.calendar_id, subscriber_id=subscriber.id):
-        raise validation.CalendarNotAuthorizedException()
-    if not repo.calendar.is_connected(db, calendar_id=schedule.calendar_id):
-        raise validation.CalendarNotConnectedException()
+    repo.calendar.get_authorized(db, calendar_id=schedule.calendar_id, subscriber_id=subscriber.id, connected=True)
 
     db_schedule = repo.schedule.create(db=db, schedule=schedule)
 
@@ -86,12 +79,7 @@ def read_schedule(
 ):
     """Gets information regarding a specific schedule
     TODO: Currently unused, but we'll need it soon."""
-    schedule = repo.schedule.get(db, schedule_id=id)
-    if schedule is None:
-        raise validation.ScheduleNotFoundException()
-    if not repo.schedule.is_owned(db, schedule_id=id, subscriber_id=subscriber.id):
-        raise validation.ScheduleNotAuthorizedException()
-    return schedule
+    return repo.schedule.get_authorized(db, schedule_id=id, subscriber_id=subscriber.id)
 
 
 @router.put('/{id}', response_model=schemas.Schedule)
@@ -102,12 +90,7 @@ def update_schedule(
     subscriber: Subscriber = Depends(get_subscriber),
 ):
     """endpoint to update an existing calendar connection for authenticated subscriber"""
-    if not repo.schedule.exists(db, schedule_id=id):
-        raise validation.ScheduleNotFoundException()
-    if not repo.calendar.is_connected(db, calendar_id=schedule.calendar_id):
-        raise validation.CalendarNotConnectedException()
-    if not repo.schedule.is_owned(db, schedule_id=id, subscriber_id=subscriber.id):
-        raise validation.ScheduleNotAuthorizedException()
+    repo.schedule.get_authorized(db, schedule_id=id, subscriber_id=subscriber.id, calendar_id=schedule.calendar_id)
     if (
         schedule.meeting_link_provider == MeetingLinkProviderType.zoom
         and subscriber.get_external_connection(ExternalConnectionType.zoom) is None
@@ -128,18 +111,20 @@ def update_schedule(
 @limiter.limit("20/minute")
 def read_schedule_availabilities(
     request: Request,
-    subscriber: Subscriber = Depends(get_subscriber_from_schedule_or_signed_url),
+    link: PublicLink = Depends(get_public_link),
     db: Session = Depends(get_db),
     redis=Depends(get_redis),
     google_client: GoogleClient = Depends(get_google_client),
 ):
     """Returns the calculated availability for the first schedule from a subscribers public profile link
     """
+    subscriber = link.subscriber
+
     # Raise a schedule not found exception if the schedule owner does not have a timezone set.
     if subscriber.timezone is None:
         raise validation.ScheduleNotFoundException()
 
-    schedules = repo.schedule.get_by_subscriber(db, subscriber_id=subscriber.id)
+    schedules = link.schedules
 
     try:
         schedule = schedules[0]  # for now we only process the first existing schedule
@@ -154,17 +139,17 @@ def read_schedule_availabilities(
     if not schedule.calendar or not schedule.calendar.connected:
         raise validation.ScheduleNotActive()
 
-    calendars = repo.calendar.get_by_subscriber(db, subscriber.id, False)
+    calendars = link.calendars
 
     if not calendars or len(calendars) == 0:
         raise validation.CalendarNotFoundException()
 
-    # calculate theoretically possible slots from schedule config
-    available_slots = Tools.available_slots_from_schedule(schedule)
+    # lazily calculate theoretically possible slots from schedule config
+    available_slots = Tools.available_slot_times_from_schedule(schedule)
 
-    # get all events from all connected calendars in scheduled date range
-    existing_slots = Tools.existing_events_for_schedule(schedule, calendars, subscriber, google_client, db, redis)
-    actual_slots = Tools.events_roll_up_difference(available_slots, existing_slots)
+    # get the busy times from all connected calendars in scheduled date range
+    existing_busy = Tools.existing_busy_for_schedule(schedule, calendars, subscriber, google_client, db, redis)
+    actual_slots = Tools.slot_times_roll_up_difference(available_slots, existing_busy, ZoneInfo(subscriber.timezone))
 
     if not actual_slots or len(actual_slots) == 0:
         raise validation.SlotNotFoundException()
@@ -186,19 +171,20 @@ def request_schedule_availability_slot(
     request: Request,
     s_a: schemas.AvailabilitySlotAttendee,
     background_tasks: BackgroundTasks,
-    subscriber: Subscriber = Depends(get_subscriber_from_schedule_or_signed_url),
+    link: PublicLink = Depends(get_public_link),
     db: Session = Depends(get_db),
     redis=Depends(get_redis),
     google_client=Depends(get_google_client),
 ):
     """endpoint to request a time slot for a schedule via public link and send confirmation mail to owner if set
     """
+    subscriber = link.subscriber
 
     # Raise a schedule not found exception if the schedule owner does not have a timezone set.
     if subscriber.timezone is None:
         raise validation.ScheduleNotFoundException()
 
-    schedules = repo.schedule.get_by_subscriber(db, subscriber_id=subscriber.id)
+    schedules = link.schedules
 
     try:
         schedule = schedules[0]  # for now we only process the first existing schedule
@@ -224,36 +210,18 @@ def request_schedule_availability_slot(
         raise validation.SlotAlreadyTakenException()
 
     # We need to verify that the time is actually available on the remote calendar
-    if calendar.provider == CalendarProvider.google:
-        external_connection = utils.list_first(repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google))
-
-        if external_connection is None or external_connection.token is None:
-            raise RemoteCalendarConnectionError()
-
-        con = GoogleConnector(
-            db=db,
-            redis_instance=redis,
-            google_client=google_client,
-            remote_calendar_id=calendar.user,
-            subscriber_id=subscriber.id,
-            calendar_id=calendar.id,
-            google_tkn=external_connection.token,
-        )
-    else:
-        con = CalDavConnector(
-            redis_instance=redis,
-            subscriber_id=subscriber.id,
-            calendar_id=calendar.id,
-            url=calendar.url,
-            user=calendar.user,
-            password=calendar.password,
-        )
+    connectors = ConnectorFactory(db, google_client, redis)
+    calendars = link.calendars
 
     # Ok we need to clear the cache for all calendars, because we need to recheck them.
-    con.bust_cached_events(True)
-    calendars = repo.calendar.get_by_subscriber(db, subscriber.id, False)
+    # Except for watched Google calendars, their cache is cleared as soon as they change.
+    for remote_calendar in calendars:
+        if not connectors.is_watched(subscriber.id, remote_calendar.id):
+            connectors.for_calendar(subscriber.id, remote_calendar, remote_calendar.id).bust_cached_events()
+
+    # A calendar we can't read might have the slot taken, so don't book it blind
     existing_remote_events = Tools.existing_events_for_schedule(
-        schedule, calendars, subscriber, google_client, db, redis
+        schedule, calendars, subscriber, google_client, db, redis, connectors, strict=True
     )
     has_collision = Tools.events_roll_up_difference([slot], existing_remote_events)
 
@@ -503,35 +471,12 @@ def handle_schedule_availability_decision(
     organizer_email = subscriber.email
 
     # create remote event
+    connectors = ConnectorFactory(db, google_client, redis)
     if calendar.provider == CalendarProvider.google:
-        external_connection: ExternalConnection | None = utils.list_first(
-            repo.external_connection.get_by_type(db, subscriber.id, schemas.ExternalConnectionType.google)
-        )
-
-        if external_connection is None or external_connection.token is None:
-            raise RemoteCalendarConnectionError()
-
         # Email is stored in the name
-        organizer_email = external_connection.name
-
-        con = GoogleConnector(
-            db=db,
-            redis_instance=redis,
-            google_client=google_client,
-            remote_calendar_id=calendar.user,
-            subscriber_id=subscriber.id,
-            calendar_id=calendar.id,
-            google_tkn=external_connection.token,
-        )
-    else:
-        con = CalDavConnector(
-            redis_instance=redis,
-            subscriber_id=subscriber.id,
-            calendar_id=calendar.id,
-            url=calendar.url,
-            user=calendar.user,
-            password=calendar.password,
-        )
+        organizer_email = connectors.google_connection(subscriber.id).name
+
+    con = connectors.for_calendar(subscriber.id, calendar, calendar.id)
 
     try:
         con.create_event(event=event, attendee=slot.attendee, organizer=subscriber, organizer_email=organizer_email)
@@ -1,11 +1,13 @@
 import json
 import logging
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 
 from sqlalchemy.orm import Session
 
-from ..database import repo, schemas, models
+from .. import utils
+from ..database import repo, schemas
 from ..database.models import Subscriber
 from ..dependencies.auth import get_admin_subscriber, get_subscriber
 from ..dependencies.database import get_db
@@ -19,10 +21,45 @@ These require get_admin_subscriber!
 """
 
 @router.get('/', response_model=list[schemas.SubscriberAdminOut])
-def get_all_subscriber(request: Request, db: Session = Depends(get_db), _: Subscriber = Depends(get_admin_subscriber)):
-    """List all existing invites, needs admin permissions"""
-    response = db.query(models.Subscriber).all()
-    return response
+def get_all_subscriber(
+    request: Request,
+    filters: schemas.SubscriberAdminFilter = Depends(),
+    after: int | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+    _: Subscriber = Depends(get_admin_subscriber),
+):
+    """List existing subscribers, needs admin permissions. Pass the last listed id as after to get the next page."""
+    return repo.subscriber.get_all(db, filters, after, limit)
+
+
+@router.get('/count', response_model=int)
+def count_all_subscriber(
+    filters: schemas.SubscriberAdminFilter = Depends(),
+    db: Session = Depends(get_db),
+    _: Subscriber = Depends(get_admin_subscriber),
+):
+    """Count existing subscribers, needs admin permissions"""
+    return repo.subscriber.count_all(db, filters)
+
+
+@router.get('/stream')
+def stream_all_subscriber(
+    filters: schemas.SubscriberAdminFilter = Depends(),
+    after: int | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    _: Subscriber = Depends(get_admin_subscriber),
+):
+    """Stream existing subscribers as newline delimited json, needs admin permissions"""
+    return StreamingResponse(
+        utils.stream_ndjson(
+            lambda db, page_after, page_limit: repo.subscriber.get_all(db, filters, page_after, page_limit),
+            schemas.SubscriberAdminOut,
+            after,
+            limit,
+        ),
+        media_type='application/x-ndjson',
+    )
 
 
 @router.put('/disable/{email}')
@@ -5,7 +5,9 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from posthog import Posthog
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
+from .. import utils
 from ..database import repo, schemas, models
 from ..dependencies.auth import get_admin_subscriber
 
@@ -106,10 +108,45 @@ These require get_admin_subscriber!
 
 
 @router.get('/', response_model=list[schemas.WaitingListAdminOut])
-def get_all_waiting_list_users(db: Session = Depends(get_db), _: models.Subscriber = Depends(get_admin_subscriber)):
-    """List all existing waiting list users, needs admin permissions"""
-    response = db.query(models.WaitingList).all()
-    return response
+def get_all_waiting_list_users(
+    filters: schemas.WaitingListAdminFilter = Depends(),
+    after: int | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    db: Session = Depends(get_db),
+    _: models.Subscriber = Depends(get_admin_subscriber),
+):
+    """List existing waiting list users, needs admin permissions. Pass the last listed id as after to get the next
+    page."""
+    return repo.invite.get_waiting_list(db, filters, after, limit)
+
+
+@router.get('/count', response_model=int)
+def count_waiting_list_users(
+    filters: schemas.WaitingListAdminFilter = Depends(),
+    db: Session = Depends(get_db),
+    _: models.Subscriber = Depends(get_admin_subscriber),
+):
+    """Count existing waiting list users, needs admin permissions"""
+    return repo.invite.count_waiting_list(db, filters)
+
+
+@router.get('/stream')
+def stream_waiting_list_users(
+    filters: schemas.WaitingListAdminFilter = Depends(),
+    after: int | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    _: models.Subscriber = Depends(get_admin_subscriber),
+):
+    """Stream existing waiting list users as newline delimited json, needs admin permissions"""
+    return StreamingResponse(
+        utils.stream_ndjson(
+            lambda db, page_after, page_limit: repo.invite.get_waiting_list(db, filters, page_after, page_limit),
+            schemas.WaitingListAdminOut,
+            after,
+            limit,
+        ),
+        media_type='application/x-ndjson',
+    )
 
 
 @router.post('/invite', response_model=schemas.WaitingListInviteAdminOut)
@@ -1,14 +1,17 @@
 import logging
+import secrets
 
 import requests
 import sentry_sdk
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from redis import Redis, RedisCluster
 from sqlalchemy.orm import Session
 
 from ..controller import auth, data
 from ..controller.apis.fxa_client import FxaClient
+from ..controller.calendar import BaseConnector
 from ..database import repo, models, schemas
-from ..dependencies.database import get_db
+from ..dependencies.database import get_db, get_redis
 from ..dependencies.fxa import get_webhook_auth, get_fxa_client
 from ..exceptions.account_api import AccountDeletionSubscriberFail
 from ..exceptions.fxa_api import MissingRefreshTokenException
@@ -86,3 +89,28 @@ def fxa_process(
 
             case _:
                 logging.warning(f'Ignoring event {event}')
+
+
+@router.post('/google-calendar')
+def google_calendar_notification(
+    request: Request,
+    db: Session = Depends(get_db),
+    redis_instance: Redis | RedisCluster | None = Depends(get_redis),
+):
+    """Receives Google's push notifications for watched calendars, and clears the changed calendar's cached events.
+    Ref: https://developers.google.com/calendar/api/guides/push"""
+    channel_id = request.headers.get('X-Goog-Channel-ID')
+    channel_token = request.headers.get('X-Goog-Channel-Token', '')
+    resource_state = request.headers.get('X-Goog-Resource-State')
+
+    channel = repo.google_calendar_channel.get_by_channel_id(db, channel_id) if channel_id else None
+    if channel is None or not secrets.compare_digest(channel.token.encode(), channel_token.encode()):
+        # Don't error out, otherwise Google keeps retrying
+        logging.warning('[webhooks.google_calendar_notification] Notification received for an unknown channel.')
+        return
+
+    # The first notification only confirms the channel is open
+    if resource_state == 'sync':
+        return
+
+    BaseConnector(channel.calendar.owner_id, channel.calendar_id, redis_instance).bust_cached_events()
@@ -1,14 +1,20 @@
+import hashlib
+import hmac
 import json
 import re
 import urllib.parse
+from collections.abc import Callable, Iterator
 from urllib import parse
 
-from functools import cache
+from functools import cache, lru_cache
 
 from argon2 import PasswordHasher
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
 from sqlalchemy_utils.types.encrypted.encrypted_type import AesEngine
 
 from appointment.database.models import secret
+from appointment.dependencies.database import get_engine_and_session
 
 ph = PasswordHasher()
 
@@ -46,6 +52,19 @@ def setup_encryption_engine():
     return engine
 
 
+@cache
+def cache_key_secret() -> bytes:
+    """The key cache keys are hashed with, derived from our secret so it's the same in every process"""
+    return hmac.new(secret().encode(), b'appointment-cache-keys', hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=65536)
+def hash_cache_key(key) -> str:
+    """Obscures (part of) a cache key with a keyed hash. Unlike encrypting it, this is cheap, and the results of
+    the same few subscribers, calendars and days are remembered anyway."""
+    return hmac.new(cache_key_secret(), str(key).encode(), hashlib.sha256).hexdigest()[:32]
+
+
 def retrieve_user_url_data(url):
     """URL Decodes, and retrieves username, signature, and main url from /<username>/<signature>/"""
     parsed_url = parse.urlparse(url)
@@ -69,3 +88,33 @@ def retrieve_user_url_data(url):
 
     # Return the username and signature decoded, but ensure the clean_url is encoded.
     return urllib.parse.unquote_plus(username), urllib.parse.unquote_plus(signature), clean_url
+
+
+def stream_ndjson(
+    get_page: Callable[[Session, int | None, int], list],
+    schema: type[BaseModel],
+    after: int | None = None,
+    limit: int | None = None,
+    page_size: int = 500,
+) -> Iterator[str]:
+    """Yields rows as newline delimited json, one line per row, fetched a page at a time with get_page(db, after, limit)
+    paging on the rows' ids. Only one page of rows is kept around at once.
+    The request's session is closed before its response streams, so the pages are read with a session of our own."""
+    _, session = get_engine_and_session()
+    db = session()
+    try:
+        while limit is None or limit > 0:
+            size = page_size if limit is None else min(page_size, limit)
+            rows = get_page(db, after, size)
+            for row in rows:
+                yield schema.model_validate(row).model_dump_json() + '\n'
+
+            if len(rows) < size:
+                break
+            after = rows[-1].id
+            if limit is not None:
+                limit -= len(rows)
+            # Don't keep the rows we've already sent around in the session
+            db.expunge_all()
+    finally:
+        db.close()
@@ -2,6 +2,7 @@ import os
 
 from dotenv import load_dotenv, find_dotenv
 import pytest
+from redis.exceptions import LockNotOwnedError
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
@@ -27,6 +28,8 @@ from factory.waiting_list_factory import make_waiting_list  # noqa: F401
 load_dotenv(find_dotenv('.env.test'), override=True)
 
 from appointment.main import server  # noqa: E402
+from appointment.controller.calendar import local_events  # noqa: E402
+from appointment.controller.public_link import public_links  # noqa: E402
 from appointment.database import models, repo, schemas  # noqa: E402
 from appointment.dependencies import database, auth, google  # noqa: E402
 from appointment.middleware.l10n import L10n  # noqa: E402
@@ -134,6 +137,8 @@ def with_db():
 
     models.Base.metadata.drop_all(bind=engine)
     models.Base.metadata.create_all(bind=engine)
+    # Links resolved in other tests may point at rows that were just dropped
+    public_links.clear()
 
     # Ensure we have a default subscriber
     with testing_local_session() as db:
@@ -185,12 +190,122 @@ def with_client(with_db, monkeypatch):
     app.dependency_overrides[google.get_google_client] = override_get_google_client
     # For now we don't use redis in our tests
     app.dependency_overrides[database.get_redis] = lambda: None
+    # Streamed responses read the database with a session of their own
+    monkeypatch.setattr('appointment.utils.get_engine_and_session', lambda: (None, with_db))
 
     client = TestClient(app)
 
     yield client
 
 
+class MockRedis:
+    """Just enough of redis-py's client, kept in memory, for unit testing our cache code"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiries = {}
+        self.published = []
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def mget(self, names):
+        return [self.data.get(name) for name in names]
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value
+        self.expiries[name] = ex
+        return True
+
+    def delete(self, *names):
+        return len([self.data.pop(name) for name in names if name in self.data])
+
+    unlink = delete
+
+    def expire(self, name, time):
+        if name not in self.data:
+            return False
+        self.expiries[name] = time
+        return True
+
+    def sadd(self, name, *values):
+        members = self.data.setdefault(name, set())
+        added = len(set(values) - members)
+        members.update(values)
+        return added
+
+    def smembers(self, name):
+        return set(self.data.get(name, set()))
+
+    def srem(self, name, *values):
+        members = self.data.get(name, set())
+        removed = len(members & set(values))
+        members.difference_update(values)
+        if not members:
+            self.data.pop(name, None)
+        return removed
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def pipeline(self, transaction=True):
+        return MockRedisPipeline(self)
+
+    def lock(self, name, timeout=None, sleep=0.1, blocking_timeout=None):
+        return MockRedisLock(self, name)
+
+
+class MockRedisLock:
+    """A non-blocking take on redis-py's locks, on top of MockRedis"""
+
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+        self.token = object()
+
+    def acquire(self, blocking=None, blocking_timeout=None):
+        if self.name in self.redis.data:
+            return False
+        self.redis.data[self.name] = self.token
+        return True
+
+    def locked(self):
+        return self.name in self.redis.data
+
+    def release(self):
+        if self.redis.data.get(self.name) is not self.token:
+            raise LockNotOwnedError('Cannot release a lock that is no longer owned')
+        del self.redis.data[self.name]
+
+
+class MockRedisPipeline:
+    """Queues up commands until they're executed, like redis-py's pipelines"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+@pytest.fixture()
+def with_redis():
+    # The local cache outlives a test, and the same subscriber and calendar ids are used everywhere
+    local_events.clear()
+    yield MockRedis()
+    local_events.clear()
+
+
 @pytest.fixture()
 def with_l10n():
     """Creates a fake starlette_context context with just the l10n function, only needed for unit tests.
@@ -1,3 +1,4 @@
+import json
 import os
 
 import pytest
@@ -51,6 +52,8 @@ def get_mock_connector_class():
             remote_calendar_id,
             google_client,
             google_tkn: str = None,
+            google_credentials=None,
+            watched=False,
         ):
             pass
 
@@ -85,7 +88,11 @@ class TestCalendar:
     ):
         # Ensure we have an external connection for google
         if provider == schemas.CalendarProvider.google.value:
-            make_external_connections(TEST_USER_ID, type=schemas.ExternalConnectionType.google)
+            make_external_connections(
+                TEST_USER_ID,
+                type=schemas.ExternalConnectionType.google,
+                token=json.dumps({'client_id': 'abc', 'client_secret': 'def', 'refresh_token': 'ghi'}),
+            )
 
         # Patch up the caldav constructor, and list_calendars
         monkeypatch.setattr(connector, '__init__', mock_connector.__init__)
@@ -2,6 +2,7 @@ import zoneinfo
 from datetime import date, time, datetime, timedelta
 from unittest.mock import patch
 
+import caldav.lib.error
 import pytest
 from freezegun import freeze_time
 
@@ -240,6 +241,20 @@ class TestSchedule:
         )
         assert response.status_code == 403, response.text
 
+    def test_update_schedule_onto_foreign_calendar(
+        self, with_client, make_pro_subscriber, make_caldav_calendar, make_schedule
+    ):
+        generated_schedule = make_schedule()
+        the_other_guy = make_pro_subscriber()
+        foreign_calendar = make_caldav_calendar(the_other_guy.id, connected=True)
+
+        response = with_client.put(
+            f'/schedule/{generated_schedule.id}',
+            json={'calendar_id': foreign_calendar.id, 'name': 'Schedule'},
+            headers=auth_headers,
+        )
+        assert response.status_code == 403, response.text
+
     def test_public_availability(
         self, monkeypatch, with_client, make_pro_subscriber, make_caldav_calendar, make_schedule
     ):
@@ -250,11 +265,11 @@ class TestSchedule:
                 pass
 
             @staticmethod
-            def list_events(self, start, end):
+            def list_busy(self, start, end):
                 return []
 
         monkeypatch.setattr(CalDavConnector, '__init__', MockCaldavConnector.__init__)
-        monkeypatch.setattr(CalDavConnector, 'list_events', MockCaldavConnector.list_events)
+        monkeypatch.setattr(CalDavConnector, 'list_busy', MockCaldavConnector.list_busy)
 
         start_date = date(2024, 3, 1)
         start_time = time(16)
@@ -365,18 +380,14 @@ class TestSchedule:
                 pass
 
             @staticmethod
-            def list_events(self, start, end):
+            def list_busy(self, start, end):
                 return [
-                    schemas.Event(
-                        title='A blocker!',
-                        start=start_end_datetimes[0],
-                        end=start_end_datetimes[1],
-                    )
+                    (start_end_datetimes[0].timestamp(), start_end_datetimes[1].timestamp(), False)
                     for start_end_datetimes in blocker_times
                 ]
 
         monkeypatch.setattr(CalDavConnector, '__init__', MockCaldavConnector.__init__)
-        monkeypatch.setattr(CalDavConnector, 'list_events', MockCaldavConnector.list_events)
+        monkeypatch.setattr(CalDavConnector, 'list_busy', MockCaldavConnector.list_busy)
 
         subscriber = make_pro_subscriber()
         generated_calendar = make_caldav_calendar(subscriber.id, connected=True)
@@ -602,6 +613,72 @@ class TestRequestScheduleAvailability:
             assert email_tasks.send_invite_email in send_invite_email_call[0]
             assert email_tasks.send_new_booking_email in send_new_booking_email_call[0]
 
+    def test_fail_on_unreadable_calendar(
+        self, monkeypatch, with_db, with_client, make_pro_subscriber, make_caldav_calendar, make_schedule
+    ):
+        """Test that a booking is refused when one of the connected calendars can't be read"""
+        start_date = date(2024, 4, 1)
+        start_time = time(9)
+        end_time = time(10)
+
+        subscriber = make_pro_subscriber()
+        generated_calendar = make_caldav_calendar(subscriber.id, connected=True)
+        broken_calendar = make_caldav_calendar(subscriber.id, connected=True)
+
+        class MockCaldavConnector:
+            @staticmethod
+            def __init__(self, redis_instance, url, user, password, subscriber_id, calendar_id):
+                """We don't want to initialize a client"""
+                self.calendar_id = calendar_id
+
+            @staticmethod
+            def list_events(self, start, end):
+                if self.calendar_id == broken_calendar.id:
+                    raise caldav.lib.error.AuthorizationError()
+                return []
+
+            @staticmethod
+            def bust_cached_events(self, all_calendars=False):
+                pass
+
+        monkeypatch.setattr(CalDavConnector, '__init__', MockCaldavConnector.__init__)
+        monkeypatch.setattr(CalDavConnector, 'list_events', MockCaldavConnector.list_events)
+        monkeypatch.setattr(CalDavConnector, 'bust_cached_events', MockCaldavConnector.bust_cached_events)
+
+        schedule = make_schedule(
+            calendar_id=generated_calendar.id,
+            active=True,
+            start_date=start_date,
+            start_time=start_time,
+            end_time=end_time,
+            end_date=None,
+            earliest_booking=1440,
+            farthest_booking=20160,
+            slot_duration=30,
+        )
+
+        signed_url = signed_url_by_subscriber(subscriber)
+
+        slot_availability = schemas.AvailabilitySlotAttendee(
+            slot=schemas.SlotBase(start=datetime.combine(start_date, start_time), duration=30),
+            attendee=schemas.AttendeeBase(email='hello@example.org', name='Greg', timezone='Europe/Berlin'),
+        ).model_dump(mode='json')
+
+        response = with_client.put(
+            '/schedule/public/availability/request',
+            json={
+                's_a': slot_availability,
+                'url': signed_url,
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 400, response.text
+        assert response.json().get('detail').get('id') == validation.RemoteCalendarConnectionError.id_code
+
+        # Nothing was booked
+        with with_db() as db:
+            assert not db.query(models.Slot).filter(models.Slot.schedule_id == schedule.id).count()
+
 
 class TestDecideScheduleAvailabilitySlot:
     start_date = datetime.now() - timedelta(days=4)
@@ -0,0 +1,52 @@
+import json
+import os
+
+from appointment.database import models, repo
+from defines import auth_headers, TEST_USER_ID
+
+
+class TestSubscriberAdminView:
+    def test_view_pages_and_filters(self, with_client, with_db, make_basic_subscriber, make_invite):
+        os.environ['APP_ADMIN_ALLOW_LIST'] = os.getenv('TEST_USER_EMAIL')
+
+        invited = make_basic_subscriber()
+        make_invite(subscriber_id=invited.id)
+        deleted = make_basic_subscriber()
+        with with_db() as db:
+            repo.subscriber.disable(db, repo.subscriber.get(db, deleted.id))
+
+        response = with_client.get('/subscriber/', params={'limit': 2}, headers=auth_headers)
+        assert response.status_code == 200, response.json()
+        assert [subscriber['id'] for subscriber in response.json()] == [TEST_USER_ID, invited.id]
+
+        response = with_client.get('/subscriber/', params={'after': invited.id}, headers=auth_headers)
+        assert [subscriber['id'] for subscriber in response.json()] == [deleted.id]
+
+        response = with_client.get('/subscriber/', params={'invited': True}, headers=auth_headers)
+        assert [subscriber['id'] for subscriber in response.json()] == [invited.id]
+
+        response = with_client.get(
+            '/subscriber/', params={'deleted': False, 'level': models.SubscriberLevel.basic.value}, headers=auth_headers
+        )
+        assert [subscriber['id'] for subscriber in response.json()] == [invited.id]
+
+        response = with_client.get('/subscriber/count', params={'deleted': True}, headers=auth_headers)
+        assert response.json() == 1
+
+    def test_stream(self, with_client, with_db, make_basic_subscriber):
+        os.environ['APP_ADMIN_ALLOW_LIST'] = os.getenv('TEST_USER_EMAIL')
+
+        subscribers = [make_basic_subscriber() for _ in range(3)]
+
+        response = with_client.get('/subscriber/stream', params={'after': TEST_USER_ID}, headers=auth_headers)
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line['email'] for line in lines] == [subscriber.email for subscriber in subscribers]
+
+    def test_count_non_admin(self, with_client, with_db):
+        os.environ['APP_ADMIN_ALLOW_LIST'] = f"{os.getenv('TEST_USER_EMAIL')}-naw.com"
+
+        response = with_client.get('/subscriber/count', headers=auth_headers)
+
+        assert response.status_code == 401, response.json()
@@ -1,3 +1,4 @@
+import json
 import os
 import pytest
 from itsdangerous import URLSafeSerializer
@@ -287,6 +288,42 @@ class TestWaitingListAdminView:
         assert response.status_code == 401, data
 
 
+    def test_view_pages_and_filters(self, with_client, with_db, with_l10n, make_waiting_list):
+        os.environ['APP_ADMIN_ALLOW_LIST'] = os.getenv('TEST_USER_EMAIL')
+
+        entries = [make_waiting_list(email_verified=index % 2 == 0) for index in range(5)]
+        verified = [entry.id for entry in entries if entry.email_verified]
+
+        response = with_client.get('/waiting-list/', params={'limit': 2}, headers=auth_headers)
+        assert response.status_code == 200, response.json()
+        assert [entry['id'] for entry in response.json()] == [entries[0].id, entries[1].id]
+
+        response = with_client.get('/waiting-list/', params={'after': entries[1].id}, headers=auth_headers)
+        assert [entry['id'] for entry in response.json()] == [entry.id for entry in entries[2:]]
+
+        response = with_client.get('/waiting-list/', params={'verified': True}, headers=auth_headers)
+        assert [entry['id'] for entry in response.json()] == verified
+
+        response = with_client.get('/waiting-list/count', params={'verified': False}, headers=auth_headers)
+        assert response.json() == len(entries) - len(verified)
+
+    def test_stream(self, with_client, with_db, with_l10n, make_waiting_list):
+        os.environ['APP_ADMIN_ALLOW_LIST'] = os.getenv('TEST_USER_EMAIL')
+
+        entries = [make_waiting_list() for _ in range(5)]
+
+        response = with_client.get('/waiting-list/stream', params={'after': entries[0].id}, headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line['id'] for line in lines] == [entry.id for entry in entries[1:]]
+        assert lines[0]['email'] == entries[1].email
+
+        response = with_client.get('/waiting-list/stream', params={'limit': 3}, headers=auth_headers)
+        assert len(response.text.splitlines()) == 3
+
+
 class TestWaitingListAdminInvite:
     def test_invite_one_user(self, with_client, with_db, with_l10n, make_waiting_list):
         """Test a successful invitation of one user"""
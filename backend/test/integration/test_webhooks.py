@@ -1,6 +1,7 @@
 import datetime
 
 from freezegun import freeze_time
+from appointment.controller.calendar import BaseConnector
 from appointment.database import models, repo
 
 from appointment.dependencies.fxa import get_webhook_auth
@@ -167,3 +168,51 @@ class TestFXAWebhooks:
             assert repo.subscriber.get(db, subscriber.id) is None
             assert repo.calendar.get(db, calendar.id) is None
             assert repo.appointment.get(db, appointment.id) is None
+
+
+class TestGoogleCalendarWebhooks:
+    def test_google_calendar_notification(self, with_db, with_client, monkeypatch, make_google_calendar):
+        calendar = make_google_calendar(connected=True)
+        with with_db() as db:
+            repo.google_calendar_channel.update_or_create(
+                db,
+                calendar_id=calendar.id,
+                channel_id='channel-1',
+                resource_id='resource-1',
+                token='secret',
+                expires_at=datetime.datetime.now() + datetime.timedelta(days=1),
+            )
+
+        busted = []
+
+        def bust_cached_events(self, all_calendars=False):
+            busted.append((self.subscriber_id, self.calendar_id, all_calendars))
+            return True
+
+        monkeypatch.setattr(BaseConnector, 'bust_cached_events', bust_cached_events)
+
+        def notify(channel_id='channel-1', token='secret', state='exists'):
+            response = with_client.post(
+                '/webhooks/google-calendar',
+                headers={
+                    'X-Goog-Channel-ID': channel_id,
+                    'X-Goog-Channel-Token': token,
+                    'X-Goog-Resource-ID': 'resource-1',
+                    'X-Goog-Resource-State': state,
+                },
+            )
+            assert response.status_code == 200, response.text
+
+        # The channel was just opened, nothing changed yet
+        notify(state='sync')
+        assert busted == []
+
+        # Unknown channels and wrong tokens are ignored
+        notify(channel_id='channel-2')
+        notify(token='not-the-secret')
+        notify(token='sécret'.encode())
+        assert busted == []
+
+        # Only the changed calendar is cleared
+        notify()
+        assert busted == [(calendar.owner_id, calendar.id, False)]
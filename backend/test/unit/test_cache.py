@@ -1,6 +1,20 @@
 import datetime
+import hashlib
+import hmac
+import json
+import time
+import uuid
+import zoneinfo
+from concurrent.futures import ThreadPoolExecutor
 
-from appointment.database.schemas import Event
+import pytest
+import requests
+
+from appointment import utils
+from appointment.controller import calendar
+from appointment.controller.calendar import BaseConnector, CalDavConnector, LocalEventCache, local_events
+from appointment.defines import REDIS_REMOTE_EVENTS_BUST_CHANNEL, REDIS_REMOTE_FETCH_LOCK_KEY
+from appointment.database.schemas import Event, EventLocation
 
 
 class TestEncrypt:
@@ -27,3 +41,308 @@ class TestEncrypt:
         # Ensure individual accessors are not encrypted
         assert new_event_cached.title == title
         assert new_event_cached.description == description
+
+    def test_cached_event_lists(self):
+        """Test our model_(dump/load)_redis_many functions pack events without leaking data or losing any."""
+        start = datetime.datetime(2024, 3, 4, 10, 30, tzinfo=zoneinfo.ZoneInfo('America/Vancouver'))
+        events = [
+            Event(title='Private event!', start=start, end=start + datetime.timedelta(minutes=45)),
+            Event(
+                title='Tentative event',
+                start=start.astimezone(datetime.UTC),
+                end=start + datetime.timedelta(hours=1, seconds=0.5),
+                tentative=True,
+                description='This is a super secret event!',
+            ),
+            Event(
+                title='All day event',
+                start=datetime.datetime(2024, 3, 5),
+                end=datetime.datetime(2024, 3, 6),
+                all_day=True,
+                calendar_title='Work',
+                calendar_color='#123456',
+                location=EventLocation(url='https://example.org'),
+                uuid=uuid.uuid4(),
+            ),
+        ]
+
+        encrypted_blob = Event.model_dump_redis_many(events)
+
+        assert 'Private event!' not in encrypted_blob
+        assert 'This is a super secret event!' not in encrypted_blob
+
+        loaded_events = Event.model_load_redis_many(encrypted_blob)
+
+        assert [event.model_dump() for event in loaded_events] == [event.model_dump() for event in events]
+        # Times are still in their own timezone
+        assert [event.start.isoformat() for event in loaded_events] == [event.start.isoformat() for event in events]
+        # And they're a lot smaller than the individually encrypted events
+        assert len(encrypted_blob) < len(json.dumps([event.model_dump_redis() for event in events])) / 2
+
+
+class TestCachedDays:
+    @staticmethod
+    def make_event(title, start_day, start_hour, hours):
+        start = datetime.datetime(2024, 3, start_day, start_hour, tzinfo=datetime.UTC)
+        return Event(title=title, start=start, end=start + datetime.timedelta(hours=hours))
+
+    def test_overlapping_ranges_share_cached_days(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        events = [
+            self.make_event('First', 1, 10, 1),
+            # Spans three days
+            self.make_event('Conference', 3, 12, 48),
+            self.make_event('Last', 7, 22, 4),
+        ]
+
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+        assert connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', events) == events
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == (events, None)
+
+        # A later range only needs to fetch the days that aren't cached, and gets every event once
+        cached_events, fetch_range = connector.get_cached_events('2024-03-02', '2024-03-10')
+        assert [event.title for event in cached_events] == ['Conference', 'Last']
+        assert fetch_range == ('2024-03-08', '2024-03-10')
+
+        # Events that were already part of the cached days aren't returned again
+        fetched_events = [events[2], self.make_event('New', 9, 10, 1)]
+        assert connector.put_cached_events('2024-03-02', *fetch_range, fetched_events) == [fetched_events[1]]
+        assert [event.title for event in connector.get_cached_events('2024-03-02', '2024-03-10')[0]] == [
+            'Conference',
+            'Last',
+            'New',
+        ]
+
+    def test_missing_days_in_between_are_fetched(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        events = [self.make_event('Early', 1, 10, 1), self.make_event('Conference', 2, 12, 72)]
+        connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', events)
+
+        with_redis.delete(connector.get_cache_key('2024-03-03'), connector.get_cache_key('2024-03-05'))
+        local_events.clear()
+
+        # The cached days in between are fetched again
+        cached_events, fetch_range = connector.get_cached_events('2024-03-01', '2024-03-08')
+        assert [event.title for event in cached_events] == ['Early', 'Conference']
+        assert fetch_range == ('2024-03-03', '2024-03-06')
+        assert connector.put_cached_events('2024-03-01', *fetch_range, events[1:]) == []
+
+    def test_busy_intervals(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        start = datetime.datetime(2024, 3, 4, 23, tzinfo=datetime.UTC).timestamp()
+        busy = [(start, start + 7200, False)]
+
+        assert connector.put_cached_busy('2024-03-01', '2024-03-01', '2024-03-08', busy) == busy
+        assert connector.get_cached_busy('2024-03-01', '2024-03-08') == (busy, None)
+        assert connector.get_cached_busy('2024-03-05', '2024-03-06') == (busy, None)
+        # Busy intervals are kept apart from the events
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+
+    def test_bust_cached_events(self, with_redis):
+        calendars = [BaseConnector(1, 1, with_redis), BaseConnector(1, 2, with_redis)]
+        other_subscriber = BaseConnector(2, 1, with_redis)
+        events = [self.make_event('Meeting', 4, 10, 1)]
+        for connector in calendars + [other_subscriber]:
+            connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', events)
+            connector.put_cached_busy('2024-03-01', '2024-03-01', '2024-03-08', [])
+
+        # All of a subscriber's keys share a hash tag
+        assert calendars[0].get_cache_key('2024-03-01').split(':')[1] == calendars[1].get_key_body(only_subscriber=True)
+
+        assert calendars[0].bust_cached_events()
+        assert calendars[0].get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+        assert calendars[0].get_cached_busy('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+        assert calendars[1].get_cached_events('2024-03-01', '2024-03-08') == (events, None)
+
+        assert calendars[1].bust_cached_events(all_calendars=True)
+        assert calendars[1].get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+        assert not calendars[0].bust_cached_events()
+
+        # Other subscribers are left alone
+        assert other_subscriber.get_cached_events('2024-03-01', '2024-03-08') == (events, None)
+
+        # Every worker is told to drop them from its local cache
+        assert with_redis.published[0] == (
+            REDIS_REMOTE_EVENTS_BUST_CHANNEL,
+            f'rmt_events:{calendars[0].get_key_body()}:',
+        )
+
+
+class TestCacheKeys:
+    def test_keys_are_hashed(self):
+        connector = BaseConnector(1, 2)
+        key = connector.get_cache_key('2024-03-01')
+
+        # The same in every process, without giving away what's in it
+        hashed = [utils.hash_cache_key(part) for part in (1, 2, '2024-03-01')]
+        assert key == 'rmt_events:{%s}:%s:%s' % tuple(hashed)
+        assert utils.hash_cache_key(1) == hmac.new(utils.cache_key_secret(), b'1', hashlib.sha256).hexdigest()[:32]
+        assert '2024' not in key
+        assert BaseConnector(1, 2).get_cache_key('2024-03-01') == key
+
+    def test_legacy_event_store_is_rekeyed(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        encryption = utils.setup_encryption_engine()
+        with_redis.set(
+            f'rmt_sync:{connector.get_key_body(legacy=True)}',
+            json.dumps({'sync_token': 'token', 'events': {encryption.encrypt('event-id'): 'event'}}),
+        )
+
+        assert connector.get_event_store() == {
+            'sync_token': 'token',
+            'events': {connector.obscure_key('event-id'): 'event'},
+        }
+
+    def test_legacy_keys_can_be_turned_off(self, with_redis, monkeypatch):
+        monkeypatch.setenv('REDIS_LEGACY_KEYS', 'false')
+        connector = BaseConnector(1, 1, with_redis)
+        with_redis.set(f'rmt_sync:{connector.get_key_body(legacy=True)}', json.dumps({'events': {}}))
+
+        assert connector.get_event_store() is None
+
+    def test_bust_legacy_keys(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        legacy_key = f'rmt_events:{connector.get_key_body(legacy=True)}:day'
+        with_redis.set(legacy_key, 'events')
+        with_redis.sadd(connector.get_cache_index_key(legacy=True), legacy_key)
+
+        assert connector.bust_cached_events()
+        assert legacy_key not in with_redis.data
+
+
+class TestLocalEventCache:
+    def test_cached_days_are_read_locally(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        events = [TestCachedDays.make_event('Meeting', 4, 10, 1)]
+        connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', events)
+
+        # Redis isn't asked again for what this worker has seen recently
+        with_redis.data.clear()
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == (events, None)
+        assert local_events.stats == {'l1_hit': 7, 'l1_miss': 0, 'redis_hit': 0, 'redis_miss': 0}
+
+        local_events.clear()
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+        assert local_events.stats == {'l1_hit': 0, 'l1_miss': 7, 'redis_hit': 0, 'redis_miss': 7}
+
+    def test_redis_hits_are_kept_locally(self, with_redis):
+        connector = BaseConnector(1, 1, with_redis)
+        events = [TestCachedDays.make_event('Meeting', 4, 10, 1)]
+        connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', events)
+        local_events.clear()
+
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == (events, None)
+        assert connector.get_cached_events('2024-03-03', '2024-03-08') == (events, None)
+        assert local_events.stats == {'l1_hit': 5, 'l1_miss': 7, 'redis_hit': 7, 'redis_miss': 0}
+
+    def test_entries_expire_and_are_evicted(self, monkeypatch):
+        cache = LocalEventCache()
+        monkeypatch.setenv('CALENDAR_LOCAL_CACHE_SIZE', '2')
+        cache.put('first', [1])
+        cache.put('second', [2])
+        assert cache.get('first') == [1]
+
+        # The least recently used entry is dropped
+        cache.put('third', [3])
+        assert cache.get('second') is None
+        assert cache.get('first') == [1]
+
+        monkeypatch.setattr('appointment.controller.calendar.time.monotonic', lambda: float('inf'))
+        assert cache.get('first') is None
+
+    def test_can_be_turned_off(self, monkeypatch):
+        cache = LocalEventCache()
+        monkeypatch.setenv('CALENDAR_LOCAL_CACHE_SECONDS', '0')
+        cache.put('first', [1])
+        assert cache.get('first') is None
+
+    def test_invalidate_by_prefix(self):
+        cache = LocalEventCache()
+        cache.put('rmt_events:{a}:1:day', [1])
+        cache.put('rmt_events:{a}:2:day', [2])
+        cache.put('rmt_events:{b}:1:day', [3])
+
+        cache.invalidate('rmt_events:{a}:')
+        assert list(cache.entries) == ['rmt_events:{b}:1:day']
+
+
+class TestCoalescedFetches:
+    def test_only_one_caller_fetches(self, with_redis, monkeypatch):
+        fetching = BaseConnector(1, 1, with_redis)
+        waiting = BaseConnector(1, 1, with_redis)
+        events = [TestCachedDays.make_event('Meeting', 4, 10, 1)]
+
+        assert fetching.get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
+
+        # The other caller waits for the fetch to be cached, instead of fetching it too
+        def sleep(seconds):
+            fetching.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', events)
+            local_events.clear()
+
+        monkeypatch.setattr('appointment.controller.calendar.time.sleep', sleep)
+        assert waiting.get_cached_events('2024-03-01', '2024-03-08') == (events, None)
+        assert not fetching.fetch_locks and not waiting.fetch_locks
+
+    def test_callers_fetch_themselves_after_waiting(self, with_redis, monkeypatch):
+        monkeypatch.setenv('CALENDAR_FETCH_LOCK_WAIT_SECONDS', '0')
+        fetching = BaseConnector(1, 1, with_redis)
+        waiting = BaseConnector(1, 1, with_redis)
+
+        assert fetching.get_cached_events('2024-03-01', '2024-03-08')[1] == ('2024-03-01', '2024-03-08')
+        assert waiting.get_cached_events('2024-03-01', '2024-03-08')[1] == ('2024-03-01', '2024-03-08')
+
+        # Busy intervals are fetched separately
+        assert waiting.get_cached_busy('2024-03-01', '2024-03-08')[1] == ('2024-03-01', '2024-03-08')
+        assert list(waiting.fetch_locks) == [True]
+
+    def test_failed_fetches_are_unlocked(self, with_redis, monkeypatch):
+        connector = CalDavConnector(1, 1, with_redis, 'https://caldav.example.org/', 'user', 'password')
+
+        def fetch_events(fetch_start, fetch_end):
+            raise requests.exceptions.ConnectionError()
+
+        monkeypatch.setattr(connector, 'fetch_events', fetch_events)
+        with pytest.raises(requests.exceptions.ConnectionError):
+            connector.list_events('2024-03-01', '2024-03-08')
+
+        assert not connector.fetch_locks
+        assert not [key for key in with_redis.data if key.startswith(REDIS_REMOTE_FETCH_LOCK_KEY)]
+
+    def test_stale_days_are_served_while_revalidated(self, with_redis, monkeypatch):
+        monkeypatch.setenv('CALENDAR_STALE_SECONDS', '600')
+        # Refresh on our own executor, so we can wait for it
+        monkeypatch.setattr('appointment.controller.calendar.revalidations', ThreadPoolExecutor(max_workers=1))
+
+        connector = CalDavConnector(1, 1, with_redis, 'https://caldav.example.org/', 'user', 'password')
+        old_events = [TestCachedDays.make_event('Old', 4, 10, 1)]
+        new_events = [TestCachedDays.make_event('New', 4, 10, 1)]
+        fetches = []
+
+        def fetch_events(self, fetch_start, fetch_end):
+            fetches.append((fetch_start, fetch_end))
+            return new_events
+
+        # The events are refreshed by a copy of the connector
+        monkeypatch.setattr(CalDavConnector, 'fetch_events', fetch_events)
+        connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', old_events)
+        key = connector.get_cache_key('2024-03-04')
+        assert with_redis.expiries[key] == 900 + 600
+
+        # Once they're stale, the old events are served one last time
+        now = time.time()
+        monkeypatch.setattr('appointment.controller.calendar.time.time', lambda: now + 901)
+        local_events.clear()
+        assert connector.list_events('2024-03-03', '2024-03-05') == old_events
+
+        calendar.revalidations.shutdown(wait=True)
+        assert fetches == [('2024-03-03', '2024-03-05')]
+        assert connector.list_events('2024-03-03', '2024-03-05') == new_events
+
+    def test_stale_days_are_missing_without_revalidation(self, with_redis, monkeypatch):
+        connector = BaseConnector(1, 1, with_redis)
+        connector.put_cached_events('2024-03-01', '2024-03-01', '2024-03-08', [])
+        local_events.clear()
+
+        now = time.time()
+        monkeypatch.setattr('appointment.controller.calendar.time.time', lambda: now + 901)
+        assert connector.get_cached_events('2024-03-01', '2024-03-08') == ([], ('2024-03-01', '2024-03-08'))
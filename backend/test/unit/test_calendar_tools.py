@@ -1,6 +1,68 @@
-from appointment.controller.calendar import Tools
-from appointment.database import schemas, models
-from datetime import datetime, timedelta
+import json
+import random
+import threading
+import time
+import zoneinfo
+from types import SimpleNamespace
+
+import caldav.lib.error
+import httplib2
+import pytest
+import requests
+from caldav.elements import dav
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+from icalendar import Calendar, Event
+
+from appointment.controller.calendar import (
+    BaseConnector,
+    CalDavConnector,
+    ConnectorFactory,
+    DAVClientPool,
+    GoogleConnector,
+    Tools,
+    calendar_fetch_executor,
+)
+from appointment.database import repo, schemas, models
+from appointment.exceptions.google_api import GoogleSyncTokenExpired
+from appointment.exceptions.validation import RemoteCalendarConnectionError
+from datetime import date, datetime, timedelta, timezone
+from datetime import time as time_of_day
+from freezegun import freeze_time
+
+
+def _naive_events_roll_up_difference(
+    a_list: list[schemas.SlotBase], b_list: list[schemas.Event]
+) -> list[schemas.SlotBase]:
+    """The original slot x event implementation of Tools.events_roll_up_difference, kept as a reference"""
+
+    def is_blocker(a_start: datetime, a_end: datetime, b_start: datetime, b_end: datetime):
+        return a_start.timestamp() < b_end.timestamp() and a_end.timestamp() > b_start.timestamp()
+
+    available_slots = []
+    collisions = []
+
+    for slot in a_list:
+        slot_start = slot.start
+        slot_end = slot.start + timedelta(minutes=slot.duration)
+
+        if any([is_blocker(slot_start, slot_end, event.start, event.end) for event in b_list]):
+            previous_collision_end = (
+                collisions[-1].start + timedelta(minutes=collisions[-1].duration) if len(collisions) else None
+            )
+
+            if previous_collision_end and previous_collision_end.timestamp() == slot_start.timestamp():
+                collisions[-1].duration += slot.duration
+            else:
+                collisions.append(
+                    schemas.SlotBase(
+                        start=slot_start, duration=slot.duration, booking_status=models.BookingStatus.booked
+                    )
+                )
+        else:
+            available_slots.append(slot)
+
+    return sorted(available_slots + collisions, key=lambda slot: slot.start.timestamp())
 
 
 class TestTools:
@@ -57,6 +119,843 @@ class TestTools:
         assert rolled_up_slots[1].booking_status == models.BookingStatus.requested
         assert rolled_up_slots[2].booking_status == models.BookingStatus.booked
 
+    @pytest.mark.parametrize('seed', range(50))
+    def test_events_roll_up_difference_matches_naive(self, seed):
+        """Generate random slots and busy events and ensure the result matches the slot x event implementation"""
+        rng = random.Random(seed)
+        start = datetime(2024, 3, 1, 9, tzinfo=timezone.utc)
+        duration = rng.choice([10, 15, 30, 60])
+
+        # A handful of days worth of slots, with some gaps and the odd out of order or overlapping slot
+        slot_minutes = [i * duration for i in range(rng.randint(0, 200)) if rng.random() > 0.1]
+        slot_minutes += [rng.randint(0, 200 * duration) for _ in range(rng.randint(0, 5))]
+        if rng.random() > 0.5:
+            rng.shuffle(slot_minutes)
+
+        # Busy events, both naive and timezone aware, that are short, long, touching or zero length
+        events = []
+        for _ in range(rng.randint(0, 60)):
+            event_start = start + timedelta(minutes=rng.randint(-120, 200 * duration))
+            event_length = rng.choice([0, 5, duration, duration * 3, rng.randint(1, 600)])
+            event_end = event_start + timedelta(minutes=event_length)
+            if rng.random() > 0.8:
+                event_start = event_start.replace(tzinfo=None)
+                event_end = event_end.replace(tzinfo=None)
+            events.append(schemas.Event(title='Busy', start=event_start, end=event_end))
+
+        def make_slots():
+            return [
+                schemas.SlotBase(start=start + timedelta(minutes=minutes), duration=duration)
+                for minutes in slot_minutes
+            ]
+
+        expected = _naive_events_roll_up_difference(make_slots(), events)
+        actual = Tools.events_roll_up_difference(make_slots(), events)
+
+        assert [slot.model_dump() for slot in actual] == [slot.model_dump() for slot in expected]
+
+        # The lazy (start epoch, duration) path should agree as well, given the busy intervals of the events
+        slot_times = ((slot.start.timestamp(), slot.duration) for slot in make_slots())
+        actual_from_times = Tools.slot_times_roll_up_difference(
+            slot_times, Tools.busy_from_events(events), timezone.utc
+        )
+
+        assert [slot.model_dump() for slot in actual_from_times] == [slot.model_dump() for slot in expected]
+
+    @pytest.mark.parametrize(
+        'day,utc_hours',
+        [
+            # The clocks go forward at 2am, which doesn't exist, so it's taken as 2am EST (the same moment as 3am EDT)
+            (date(2024, 3, 10), [5, 6, 7, 7]),
+            # The clocks go back at 2am, so 1am EDT is followed by 2am EST two hours later
+            (date(2024, 11, 3), [4, 5, 7, 8]),
+        ],
+    )
+    def test_slot_times_step_in_wall_clock_time(self, day, utc_hours):
+        tz = zoneinfo.ZoneInfo('America/New_York')
+        schedule = SimpleNamespace(
+            calendar=SimpleNamespace(owner=SimpleNamespace(timezone='America/New_York')),
+            start_time_local=time_of_day(0, 0),
+            end_time_local=time_of_day(4, 0),
+            start_date=day,
+            end_date=day + timedelta(days=1),
+            earliest_booking=0,
+            farthest_booking=60 * 24 * 365,
+            # Both days are Sundays
+            weekdays=[7],
+            slot_duration=60,
+        )
+
+        with freeze_time('2024-03-01 12:00:00'):
+            slot_times = list(Tools.available_slot_times_from_schedule(schedule))
+
+        # Like adding the hours to the first slot's local time
+        assert [start for start, _ in slot_times] == [
+            (datetime.combine(day, time_of_day(0, 0), tz) + timedelta(hours=hours)).timestamp() for hours in range(4)
+        ]
+        assert [datetime.fromtimestamp(start, timezone.utc).hour for start, _ in slot_times] == utc_hours
+
+
+class TestListEventsConcurrently:
+    class MockConnector:
+        def __init__(self, calendar_id, events=None, error=None, delay=None):
+            self.calendar_id = calendar_id
+            self.events = events or []
+            self.error = error
+            self.delay = delay
+
+        def list_events(self, start, end):
+            if self.delay:
+                # Event.wait instead of sleep so the thread can be released at the end of the test
+                self.delay.wait(5)
+            if self.error:
+                raise self.error
+            return self.events
+
+    def make_events(self, title, n):
+        start = datetime.now()
+        return [
+            schemas.Event(title=title, start=start + timedelta(hours=i), end=start + timedelta(hours=i + 1))
+            for i in range(n)
+        ]
+
+    def test_merges_all_calendars(self):
+        connectors = [self.MockConnector(i, self.make_events(f'Calendar {i}', i + 1)) for i in range(4)]
+
+        events = Tools.list_events_concurrently(connectors, '2024-03-01', '2024-03-15')
+
+        assert len(events) == 1 + 2 + 3 + 4
+        assert sorted({event.title for event in events}) == [f'Calendar {i}' for i in range(4)]
+
+    def test_failing_calendar_is_skipped(self):
+        connectors = [
+            self.MockConnector(1, self.make_events('Good', 2)),
+            self.MockConnector(2, error=requests.exceptions.ConnectionError()),
+        ]
+
+        events = Tools.list_events_concurrently(connectors, '2024-03-01', '2024-03-15')
+
+        assert [event.title for event in events] == ['Good', 'Good']
+
+    def test_failing_google_calendar_is_skipped(self):
+        response = httplib2.Response({'status': 403})
+        connectors = [
+            self.MockConnector(1, self.make_events('Good', 1)),
+            self.MockConnector(2, error=HttpError(response, b'{}')),
+            self.MockConnector(3, error=RefreshError('Token has been expired or revoked')),
+        ]
+
+        events = Tools.list_events_concurrently(connectors, '2024-03-01', '2024-03-15')
+
+        assert [event.title for event in events] == ['Good']
+
+    def test_fetch_threads_are_reused(self):
+        threads = set()
+
+        class ThreadConnector(self.MockConnector):
+            def list_events(self, start, end):
+                threads.add(threading.get_ident())
+                return []
+
+        for _ in range(5):
+            Tools.list_events_concurrently([ThreadConnector(1)], '2024-03-01', '2024-03-15')
+
+        assert threads <= {thread.ident for thread in calendar_fetch_executor()._threads}
+
+    def test_unexpected_errors_are_raised(self):
+        connectors = [self.MockConnector(1, error=RuntimeError('Bad credentials'))]
+
+        with pytest.raises(RuntimeError):
+            Tools.list_events_concurrently(connectors, '2024-03-01', '2024-03-15')
+
+    def test_slow_calendar_is_skipped(self, monkeypatch):
+        monkeypatch.setenv('CALENDAR_FETCH_TIMEOUT', '0.2')
+        release = threading.Event()
+
+        connectors = [
+            self.MockConnector(1, self.make_events('Fast', 1)),
+            self.MockConnector(2, self.make_events('Slow', 1), delay=release),
+        ]
+
+        timer = time.monotonic()
+        try:
+            events = Tools.list_events_concurrently(connectors, '2024-03-01', '2024-03-15')
+        finally:
+            release.set()
+
+        assert time.monotonic() - timer < 2
+        assert [event.title for event in events] == ['Fast']
+
+
+class TestConnectorFactory:
+    def test_connection_and_credentials_are_shared(
+        self, with_db, monkeypatch, make_pro_subscriber, make_google_calendar, make_external_connections
+    ):
+        subscriber = make_pro_subscriber()
+        calendars = [make_google_calendar(subscriber_id=subscriber.id) for _ in range(3)]
+        make_external_connections(
+            subscriber.id,
+            type=models.ExternalConnectionType.google,
+            token=json.dumps({'client_id': 'abc', 'client_secret': 'def', 'refresh_token': 'ghi'}),
+        )
+
+        lookups = []
+        get_by_type = repo.external_connection.get_by_type
+
+        def counting_get_by_type(*args, **kwargs):
+            lookups.append(args)
+            return get_by_type(*args, **kwargs)
+
+        monkeypatch.setattr(repo.external_connection, 'get_by_type', counting_get_by_type)
+
+        with with_db() as db:
+            calendars = repo.calendar.get_by_subscriber(db, subscriber.id)
+            factory = ConnectorFactory(db, google_client=None)
+            connectors = [factory.for_calendar(subscriber.id, calendar, calendar.id) for calendar in calendars]
+
+        assert len(lookups) == 1
+        assert all(con.google_token is connectors[0].google_token for con in connectors)
+        assert [con.remote_calendar_id for con in connectors] == [calendar.user for calendar in calendars]
+
+    def test_watched_calendars_are_looked_up_once(
+        self, with_db, monkeypatch, make_pro_subscriber, make_google_calendar, make_external_connections
+    ):
+        subscriber = make_pro_subscriber()
+        calendars = [make_google_calendar(subscriber_id=subscriber.id) for _ in range(3)]
+        make_external_connections(
+            subscriber.id,
+            type=models.ExternalConnectionType.google,
+            token=json.dumps({'client_id': 'abc', 'client_secret': 'def', 'refresh_token': 'ghi'}),
+        )
+        with with_db() as db:
+            for calendar, expires_in in zip(calendars, (1, -1)):
+                repo.google_calendar_channel.update_or_create(
+                    db,
+                    calendar_id=calendar.id,
+                    channel_id=f'channel-{calendar.id}',
+                    resource_id=f'resource-{calendar.id}',
+                    token='secret',
+                    expires_at=datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=expires_in),
+                )
+
+        lookups = []
+        get_watched_calendar_ids = repo.google_calendar_channel.get_watched_calendar_ids
+
+        def counting_get_watched_calendar_ids(*args, **kwargs):
+            lookups.append(args)
+            return get_watched_calendar_ids(*args, **kwargs)
+
+        monkeypatch.setattr(repo.google_calendar_channel, 'get_watched_calendar_ids', counting_get_watched_calendar_ids)
+
+        with with_db() as db:
+            factory = ConnectorFactory(db, google_client=None)
+            connectors = [
+                factory.for_calendar(subscriber.id, calendar, calendar.id)
+                for calendar in repo.calendar.get_by_subscriber(db, subscriber.id)
+            ]
+
+        assert len(lookups) == 1
+        # Only the first calendar's channel hasn't expired
+        assert [con.calendar_id for con in connectors if con.watched] == [calendars[0].id]
+
+    def test_missing_connection_raises(self, with_db, make_pro_subscriber, make_google_calendar):
+        subscriber = make_pro_subscriber()
+        calendar = make_google_calendar(subscriber_id=subscriber.id)
+
+        with with_db() as db:
+            calendar = repo.calendar.get(db, calendar.id)
+            with pytest.raises(RemoteCalendarConnectionError):
+                ConnectorFactory(db, google_client=None).for_calendar(subscriber.id, calendar, calendar.id)
+
+
+class TestGoogleIncrementalSync:
+    class MockGoogleClient:
+        def __init__(self, *responses):
+            self.responses = list(responses)
+            self.calls = []
+
+        def sync_events(self, calendar_id, token, sync_token=None, time_min=None, time_max=None):
+            self.calls.append(sync_token)
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        def list_events_many(self, calendar_ids, time_min, time_max, token):
+            self.calls.append('list_events_many')
+            return {calendar_id: [] for calendar_id in calendar_ids}, {}
+
+    @staticmethod
+    def make_remote_event(id, hours_from_now, status='confirmed'):
+        start = datetime.now(tz=timezone.utc) + timedelta(hours=hours_from_now)
+        return {
+            'id': id,
+            'status': status,
+            'summary': id,
+            'start': {'dateTime': start.isoformat()},
+            'end': {'dateTime': (start + timedelta(minutes=30)).isoformat()},
+        }
+
+    @staticmethod
+    def list_events(con, days_before=0, days_after=7):
+        today = datetime.now(tz=timezone.utc)
+        events = con.list_events(
+            (today - timedelta(days=days_before)).strftime('%Y-%m-%d'),
+            (today + timedelta(days=days_after)).strftime('%Y-%m-%d'),
+        )
+        # Skip the date range cache, so we hit the sync every time
+        con.bust_cached_events()
+        return sorted(event.title for event in events)
+
+    def make_connector(self, with_redis, google_client):
+        return GoogleConnector(
+            subscriber_id=1,
+            calendar_id=1,
+            redis_instance=with_redis,
+            db=None,
+            remote_calendar_id='primary',
+            google_client=google_client,
+            google_credentials=object(),
+        )
+
+    def test_changes_are_applied(self, with_redis):
+        google_client = self.MockGoogleClient(
+            ([self.make_remote_event('a', 24), self.make_remote_event('b', 48)], 'token-1'),
+            ([self.make_remote_event('a', 24, status='cancelled'), self.make_remote_event('c', 72)], 'token-2'),
+            ([], 'token-3'),
+        )
+        con = self.make_connector(with_redis, google_client)
+
+        assert self.list_events(con) == ['a', 'b']
+        assert self.list_events(con) == ['b', 'c']
+        # Events outside the requested date range are kept, but not returned
+        assert self.list_events(con, days_after=3) == ['b']
+
+        # Full sync first, then only the changes since the previous sync
+        assert google_client.calls == [None, 'token-1', 'token-2']
+
+    def test_expired_sync_token_does_a_full_sync(self, with_redis):
+        google_client = self.MockGoogleClient(
+            ([self.make_remote_event('a', 24)], 'token-1'),
+            GoogleSyncTokenExpired(),
+            ([self.make_remote_event('b', 24)], 'token-2'),
+        )
+        con = self.make_connector(with_redis, google_client)
+
+        assert self.list_events(con) == ['a']
+        assert self.list_events(con) == ['b']
+        assert google_client.calls == [None, 'token-1', None]
+
+    def test_date_range_outside_of_sync_window(self, with_redis, monkeypatch):
+        monkeypatch.setenv('GOOGLE_SYNC_DAYS_AFTER', '30')
+        google_client = self.MockGoogleClient()
+        con = self.make_connector(with_redis, google_client)
+
+        assert self.list_events(con, days_after=60) == []
+        assert google_client.calls == ['list_events_many']
+
+
+class TestGoogleListEventsMany:
+    def test_uncached_calendars_are_batched(self, with_redis, monkeypatch):
+        monkeypatch.setenv('GOOGLE_INCREMENTAL_SYNC', 'false')
+
+        class MockGoogleClient:
+            calls = []
+
+            def list_events_many(self, calendar_ids, time_min, time_max, token):
+                self.calls.append(calendar_ids)
+                return {
+                    calendar_id: [TestGoogleIncrementalSync.make_remote_event(calendar_id, 24)]
+                    for calendar_id in calendar_ids
+                }, {}
+
+        google_client = MockGoogleClient()
+        credentials = object()
+        connectors = [
+            GoogleConnector(
+                subscriber_id=1,
+                calendar_id=index,
+                redis_instance=with_redis,
+                db=None,
+                remote_calendar_id=remote_calendar_id,
+                google_client=google_client,
+                google_credentials=credentials,
+            )
+            for index, remote_calendar_id in enumerate(('first', 'second', 'third'))
+        ]
+
+        # The first calendar is cached already
+        start = datetime(2024, 3, 4, 10, tzinfo=timezone.utc)
+        cached_event = schemas.Event(title='cached', start=start, end=start + timedelta(hours=1))
+        connectors[0].put_cached_events('2024-03-01', '2024-03-01', '2024-03-15', [cached_event])
+
+        events = GoogleConnector.list_events_many(connectors, '2024-03-01', '2024-03-15')
+
+        assert sorted(event.title for event in events) == ['cached', 'second', 'third']
+        assert google_client.calls == [['second', 'third']]
+
+        # Now they're all cached
+        GoogleConnector.list_events_many(connectors, '2024-03-01', '2024-03-15')
+        assert len(google_client.calls) == 1
+
+    def test_lock_waits_are_shared(self, with_redis, monkeypatch):
+        monkeypatch.setenv('GOOGLE_INCREMENTAL_SYNC', 'false')
+        monkeypatch.setenv('CALENDAR_FETCH_LOCK_WAIT_SECONDS', '0.3')
+
+        class MockGoogleClient:
+            calls = []
+
+            def list_events_many(self, calendar_ids, time_min, time_max, token):
+                self.calls.append(calendar_ids)
+                return {calendar_id: [] for calendar_id in calendar_ids}, {}
+
+        google_client = MockGoogleClient()
+        credentials = object()
+        connectors = []
+        for index, remote_calendar_id in enumerate(('first', 'second', 'third')):
+            # Someone else is fetching each calendar, and takes their time
+            assert BaseConnector(1, index, with_redis).get_cached_events('2024-03-01', '2024-03-15')[1] is not None
+            connectors.append(
+                GoogleConnector(
+                    subscriber_id=1,
+                    calendar_id=index,
+                    redis_instance=with_redis,
+                    db=None,
+                    remote_calendar_id=remote_calendar_id,
+                    google_client=google_client,
+                    google_credentials=credentials,
+                )
+            )
+
+        timer = time.monotonic()
+        GoogleConnector.list_events_many(connectors, '2024-03-01', '2024-03-15')
+
+        # We waited once for all of them, not once per calendar, and then fetched them ourselves
+        assert time.monotonic() - timer < 0.6
+        assert google_client.calls == [['first', 'second', 'third']]
+
+    def test_failed_calendars_are_not_cached(self, with_redis, monkeypatch):
+        monkeypatch.setenv('GOOGLE_INCREMENTAL_SYNC', 'false')
+        error = HttpError(httplib2.Response({'status': 403}), b'{"error": {"message": "Forbidden"}}')
+
+        class MockGoogleClient:
+            calls = []
+
+            def list_events_many(self, calendar_ids, time_min, time_max, token):
+                self.calls.append(calendar_ids)
+                events = {
+                    calendar_id: [TestGoogleIncrementalSync.make_remote_event(calendar_id, 24)]
+                    for calendar_id in calendar_ids
+                    if calendar_id != 'second'
+                }
+                return events, {'second': error} if 'second' in calendar_ids else {}
+
+        google_client = MockGoogleClient()
+        credentials = object()
+        connectors = [
+            GoogleConnector(
+                subscriber_id=1,
+                calendar_id=index,
+                redis_instance=with_redis,
+                db=None,
+                remote_calendar_id=remote_calendar_id,
+                google_client=google_client,
+                google_credentials=credentials,
+            )
+            for index, remote_calendar_id in enumerate(('first', 'second', 'third'))
+        ]
+
+        with pytest.raises(HttpError):
+            GoogleConnector.list_events_many(connectors, '2024-03-01', '2024-03-15')
+
+        # The failed calendar isn't cached, and others can fetch it right away
+        other = BaseConnector(1, 1, with_redis)
+        assert other.get_cached_events('2024-03-01', '2024-03-15', time.monotonic())[1] is not None
+        assert other.fetch_locks
+        other.release_fetch_lock()
+
+        # The others are
+        events = GoogleConnector.list_events_many([connectors[0], connectors[2]], '2024-03-01', '2024-03-15')
+        assert sorted(event.title for event in events) == ['first', 'third']
+        assert google_client.calls == [['first', 'second', 'third']]
+
+
+class TestBusyIntervals:
+    def test_google_calendars_share_a_freebusy_query(self, with_redis):
+        start = datetime(2024, 3, 4, 10, tzinfo=timezone.utc)
+
+        class MockGoogleClient:
+            calls = []
+
+            def list_busy(self, calendar_ids, time_min, time_max, token):
+                self.calls.append(calendar_ids)
+                # Google couldn't query the third calendar
+                return {
+                    calendar_id: [{'start': start.isoformat(), 'end': (start + timedelta(hours=1)).isoformat()}]
+                    for calendar_id in calendar_ids
+                    if calendar_id != 'third'
+                }
+
+            def list_events_many(self, calendar_ids, time_min, time_max, token):
+                return {
+                    calendar_id: [TestGoogleIncrementalSync.make_remote_event('event', 24)]
+                    for calendar_id in calendar_ids
+                }, {}
+
+        google_client = MockGoogleClient()
+        credentials = object()
+        connectors = [
+            GoogleConnector(
+                subscriber_id=1,
+                calendar_id=index,
+                redis_instance=with_redis,
+                db=None,
+                remote_calendar_id=remote_calendar_id,
+                google_client=google_client,
+                google_credentials=credentials,
+            )
+            for index, remote_calendar_id in enumerate(('first', 'second', 'third'))
+        ]
+
+        busy = GoogleConnector.list_busy_many(connectors, '2024-03-01', '2024-03-15')
+
+        assert google_client.calls == [['first', 'second', 'third']]
+        assert busy[:2] == [(start.timestamp(), start.timestamp() + 3600, False)] * 2
+        # The third calendar falls back to its events
+        assert len(busy) == 3
+
+        # The busy times are all cached now
+        GoogleConnector.list_busy_many(connectors, '2024-03-01', '2024-03-15')
+        assert google_client.calls == [['first', 'second', 'third']]
+
+    def test_caldav_freebusy_is_parsed(self, with_redis):
+        freebusy = Calendar.from_ical(
+            'BEGIN:VCALENDAR\r\n'
+            'VERSION:2.0\r\n'
+            'PRODID:-//test//EN\r\n'
+            'BEGIN:VFREEBUSY\r\n'
+            'DTSTART:20240301T000000Z\r\n'
+            'DTEND:20240315T000000Z\r\n'
+            'FREEBUSY:20240304T100000Z/20240304T110000Z,20240305T100000Z/PT30M\r\n'
+            'FREEBUSY;FBTYPE=BUSY-TENTATIVE:20240306T100000Z/20240306T120000Z\r\n'
+            'FREEBUSY;FBTYPE=FREE:20240307T100000Z/20240307T120000Z\r\n'
+            'END:VFREEBUSY\r\n'
+            'END:VCALENDAR\r\n'
+        )
+
+        class MockCalendar:
+            def freebusy_request(self, start, end):
+                return type('FreeBusy', (), {'icalendar_instance': freebusy})
+
+        con = CalDavConnector(1, 1, with_redis, 'https://caldav.example.org/', 'user', 'password')
+        con.calendar = lambda: MockCalendar()
+
+        def timestamp(day, hour, minute=0):
+            return datetime(2024, 3, day, hour, minute, tzinfo=timezone.utc).timestamp()
+
+        expected = [
+            (timestamp(4, 10), timestamp(4, 11), False),
+            (timestamp(5, 10), timestamp(5, 10, 30), False),
+            (timestamp(6, 10), timestamp(6, 12), True),
+        ]
+        assert con.list_busy('2024-03-01', '2024-03-15') == expected
+
+        # And it's cached
+        con.calendar = None
+        assert con.list_busy('2024-03-01', '2024-03-15') == expected
+
+    def test_caldav_falls_back_to_events(self, with_redis, monkeypatch):
+        class MockCalendar:
+            def freebusy_request(self, start, end):
+                raise caldav.lib.error.ReportError('Not supported')
+
+        event = schemas.Event(
+            title='event',
+            start=datetime(2024, 3, 4, 10, tzinfo=timezone.utc),
+            end=datetime(2024, 3, 4, 11, tzinfo=timezone.utc),
+            tentative=True,
+        )
+        monkeypatch.setattr(CalDavConnector, 'list_events', lambda self, start, end: [event])
+
+        con = CalDavConnector(1, 1, with_redis, 'https://caldav.example.org/', 'user', 'password')
+        con.calendar = lambda: MockCalendar()
+
+        assert con.list_busy('2024-03-01', '2024-03-15') == [
+            (event.start.timestamp(), event.end.timestamp(), True)
+        ]
+
+
+class TestCalDavIncrementalSync:
+    url = 'https://caldav.example.org/calendars/user/work/'
+
+    class MockCalendar:
+        def __init__(self, client, url):
+            self.calendar = caldav.Calendar(client=client, url=url)
+            self.objects = {}
+            self.sync_tokens = []
+            self.changes = []
+            self.multigets = []
+            self.searches = 0
+            self.supports_sync = True
+
+        def objects_by_sync_token(self, sync_token=None):
+            self.sync_tokens.append(sync_token)
+            if not self.supports_sync:
+                raise caldav.lib.error.ReportError('sync-collection is not supported')
+
+            # Deleted objects come without an etag
+            changes = [
+                caldav.CalendarObjectResource(
+                    self.calendar.client,
+                    url=self.calendar.url.join(f'{uid}.ics'),
+                    parent=self.calendar,
+                    props={dav.GetEtag.tag: f'"{uid}"' if uid in self.objects else None},
+                )
+                for uid in (self.changes if sync_token else self.objects)
+            ]
+            changes_type = type('Changes', (), {'__iter__': lambda _: iter(changes)})
+            changes_type.sync_token = f'token-{len(self.sync_tokens)}'
+            return changes_type()
+
+        def search(self, start, end, event, expand):
+            self.searches += 1
+            return [self.make_event(uid) for uid in self.objects]
+
+        def calendar_multiget(self, urls):
+            self.multigets.append([str(url) for url in urls])
+            uids = [str(url).split('/')[-1].removesuffix('.ics') for url in urls]
+            return [self.make_event(uid) for uid in uids if uid in self.objects]
+
+        def make_event(self, uid):
+            return caldav.Event(
+                self.calendar.client,
+                url=self.calendar.url.join(f'{uid}.ics'),
+                data=self.objects[uid],
+                parent=self.calendar,
+            )
+
+    @staticmethod
+    def ical(uid, start: datetime, rrule=None):
+        return '\n'.join(
+            [
+                'BEGIN:VCALENDAR',
+                'VERSION:2.0',
+                'PRODID:-//test//EN',
+                'BEGIN:VEVENT',
+                f'UID:{uid}',
+                'DTSTAMP:20240301T000000Z',
+                f'DTSTART:{start.strftime("%Y%m%dT%H%M%SZ")}',
+                f'DTEND:{(start + timedelta(hours=1)).strftime("%Y%m%dT%H%M%SZ")}',
+                f'SUMMARY:{uid}',
+            ]
+            + ([f'RRULE:{rrule}'] if rrule else [])
+            + ['END:VEVENT', 'END:VCALENDAR', '']
+        )
+
+    def make_connector(self, with_redis):
+        con = CalDavConnector(1, 1, with_redis, self.url, 'user', 'password')
+        calendar = self.MockCalendar(caldav.DAVClient(url=self.url), self.url)
+        con.calendar = lambda: calendar
+        return con, calendar
+
+    @staticmethod
+    def list_events(con):
+        today = datetime.now(timezone.utc).date()
+        return con.sync_events(str(today - timedelta(days=7)), str(today + timedelta(days=28)))
+
+    def test_only_changes_are_retrieved(self, with_redis):
+        con, calendar = self.make_connector(with_redis)
+        tomorrow = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        calendar.objects = {'first': self.ical('first', tomorrow), 'second': self.ical('second', tomorrow)}
+
+        assert sorted(event.title for event in self.list_events(con)) == ['first', 'second']
+        assert calendar.searches == 1
+
+        # The first event now repeats, the second one is gone, and a third one is new
+        calendar.objects = {
+            'first': self.ical('first', tomorrow, rrule='FREQ=WEEKLY;COUNT=3'),
+            'third': self.ical('third', tomorrow),
+        }
+        calendar.changes = ['first', 'second', 'third']
+
+        events = self.list_events(con)
+
+        assert sorted(event.title for event in events) == ['first', 'first', 'first', 'third']
+        assert calendar.sync_tokens == [None, 'token-1']
+        # Only the changed events were retrieved, without another search
+        assert calendar.searches == 1
+        assert len(calendar.multigets) == 1
+        assert [url.split('/')[-1] for url in calendar.multigets[0]] == ['first.ics', 'third.ics']
+
+    def test_unsupported_server_falls_back_to_search(self, with_redis):
+        con, calendar = self.make_connector(with_redis)
+        tomorrow = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+        calendar.objects = {'first': self.ical('first', tomorrow)}
+        calendar.supports_sync = False
+
+        today = datetime.now(timezone.utc).date()
+        events = con.list_events(str(today), str(today + timedelta(days=7)))
+
+        assert [event.title for event in events] == ['first']
+        assert con.get_event_store() == {'unsupported': True}
+
+        # The next sync doesn't ask the server again
+        assert self.list_events(con) is None
+        assert calendar.sync_tokens == [None]
+
+
+class TestCalDavDeleteEvents:
+    class MockEvent:
+        def __init__(self, url, start, rrule=None, fails=False):
+            self.url = url
+            self.fails = fails
+            self.deleted = False
+            self.icalendar_component = Event()
+            self.icalendar_component.add('dtstart', start)
+            if rrule:
+                self.icalendar_component.add('rrule', rrule)
+
+        def delete(self):
+            if self.fails:
+                raise caldav.lib.error.DeleteError('Forbidden')
+            self.deleted = True
+
+    def test_events_in_range_are_deleted(self, with_redis):
+        url = 'https://caldav.example.org/calendars/user/work/'
+        events = [
+            self.MockEvent(f'{url}{i}.ics', datetime(2024, 3, 4, 9 + i, tzinfo=timezone.utc), fails=i == 3)
+            for i in range(5)
+        ]
+        searches = []
+
+        class MockCalendar:
+            def search(self, **kwargs):
+                searches.append(kwargs)
+                return events
+
+        con = CalDavConnector(1, 1, with_redis, 'https://caldav.example.org/', 'user', 'password')
+        con.calendar = lambda: MockCalendar()
+
+        count, failed = con.delete_events('2024-03-04', max_workers=2)
+
+        assert searches == [{'start': datetime(2024, 3, 4), 'end': datetime(2024, 3, 5), 'event': True}]
+        assert count == 4
+        assert failed == [f'{url}3.ics']
+        assert [e.deleted for e in events] == [True, True, True, False, True]
+        # Every deletion went through a pooled client
+        assert all(isinstance(e.client, caldav.DAVClient) for e in events)
+
+    def test_only_events_starting_in_range_are_deleted(self, with_redis):
+        url = 'https://caldav.example.org/calendars/user/work/'
+        events = {
+            # Starts the day before, but is still going on
+            'earlier': self.MockEvent(f'{url}earlier.ics', datetime(2024, 3, 3, 23, tzinfo=timezone.utc)),
+            # A series that started last week, with an occurrence in the range
+            'series': self.MockEvent(f'{url}series.ics', datetime(2024, 2, 26, 10), rrule={'freq': 'weekly'}),
+            # A series that starts in the range
+            'new-series': self.MockEvent(f'{url}new-series.ics', datetime(2024, 3, 4, 10), rrule={'freq': 'daily'}),
+            'all-day': self.MockEvent(f'{url}all-day.ics', date(2024, 3, 4)),
+        }
+
+        class MockCalendar:
+            def search(self, **kwargs):
+                return list(events.values())
+
+        con = CalDavConnector(1, 1, with_redis, 'https://caldav.example.org/', 'user', 'password')
+        con.calendar = lambda: MockCalendar()
+
+        assert con.delete_events('2024-03-04') == (2, [])
+        assert [uid for uid, e in events.items() if e.deleted] == ['new-series', 'all-day']
+
+
+class TestDAVClientPool:
+    url = 'https://caldav.example.org/'
+
+    def test_clients_are_reused(self, monkeypatch):
+        monkeypatch.setenv('CALENDAR_FETCH_TIMEOUT', '3')
+        pool = DAVClientPool()
+
+        with pool.client(self.url, 'user', 'password') as pooled:
+            # A checked out client isn't handed out again
+            with pool.client(self.url, 'user', 'password') as other_pooled:
+                assert other_pooled is not pooled
+
+        assert pool.checkout(self.url, 'user', 'password') in (pooled, other_pooled)
+        assert pool.checkout(self.url, 'other-user', 'password') not in (pooled, other_pooled)
+        # Requests time out along with the calendar fetches they're made for
+        assert pooled.client.timeout == 3
+
+        # Calendars are only resolved once
+        calendar = pooled.calendar('https://caldav.example.org/calendars/user/work/')
+        assert pooled.calendar('https://caldav.example.org/calendars/user/work/') is calendar
+        assert str(calendar.url) == 'https://caldav.example.org/calendars/user/work/'
+
+    def test_threads_get_their_own_client(self):
+        pool = DAVClientPool()
+        barrier = threading.Barrier(4)
+        used = []
+
+        def use_client():
+            with pool.client(self.url, 'user', 'password') as pooled:
+                used.append(pooled)
+                barrier.wait(timeout=5)
+
+        threads = [threading.Thread(target=use_client) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(set(map(id, used))) == 4
+
+    def test_changed_password_gets_a_new_client(self):
+        pool = DAVClientPool()
+
+        closed = []
+        with pool.client(self.url, 'user', 'password') as pooled:
+            pooled.client.close = lambda: closed.append(pooled)
+
+        new_pooled = pool.checkout(self.url, 'user', 'new-password')
+
+        assert new_pooled is not pooled
+        assert new_pooled.password == 'new-password'
+        assert closed == [pooled]
+
+    def test_idle_clients_are_closed(self, monkeypatch):
+        monkeypatch.setenv('CALDAV_CLIENT_IDLE_SECONDS', '60')
+        pool = DAVClientPool()
+
+        closed = []
+        pooled = pool.checkout(self.url, 'user', 'password')
+        pooled.client.close = lambda: closed.append(pooled)
+        pool.checkin(pooled)
+        pooled.last_used -= 61
+
+        assert pool.checkout(self.url, 'user', 'password') is not pooled
+        assert closed == [pooled]
+
+    def test_checked_out_clients_are_not_closed(self, monkeypatch):
+        monkeypatch.setenv('CALDAV_CLIENT_IDLE_SECONDS', '60')
+        monkeypatch.setenv('CALDAV_CLIENT_POOL_SIZE', '1')
+        pool = DAVClientPool()
+
+        closed = []
+        first = pool.checkout(self.url, 'user', 'password')
+        second = pool.checkout(self.url, 'user', 'password')
+        for pooled in (first, second):
+            pooled.client.close = lambda pooled=pooled: closed.append(pooled)
+        first.last_used -= 61
+
+        # The idle sweep leaves the client that's still in use alone
+        pool.checkout(self.url, 'other-user', 'password')
+        pool.clear()
+        assert closed == []
+
+        # Only one client is kept, the other one is closed on its return
+        pool.checkin(first)
+        pool.checkin(second)
+        assert closed == [second]
+
 
 class TestVCreate:
     def test_meeting_url_in_location(self, with_db, make_google_calendar, make_appointment, make_appointment_slot, make_pro_subscriber):
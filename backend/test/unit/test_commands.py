@@ -1,7 +1,12 @@
+import json
 import os
+from datetime import datetime, timedelta
 
 import pytest
+from sqlalchemy import update
 
+from appointment.commands import backfill_blind_indexes, renew_google_channels
+from appointment.database import models, repo
 from appointment.routes.commands import cron_lock
 
 
@@ -29,3 +34,90 @@ def test_cron_lock():
 
     # Remove the lock file we manually created
     os.remove(test_lock_file_name)
+
+
+def test_renew_google_channels(
+    with_db, monkeypatch, make_pro_subscriber, make_google_calendar, make_external_connections
+):
+    class MockGoogleClient:
+        def __init__(self):
+            self.watched = []
+            self.stopped = []
+
+        def watch_events(self, calendar_id, channel_id, channel_token, webhook_url, ttl, token):
+            self.watched.append(calendar_id)
+            expiration = datetime.now() + timedelta(seconds=ttl)
+            return {'resourceId': f'resource-{calendar_id}', 'expiration': str(int(expiration.timestamp() * 1000))}
+
+        def stop_channel(self, channel_id, resource_id, token):
+            self.stopped.append(resource_id)
+
+    google_client = MockGoogleClient()
+    monkeypatch.setattr(renew_google_channels, 'get_google_client', lambda: google_client)
+    monkeypatch.setattr(renew_google_channels, 'get_engine_and_session', lambda: (None, with_db))
+    monkeypatch.setenv('GOOGLE_CALENDAR_WEBHOOK_URL', 'https://appointment.example.org/webhooks/google-calendar')
+
+    subscriber = make_pro_subscriber()
+    make_external_connections(
+        subscriber.id,
+        type=models.ExternalConnectionType.google,
+        token=json.dumps({'client_id': 'abc', 'client_secret': 'def', 'refresh_token': 'ghi'}),
+    )
+    new = make_google_calendar(subscriber_id=subscriber.id, connected=True)
+    expiring = make_google_calendar(subscriber_id=subscriber.id, connected=True)
+    fresh = make_google_calendar(subscriber_id=subscriber.id, connected=True)
+    make_google_calendar(subscriber_id=subscriber.id, connected=False)
+
+    with with_db() as db:
+        for calendar, expires_at in ((expiring, timedelta(hours=1)), (fresh, timedelta(days=5))):
+            repo.google_calendar_channel.update_or_create(
+                db,
+                calendar_id=calendar.id,
+                channel_id=f'channel-{calendar.id}',
+                resource_id=f'old-resource-{calendar.id}',
+                token='secret',
+                expires_at=datetime.now() + expires_at,
+            )
+
+    renew_google_channels.run()
+
+    assert google_client.watched == [new.user, expiring.user]
+    assert google_client.stopped == [f'old-resource-{expiring.id}']
+
+    with with_db() as db:
+        for calendar in (new, expiring, fresh):
+            assert repo.calendar.get(db, calendar.id).is_watched
+        assert repo.google_calendar_channel.get_by_calendar(db, expiring.id).resource_id == f'resource-{expiring.user}'
+
+
+def test_backfill_blind_indexes(with_db, make_pro_subscriber, make_schedule, make_invite):
+    subscriber = make_pro_subscriber()
+    schedule = make_schedule()
+    invite = make_invite()
+
+    with with_db() as db:
+        # Rows from before the blind indexes existed
+        db.execute(update(models.Subscriber).values(username_index=None, email_index=None))
+        db.execute(update(models.Schedule).values(slug_index=None))
+        db.execute(update(models.Invite).values(code_index=None))
+        db.commit()
+
+        # They're still found while they wait for the backfill
+        assert repo.subscriber.get_by_email(db, subscriber.email).id == subscriber.id
+
+        filled = backfill_blind_indexes.backfill(db, batch_size=1)
+
+        # The schedule comes with a subscriber of its own
+        assert filled['subscribers.username'] == 2
+        assert filled['subscribers.email'] == 2
+        assert filled['schedules.slug'] == 1
+        assert filled['invites.code'] == 1
+        assert filled['waiting_list.email'] == 0
+
+        db.expire_all()
+        assert repo.subscriber.get(db, subscriber.id).email_index == models.blind_index(subscriber.email)
+        assert repo.schedule.get(db, schedule.id).slug_index == models.blind_index(schedule.slug)
+        assert repo.invite.get_by_code(db, invite.code).code_index == models.blind_index(invite.code)
+
+        # Nothing left to do the second time around
+        assert sum(backfill_blind_indexes.backfill(db).values()) == 0
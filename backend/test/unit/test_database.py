@@ -0,0 +1,45 @@
+from appointment.dependencies import database
+
+
+class TestDatabaseEngine:
+    def test_engine_is_shared(self):
+        """The engine (and its connection pool) should only be created once per process"""
+        database.close_database_engine()
+
+        engine, session = database.get_engine_and_session()
+        assert database.get_engine_and_session() == (engine, session)
+
+        # get_db sessions should all be bound to the shared engine
+        db_generator = database.get_db()
+        db = next(db_generator)
+        assert db.get_bind() is engine
+        db_generator.close()
+
+        # Closing the engine allows a fresh one to be created
+        database.close_database_engine()
+        new_engine, _ = database.get_engine_and_session()
+        assert new_engine is not engine
+
+        database.close_database_engine()
+
+
+class TestRedisPool:
+    def test_redis_pool_is_shared(self, monkeypatch):
+        """Every redis client should share one connection pool. Connections are lazy, so no server is needed."""
+        monkeypatch.setenv('REDIS_URL', 'localhost')
+        monkeypatch.setenv('REDIS_PORT', '6379')
+        monkeypatch.setenv('REDIS_MAX_CONNECTIONS', '8')
+        monkeypatch.delenv('REDIS_USE_CLUSTER', raising=False)
+
+        database.close_redis_pool()
+        assert database.get_redis_pool_stats() is None
+
+        redis_a = database.get_redis()
+        redis_b = database.get_redis()
+        assert redis_a.connection_pool is redis_b.connection_pool
+
+        stats = database.get_redis_pool_stats()
+        assert stats == {'in_use': 0, 'max_connections': 8, 'saturation': 0}
+
+        database.close_redis_pool()
+        assert database.get_redis_pool_stats() is None
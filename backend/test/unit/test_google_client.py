@@ -0,0 +1,127 @@
+import json
+import threading
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.http import HttpMockSequence
+
+from appointment.controller.apis import google_client
+from appointment.controller.apis.google_client import GoogleClient
+from appointment.controller.calendar import calendar_fetch_executor
+
+
+def batch_response(*responses):
+    """Builds a Google batch response out of (request id, status, body) tuples"""
+    parts = [
+        f'--batch\r\nContent-Type: application/http\r\nContent-ID: <response-batch + {request_id}>\r\n\r\n'
+        f'HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n\r\n{json.dumps(body)}\r\n'
+        for request_id, status, body in responses
+    ]
+    return {'status': '200', 'content-type': 'multipart/mixed; boundary=batch'}, ''.join(parts) + '--batch--'
+
+
+class TestGoogleClient:
+    def test_discovery_document_is_cached(self, monkeypatch):
+        reads = []
+        get_static_doc = google_client.discovery_cache.get_static_doc
+
+        def counting_get_static_doc(*args):
+            reads.append(args)
+            return get_static_doc(*args)
+
+        monkeypatch.setattr(google_client.discovery_cache, 'get_static_doc', counting_get_static_doc)
+        monkeypatch.setattr(google_client, '_discovery_documents', {})
+
+        token = Credentials('abc')
+        services = [GoogleClient.build_service(token) for _ in range(3)]
+
+        assert reads == [('calendar', 'v3')]
+        # Each service is authorized with its own credentials, but shares this thread's connections
+        assert all(service._http.credentials is token for service in services)
+        assert all(service._http.http is google_client.get_http() for service in services)
+        assert services[0].events().list(calendarId='primary').uri.startswith(
+            'https://www.googleapis.com/calendar/v3/calendars/primary/events'
+        )
+
+    def test_http_is_per_thread(self, monkeypatch):
+        monkeypatch.setenv('CALENDAR_FETCH_TIMEOUT', '3')
+        other_http = []
+        thread = threading.Thread(target=lambda: other_http.append(google_client.get_http()))
+        thread.start()
+        thread.join()
+
+        assert google_client.get_http() is google_client.get_http()
+        assert other_http[0] is not google_client.get_http()
+        # Requests time out along with the calendar fetches they're made for
+        assert other_http[0].timeout == 3
+
+    def test_http_outlives_calendar_fetches(self):
+        executor = calendar_fetch_executor()
+        # Calls on the calendar fetch threads keep their connections from one request to the next
+        calls = [executor.submit(lambda: (threading.get_ident(), google_client.get_http())).result() for _ in range(10)]
+
+        http_by_thread = {}
+        for ident, http in calls:
+            assert http_by_thread.setdefault(ident, http) is http
+
+    def test_list_events_many(self, monkeypatch):
+        http = HttpMockSequence([
+            # The first calendar has a second page of results, the third calendar errors out
+            batch_response(
+                (0, 200, {'items': [{'id': 'a'}], 'nextPageToken': 'page-2'}),
+                (1, 200, {'items': [{'id': 'b'}]}),
+                (2, 404, {'error': {'code': 404, 'message': 'Not Found'}}),
+            ),
+            batch_response((0, 200, {'items': [{'id': 'c'}]})),
+        ])
+        monkeypatch.setattr(google_client, 'get_http', lambda: http)
+
+        events, errors = GoogleClient(None, None, None, None).list_events_many(
+            ['first', 'second', 'third'], '2024-03-01T00:00:00Z', '2024-03-15T00:00:00Z', Credentials('abc')
+        )
+
+        assert events == {'first': [{'id': 'a'}, {'id': 'c'}], 'second': [{'id': 'b'}]}
+        assert list(errors) == ['third']
+        # Two round trips for three calendars
+        assert len(http._iterable) == 0
+
+    def test_list_events_many_leaves_out_partial_calendars(self, monkeypatch):
+        http = HttpMockSequence([
+            # The first calendar fails on its second page, the second one right away
+            batch_response(
+                (0, 200, {'items': [{'id': 'a'}], 'nextPageToken': 'page-2'}),
+                (1, 403, {'error': {'code': 403, 'message': 'Forbidden'}}),
+                (2, 200, {'items': [{'id': 'b'}]}),
+            ),
+            batch_response((0, 500, {'error': {'code': 500, 'message': 'Backend Error'}})),
+        ])
+        monkeypatch.setattr(google_client, 'get_http', lambda: http)
+
+        events, errors = GoogleClient(None, None, None, None).list_events_many(
+            ['first', 'second', 'third'], '2024-03-01T00:00:00Z', '2024-03-15T00:00:00Z', Credentials('abc')
+        )
+
+        assert events == {'third': [{'id': 'b'}]}
+        assert {calendar_id: error.status_code for calendar_id, error in errors.items()} == {
+            'first': 500,
+            'second': 403,
+        }
+
+    def test_list_busy(self, monkeypatch):
+        busy = [{'start': '2024-03-04T10:00:00Z', 'end': '2024-03-04T11:00:00Z'}]
+        http = HttpMockSequence([
+            ({'status': '200'}, json.dumps({
+                'calendars': {
+                    'first': {'busy': busy},
+                    'second': {'busy': []},
+                    'third': {'errors': [{'domain': 'global', 'reason': 'notFound'}], 'busy': []},
+                },
+            })),
+        ])
+        monkeypatch.setattr(google_client, 'get_http', lambda: http)
+
+        calendars = GoogleClient(None, None, None, None).list_busy(
+            ['first', 'second', 'third'], '2024-03-01T00:00:00Z', '2024-03-15T00:00:00Z', Credentials('abc')
+        )
+
+        # Calendars with errors are left out
+        assert calendars == {'first': busy, 'second': []}
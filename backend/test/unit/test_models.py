@@ -1,6 +1,12 @@
+import hashlib
+
 import pytest
+from sqlalchemy import String, event, inspect, select, type_coerce
+from sqlalchemy_utils import StringEncryptedType
+from sqlalchemy_utils.types.encrypted.encrypted_type import AesEngine
 from sqlalchemy.exc import IntegrityError
 from appointment.database import models, repo, schemas
+from appointment.exceptions import validation
 
 
 class TestAppointment:
@@ -136,3 +142,160 @@ class TestInvite:
             assert not invite
             waiting_list = db.query(models.WaitingList).filter(models.WaitingList.id == waiting_list.id).first()
             assert not waiting_list
+
+
+class TestBlindIndex:
+    def test_kept_up_to_date(self, with_db, make_pro_subscriber):
+        subscriber = make_pro_subscriber(email='blind@example.org')
+
+        with with_db() as db:
+            subscriber = repo.subscriber.get(db, subscriber.id)
+            assert subscriber.email_index == models.blind_index('blind@example.org')
+            assert subscriber.username_index == models.blind_index(subscriber.username)
+
+            subscriber.email = 'index@example.org'
+            db.commit()
+
+            assert repo.subscriber.get_by_email(db, 'index@example.org').id == subscriber.id
+            assert repo.subscriber.get_by_email(db, 'blind@example.org') is None
+
+    def test_is_keyed(self):
+        index = models.blind_index('blind@example.org')
+        assert len(index) == 64
+        assert index != hashlib.sha256(b'blind@example.org').hexdigest()
+        assert models.blind_index(None) is None
+
+
+class TestEncryption:
+    def test_matches_sqlalchemy_utils(self, with_db, make_pro_subscriber):
+        """Our key caching hooks into sqlalchemy_utils' engine, so check we still read what a stock type reads"""
+        subscribers = [make_pro_subscriber() for _ in range(3)]
+        stock_type = StringEncryptedType(String, models.secret, AesEngine, 'pkcs5', length=255)
+
+        with with_db() as db:
+            ciphertexts = db.scalars(
+                select(type_coerce(models.Subscriber.email, String))
+                .where(models.Subscriber.id.in_([subscriber.id for subscriber in subscribers]))
+                .order_by(models.Subscriber.id)
+            ).all()
+            dialect = db.get_bind().dialect
+
+        expected = [stock_type.process_result_value(ciphertext, dialect) for ciphertext in ciphertexts]
+        assert expected == [subscriber.email for subscriber in subscribers]
+        assert [models.Subscriber.email.type.process_result_value(text, dialect) for text in ciphertexts] == expected
+        encrypted = models.Subscriber.email.type.process_bind_param('a@example.org', dialect)
+        assert encrypted == stock_type.process_bind_param('a@example.org', dialect)
+
+    def test_key_is_only_derived_when_it_changes(self):
+        engine = models.CachedKeyAesEngine()
+        engine._set_padding_mechanism('pkcs5')
+
+        engine._update_key('first')
+        cipher = engine.cipher
+        engine._update_key('first')
+        assert engine.cipher is cipher
+
+        engine._update_key('second')
+        assert engine.cipher is not cipher
+        assert engine.decrypt(engine.encrypt('value')) == 'value'
+
+    def test_listing_defers_password(self, with_db, make_pro_subscriber):
+        subscribers = [make_pro_subscriber(password='secret') for _ in range(3)]
+
+        with with_db() as db:
+            loaded = repo.subscriber.get_all(db, after=subscribers[0].id - 1)
+
+            assert [subscriber.email for subscriber in loaded] == [subscriber.email for subscriber in subscribers]
+            # The columns that aren't listed are only decrypted when they're accessed
+            assert 'password' in inspect(loaded[0]).unloaded
+            assert loaded[0].password == subscribers[0].password
+            assert 'password' not in inspect(loaded[0]).unloaded
+
+    def test_listings_load_invites_in_bulk(self, with_db, make_basic_subscriber, make_invite, make_waiting_list):
+        subscribers = [make_basic_subscriber() for _ in range(3)]
+        invites = [make_invite(subscriber_id=subscriber.id) for subscriber in subscribers]
+        entries = [make_waiting_list(invite_id=invite.id) for invite in invites]
+
+        with with_db() as db:
+            queries = []
+            event.listen(db.get_bind(), 'before_cursor_execute', lambda *args: queries.append(args[2]))
+
+            loaded = repo.subscriber.get_all(db, after=subscribers[0].id - 1)
+            assert [subscriber.invite.code for subscriber in loaded] == [invite.code for invite in invites]
+            # The subscribers, and then all of their invites
+            assert len(queries) == 2
+
+            queries.clear()
+            loaded = repo.invite.get_waiting_list(db, after=entries[0].id - 1)
+            assert [entry.invite.code for entry in loaded] == [invite.code for invite in invites]
+            assert len(queries) == 2
+
+    def test_admin_listing_page_queries(self, with_db, make_pro_subscriber, make_caldav_calendar, make_schedule):
+        subscribers = [make_pro_subscriber() for _ in range(3)]
+        for subscriber in subscribers:
+            make_schedule(calendar_id=make_caldav_calendar(subscriber.id).id)
+
+        with with_db() as db:
+            queries = []
+            event.listen(db.get_bind(), 'before_cursor_execute', lambda *args: queries.append(args[2]))
+
+            page = [
+                schemas.SubscriberAdminOut.model_validate(subscriber)
+                for subscriber in repo.subscriber.get_all(db, after=subscribers[0].id - 1)
+            ]
+
+            assert [subscriber.id for subscriber in page] == [subscriber.id for subscriber in subscribers]
+            # The subscribers and their invites, however many calendars they have
+            assert len(queries) == 2
+
+
+class TestAuthorization:
+    def test_schedule_get_authorized(self, with_db, make_pro_subscriber, make_caldav_calendar, make_schedule):
+        subscriber = make_pro_subscriber()
+        calendar = make_caldav_calendar(subscriber.id, connected=True)
+        unconnected = make_caldav_calendar(subscriber.id, connected=False)
+        foreign = make_caldav_calendar(make_pro_subscriber().id, connected=True)
+        schedule = make_schedule(calendar_id=calendar.id)
+
+        with with_db() as db:
+            queries = []
+            event.listen(db.get_bind(), 'before_cursor_execute', lambda *args: queries.append(args[2]))
+
+            loaded = repo.schedule.get_authorized(db, schedule.id, subscriber.id, calendar_id=calendar.id)
+
+            # Checked and loaded, together with its calendar, in one go
+            assert loaded.id == schedule.id
+            assert loaded.calendar.id == calendar.id
+            assert repo.schedule.get(db, schedule.id) is loaded
+            assert len(queries) == 1
+
+            with pytest.raises(validation.ScheduleNotFoundException):
+                repo.schedule.get_authorized(db, schedule.id + 1, subscriber.id)
+            with pytest.raises(validation.ScheduleNotAuthorizedException):
+                repo.schedule.get_authorized(db, schedule.id, subscriber.id + 1)
+            with pytest.raises(validation.CalendarNotFoundException):
+                repo.schedule.get_authorized(db, schedule.id, subscriber.id, calendar_id=foreign.id + 1)
+            with pytest.raises(validation.CalendarNotAuthorizedException):
+                repo.schedule.get_authorized(db, schedule.id, subscriber.id, calendar_id=foreign.id)
+            with pytest.raises(validation.CalendarNotConnectedException):
+                repo.schedule.get_authorized(db, schedule.id, subscriber.id, calendar_id=unconnected.id)
+
+            assert repo.schedule.is_owned(db, schedule.id, subscriber.id)
+            assert not repo.schedule.is_owned(db, schedule.id, subscriber.id + 1)
+
+    def test_calendar_get_authorized(self, with_db, make_pro_subscriber, make_caldav_calendar):
+        subscriber = make_pro_subscriber()
+        calendar = make_caldav_calendar(subscriber.id, connected=False)
+
+        with with_db() as db:
+            assert repo.calendar.get_authorized(db, calendar.id, subscriber.id).id == calendar.id
+            assert repo.calendar.exists(db, calendar.id)
+            assert not repo.calendar.exists(db, calendar.id + 1)
+            assert not repo.calendar.is_connected(db, calendar.id)
+
+            with pytest.raises(validation.CalendarNotFoundException):
+                repo.calendar.get_authorized(db, calendar.id + 1, subscriber.id)
+            with pytest.raises(validation.CalendarNotAuthorizedException):
+                repo.calendar.get_authorized(db, calendar.id, subscriber.id + 1)
+            with pytest.raises(validation.CalendarNotConnectedException):
+                repo.calendar.get_authorized(db, calendar.id, subscriber.id, connected=True)
@@ -0,0 +1,79 @@
+from sqlalchemy import event
+
+from appointment.controller import public_link
+from appointment.controller.public_link import public_links
+from appointment.database import models, repo
+
+
+class TestPublicLink:
+    @staticmethod
+    def count_queries(db):
+        queries = []
+        event.listen(db.get_bind(), 'before_cursor_execute', lambda *args: queries.append(args[2]))
+        return queries
+
+    def make_link(self, make_pro_subscriber, make_caldav_calendar, make_schedule):
+        subscriber = make_pro_subscriber()
+        calendar = make_caldav_calendar(subscriber_id=subscriber.id, connected=True)
+        schedule = make_schedule(calendar_id=calendar.id, active=True)
+        return subscriber, schedule, f'https://apmt.day/{subscriber.username}/{schedule.slug}/'
+
+    def test_links_are_resolved_from_memory(self, with_db, make_pro_subscriber, make_caldav_calendar, make_schedule):
+        subscriber, schedule, url = self.make_link(make_pro_subscriber, make_caldav_calendar, make_schedule)
+
+        with with_db() as db:
+            link = public_link.resolve(db, url)
+            assert link.subscriber.id == subscriber.id
+            assert [s.id for s in link.schedules] == [schedule.id]
+
+        with with_db() as db:
+            queries = self.count_queries(db)
+            link = public_link.resolve(db, url)
+
+            assert queries == []
+            assert link.subscriber.username == subscriber.username
+            assert [c.id for c in link.calendars] == [schedule.calendar_id]
+            # The rows are part of this session, and their relationships are loaded from it
+            assert link.schedules[0] in db
+            assert link.schedules[0].calendar is link.calendars[0]
+            assert link.calendars[0].owner is link.subscriber
+            assert link.schedules[0].slots == []
+
+    def test_changes_drop_the_link(self, with_db, make_pro_subscriber, make_caldav_calendar, make_schedule):
+        subscriber, schedule, url = self.make_link(make_pro_subscriber, make_caldav_calendar, make_schedule)
+
+        with with_db() as db:
+            public_link.resolve(db, url)
+        assert public_links.get(url) is not None
+
+        with with_db() as db:
+            db.get(models.Schedule, schedule.id).name = 'Renamed'
+            db.commit()
+
+        assert public_links.get(url) is None
+        with with_db() as db:
+            assert public_link.resolve(db, url).schedules[0].name == 'Renamed'
+
+        # Rolled back changes don't count
+        with with_db() as db:
+            db.get(models.Subscriber, subscriber.id).name = 'Someone else'
+            db.flush()
+            db.rollback()
+        assert public_links.get(url) is not None
+
+    def test_invalid_links_are_not_remembered(self, with_db, make_pro_subscriber):
+        subscriber = make_pro_subscriber()
+        url = f'https://apmt.day/{subscriber.username}/not-a-schedule/'
+
+        with with_db() as db:
+            assert public_link.resolve(db, url) is None
+        assert public_links.get(url) is None
+
+    def test_usernames_are_looked_up_once_per_session(self, with_db, make_pro_subscriber):
+        subscriber = make_pro_subscriber()
+
+        with with_db() as db:
+            queries = self.count_queries(db)
+            assert repo.subscriber.get_by_username(db, subscriber.username).id == subscriber.id
+            assert repo.subscriber.get_by_username(db, subscriber.username).id == subscriber.id
+            assert len(queries) == 1
@@ -1,5 +1,9 @@
+import json
+
 import pytest
-from appointment.utils import retrieve_user_url_data
+from pydantic import BaseModel
+
+from appointment.utils import retrieve_user_url_data, stream_ndjson
 
 
 class TestRetrieveUserUrlData:
@@ -51,3 +55,59 @@ class TestRetrieveUserUrlData:
         assert original_username != username
         assert original_signature != signature
         assert original_clean_url != clean_url
+
+
+class TestStreamNdjson:
+    class Row(BaseModel):
+        id: int
+
+    class MockSession:
+        def __init__(self):
+            self.closed = False
+            self.expunged = 0
+
+        def expunge_all(self):
+            self.expunged += 1
+
+        def close(self):
+            self.closed = True
+
+    @pytest.fixture()
+    def db(self, monkeypatch):
+        db = self.MockSession()
+        monkeypatch.setattr('appointment.utils.get_engine_and_session', lambda: (None, lambda: db))
+        return db
+
+    def test_pages(self, db):
+        rows = [self.Row(id=index) for index in range(1, 8)]
+        pages = []
+
+        def get_page(page_db, after, limit):
+            # Pages are read with a session of the stream's own
+            assert page_db is db
+            pages.append((after, limit))
+            return [row for row in rows if after is None or row.id > after][:limit]
+
+        stream = stream_ndjson(get_page, self.Row, page_size=3)
+        assert pages == []
+
+        lines = list(stream)
+
+        assert [json.loads(line)['id'] for line in lines] == list(range(1, 8))
+        assert pages == [(None, 3), (3, 3), (6, 3)]
+        assert db.expunged == 2
+        assert db.closed
+
+    def test_limit(self, db):
+        rows = [self.Row(id=index) for index in range(1, 8)]
+        pages = []
+
+        def get_page(page_db, after, limit):
+            pages.append((after, limit))
+            return [row for row in rows if row.id > after][:limit]
+
+        lines = list(stream_ndjson(get_page, self.Row, after=1, limit=4, page_size=3))
+
+        assert [json.loads(line)['id'] for line in lines] == [2, 3, 4, 5]
+        assert pages == [(1, 3), (4, 1)]
+        assert db.closed